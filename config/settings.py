@@ -66,10 +66,17 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# PostGIS siempre, salvo una URL spatialite:///archivo.sqlite (p. ej. para
+# correr `manage.py benchmark` sin servidor de base de datos)
+MOTOR_BD = (
+    None if DATABASE_URL and DATABASE_URL.startswith("spatialite:")
+    else "django.contrib.gis.db.backends.postgis"
+)
+
 DATABASES = {
     "default": dj_database_url.parse(
         DATABASE_URL,
-        engine="django.contrib.gis.db.backends.postgis",
+        engine=MOTOR_BD,
         conn_max_age=600,
     )
 }
@@ -97,4 +104,51 @@ USE_TZ = True
 
 STATIC_URL = 'staticfiles'
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cachés en disco de la app rutas (payload de la red, etc.)
+RUTAS_CACHE_DIR = BASE_DIR / "cache"
+
+# Teselas MVT que cada worker guarda en memoria (además de las de disco)
+RUTAS_TESELAS_EN_MEMORIA = 1024
+
+# Máximo de pares origen/destino por POST a /rutas/optima-batch/
+RUTAS_BATCH_MAX_PARES = 5000
+
+# Matriz de costos (/rutas/matriz/): tamaño máximo y procesos del pool
+# (None = uno por núcleo)
+RUTAS_MATRIZ_MAX_CELDAS = 1_000_000
+RUTAS_MATRIZ_PROCESOS = None
+
+# Índice de jerarquía de contracción (manage.py construir_jerarquia)
+RUTAS_CH_PATH = RUTAS_CACHE_DIR / "jerarquia.bin"
+
+# Snapshot del grafo que los workers abren con mmap (manage.py exportar_grafo;
+# también se regenera después de cada import)
+RUTAS_GRAFO_PATH = RUTAS_CACHE_DIR / "grafo.bin"
+
+# Caché de respuestas de /rutas/optima-coords/. BACKEND: "memoria" (por
+# worker), "archivo" (RUTAS_CACHE_DIR/respuestas) o "django" (CACHES[ALIAS])
+RUTAS_CACHE_RUTAS = {
+    "BACKEND": "memoria",
+    "MAXIMO": 10000,
+    "TTL": 3600,
+    "RESOLUCION_MIN": 0.05,
+    "ALIAS": "default",
+}
+
+# Vistas asíncronas (/api/async/...): consultas en curso, cola de espera y
+# segundos máximos de espera antes de responder 503
+RUTAS_ASYNC = {
+    "CONCURRENCIA": 8,
+    "COLA": 64,
+    "ESPERA_MAX": 2.0,
+}
+
+# Respuestas JSON de DRF con orjson cuando está instalado (rutas.renderers)
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "rutas.renderers.JSONRapidoRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
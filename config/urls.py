@@ -6,7 +6,11 @@ os.environ['PROJ_LIB'] = r"C:\OSGeo4W\share\proj"
 from django.contrib import admin
 from django.urls import include, path
 
+from rutas.views import metricas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/", include("rutas.urls")),
+    # Ruta por defecto que consulta Prometheus
+    path("metrics", metricas, name="metricas"),
 ]
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class RutasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'rutas'
+
+    def ready(self):
+        # Receptores de `red_actualizada` (recalculan cachés tras cada import)
+        from . import grafo, payloads, teselas  # noqa: F401
@@ -0,0 +1,7 @@
+"""
+Benchmarks de rendimiento de la app `rutas`.
+
+Cada módulo se ejecuta por separado, por ejemplo:
+
+    python -m rutas.benchmarks.espacial
+"""
@@ -0,0 +1,57 @@
+"""
+Benchmark de los motores de búsqueda de `rutas.busqueda`.
+
+    python -m rutas.benchmarks.busqueda [--excel datos/datos.xlsx] [--pares 500]
+
+Arma el grafo desde el Excel, elige pares origen/destino al azar y corre
+cada algoritmo sobre los mismos pares. Reporta nodos asentados y latencia
+promedio/p95, y verifica que todos encuentren el mismo costo.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rutas.busqueda import ALGORITMOS
+from rutas.benchmarks.red import EXCEL_POR_DEFECTO, grafo_desde_excel, pares_aleatorios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--excel", default=EXCEL_POR_DEFECTO)
+    parser.add_argument("--pares", type=int, default=500)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    grafo = grafo_desde_excel(args.excel)
+    grafo.invertido()  # que el primer bidireccional no pague la inversión
+    pares = pares_aleatorios(grafo, args.pares, args.semilla)
+    print(f"{len(grafo)} nodos, {grafo.num_aristas} aristas, {len(pares)} pares")
+
+    referencia = {}
+    print(f"{'algoritmo':>14} {'asentados':>10} {'ms_prom':>8} {'ms_p95':>7} {'sin_ruta':>9}")
+    for nombre, buscar in ALGORITMOS.items():
+        asentados, tiempos, sin_ruta = [], [], 0
+        for par in pares:
+            stats = {}
+            t0 = time.perf_counter()
+            costo, _ = buscar(grafo, *par, estadisticas=stats)
+            tiempos.append(time.perf_counter() - t0)
+            asentados.append(stats["nodos_asentados"])
+
+            if costo is None:
+                sin_ruta += 1
+            # Todos los motores deben coincidir con Dijkstra
+            esperado = referencia.setdefault(par, costo)
+            assert (costo is None) == (esperado is None), (nombre, par)
+            assert costo is None or abs(costo - esperado) < 1e-6, (nombre, par, costo, esperado)
+
+        ms = np.array(tiempos) * 1000
+        print(
+            f"{nombre:>14} {np.mean(asentados):>10.1f} {ms.mean():>8.3f} "
+            f"{np.percentile(ms, 95):>7.3f} {sin_ruta:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
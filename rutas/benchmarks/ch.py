@@ -0,0 +1,97 @@
+"""
+Benchmark de la jerarquía de contracción contra Dijkstra.
+
+    python -m rutas.benchmarks.ch [--excel datos/datos.xlsx] [--pares 500]
+
+Arma el grafo desde el Excel, construye la jerarquía, la guarda y la
+vuelve a abrir con mmap como lo hacen los workers. Para cada par compara
+el costo con `dijkstra_con_transbordos` y verifica que los pasos
+desempaquetados sean aristas reales del grafo, contiguas y con la misma
+suma de costos.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from rutas.busqueda import dijkstra_con_transbordos
+from rutas.ch import JerarquiaContraccion, construir_jerarquia
+from rutas.benchmarks.red import EXCEL_POR_DEFECTO, grafo_desde_excel, pares_aleatorios
+
+
+def costo_de_pasos(grafo, pasos):
+    """Suma de costos de los pasos, verificando que cada uno sea una arista real."""
+    total = 0.0
+    for anterior, paso in zip([None] + pasos[:-1], pasos):
+        assert anterior is None or anterior["target"] == paso["source"], "pasos no contiguos"
+        costos = [
+            costo for vecino, costo, ruta_id, modo, edge_id in grafo.get(paso["source"])
+            if vecino == paso["target"] and ruta_id == paso["ruta_id"]
+            and modo == paso["modo"] and edge_id == paso["edge_id"]
+        ]
+        assert costos, f"arista inexistente: {paso}"
+        total += min(costos)
+    return total
+
+
+def medir(buscar, pares):
+    asentados, tiempos, costos = [], [], []
+    for par in pares:
+        stats = {}
+        t0 = time.perf_counter()
+        costo, pasos = buscar(*par, estadisticas=stats)
+        tiempos.append(time.perf_counter() - t0)
+        asentados.append(stats["nodos_asentados"])
+        costos.append((costo, pasos))
+    return np.array(tiempos) * 1000, np.mean(asentados), costos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--excel", default=EXCEL_POR_DEFECTO)
+    parser.add_argument("--pares", type=int, default=500)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    grafo = grafo_desde_excel(args.excel)
+    pares = pares_aleatorios(grafo, args.pares, args.semilla)
+    print(f"{len(grafo)} nodos, {grafo.num_aristas} aristas, {len(pares)} pares")
+
+    t0 = time.perf_counter()
+    jerarquia = construir_jerarquia(grafo)
+    print(
+        f"construcción: {time.perf_counter() - t0:.2f}s, {jerarquia.num_atajos} atajos, "
+        f"{jerarquia.nbytes / 1e6:.2f} MB"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(tmp) / "jerarquia.bin"
+        jerarquia.guardar(ruta)
+        t0 = time.perf_counter()
+        jerarquia = JerarquiaContraccion.cargar(ruta)
+        print(f"apertura con mmap: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+        ms_dij, asentados_dij, esperados = medir(
+            lambda o, d, estadisticas: dijkstra_con_transbordos(grafo, o, d, estadisticas), pares,
+        )
+        ms_ch, asentados_ch, obtenidos = medir(jerarquia.buscar, pares)
+
+        for par, (esperado, _), (costo, pasos) in zip(pares, esperados, obtenidos):
+            assert (costo is None) == (esperado is None), par
+            if costo is not None:
+                assert abs(costo - esperado) < 1e-6, (par, costo, esperado)
+                assert abs(costo_de_pasos(grafo, pasos) - costo) < 1e-6, par
+
+        # Que el mmap se cierre antes de borrar el directorio
+        del jerarquia
+
+    print(f"{'motor':>10} {'asentados':>10} {'ms_prom':>8} {'ms_p95':>7}")
+    for nombre, ms, asentados in (("dijkstra", ms_dij, asentados_dij), ("ch", ms_ch, asentados_ch)):
+        print(f"{nombre:>10} {asentados:>10.1f} {ms.mean():>8.3f} {np.percentile(ms, 95):>7.3f}")
+    print("costos y pasos de ch verificados contra dijkstra")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark del índice espacial frente a la comparación de todos los pares.
+
+    python -m rutas.benchmarks.espacial [--max 100000] [--radio 25]
+
+Genera paradas aleatorias con densidad constante (el área crece con la
+cantidad de paradas, como al pasar de una ciudad a toda el área
+metropolitana) y mide cuánto tarda encontrar todos los pares a menos del
+radio. Con densidad constante el índice escala casi linealmente; la
+comparación de todos los pares solo se mide hasta `--max-pares` paradas.
+"""
+import argparse
+import random
+import time
+from math import cos, radians, sqrt
+
+from rutas.espacial import IndiceEspacial, haversine_m
+
+LAT_CENTRO = -17.7833
+LON_CENTRO = -63.1821
+PARADAS_POR_KM2 = 40
+
+
+def generar_paradas(n, semilla=0):
+    rnd = random.Random(semilla)
+    lado_km = sqrt(n / PARADAS_POR_KM2)
+    dlat = lado_km / 111.32 / 2
+    dlon = dlat / cos(radians(LAT_CENTRO))
+    lats = [LAT_CENTRO + rnd.uniform(-dlat, dlat) for _ in range(n)]
+    lons = [LON_CENTRO + rnd.uniform(-dlon, dlon) for _ in range(n)]
+    return list(range(1, n + 1)), lats, lons
+
+
+def pares_fuerza_bruta(lats, lons, radio):
+    total = 0
+    n = len(lats)
+    for i in range(n):
+        for j in range(i + 1, n):
+            if haversine_m(lats[i], lons[i], lats[j], lons[j]) <= radio:
+                total += 1
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max", type=int, default=100_000)
+    parser.add_argument("--max-pares", type=int, default=2_000)
+    parser.add_argument("--radio", type=float, default=25)
+    args = parser.parse_args(argv)
+
+    tamanos = [n for n in (1_000, 2_000, 10_000, 50_000, 100_000) if n <= args.max]
+
+    print(f"{'paradas':>9} {'pares':>8} {'indice_s':>9} {'us/parada':>10} {'todos_pares_s':>14}")
+    for n in tamanos:
+        ids, lats, lons = generar_paradas(n)
+
+        t0 = time.perf_counter()
+        indice = IndiceEspacial(ids, lats, lons, args.radio)
+        pares = sum(1 for _ in indice.pares_cercanos())
+        t_indice = time.perf_counter() - t0
+
+        t_bruta = "-"
+        if n <= args.max_pares:
+            t0 = time.perf_counter()
+            esperados = pares_fuerza_bruta(lats, lons, args.radio)
+            t_bruta = f"{time.perf_counter() - t0:.3f}"
+            assert esperados == pares, (esperados, pares)
+
+        print(f"{n:>9} {pares:>8} {t_indice:>9.3f} {t_indice / n * 1e6:>10.1f} {t_bruta:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de memoria y tiempo de construcción del grafo.
+
+    python -m rutas.benchmarks.grafo [--aristas 1000000]
+
+Compara el grafo en dict de tuplas `(target, cost, ruta_id, modo, edge_id)` con el
+GrafoCSR sobre una red sintética y reporta bytes por arista (medidos con
+tracemalloc) y tiempo de construcción a partir de columnas ya leídas de la
+BD.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+
+from rutas.csr import GrafoCSR, MODO_BUS
+
+
+def red_sintetica(num_aristas, paradas_por_linea=60, semilla=0):
+    """Columnas (source, target, cost, ruta) de líneas que recorren paradas al azar."""
+    rnd = np.random.default_rng(semilla)
+    num_lineas = max(1, num_aristas // (paradas_por_linea - 1))
+    num_paradas = max(paradas_por_linea, num_aristas // 4)
+
+    paradas = rnd.integers(1, num_paradas + 1, size=(num_lineas, paradas_por_linea))
+    origenes = paradas[:, :-1].ravel()
+    destinos = paradas[:, 1:].ravel()
+    rutas = np.repeat(np.arange(1, num_lineas + 1), paradas_por_linea - 1)
+    costos = rnd.uniform(0.5, 3.0, size=len(origenes))
+    return origenes, destinos, costos, rutas
+
+
+def construir_dict(origenes, destinos, costos, rutas):
+    graph = defaultdict(list)
+    filas = zip(origenes.tolist(), destinos.tolist(), costos.tolist(), rutas.tolist())
+    for edge_id, (s, t, c, r) in enumerate(filas, start=1):
+        graph[s].append((t, c, r, "bus", edge_id))
+    return graph
+
+
+def construir_csr(origenes, destinos, costos, rutas):
+    modos = np.full(len(origenes), MODO_BUS, dtype=np.int8)
+    edges = np.arange(1, len(origenes) + 1)
+    return GrafoCSR.desde_aristas(origenes, destinos, costos, rutas, modos, edges)
+
+
+def medir(constructor, columnas):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    grafo = constructor(*columnas)
+    segundos = time.perf_counter() - t0
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return grafo, segundos, memoria
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--aristas", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    columnas = red_sintetica(args.aristas)
+    m = len(columnas[0])
+    print(f"{m} aristas, {len(np.unique(np.concatenate(columnas[:2])))} nodos")
+    print(f"{'grafo':>6} {'build_s':>8} {'MB':>8} {'bytes/arista':>13}")
+
+    grafo_dict, s_dict, mem_dict = medir(construir_dict, columnas)
+    print(f"{'dict':>6} {s_dict:>8.3f} {mem_dict / 1e6:>8.1f} {mem_dict / m:>13.1f}")
+
+    grafo_csr, s_csr, mem_csr = medir(construir_csr, columnas)
+    print(f"{'csr':>6} {s_csr:>8.3f} {mem_csr / 1e6:>8.1f} {mem_csr / m:>13.1f}")
+
+    # Ambos grafos deben tener las mismas aristas salientes
+    nodo = int(columnas[0][0])
+    assert sorted(grafo_dict[nodo]) == sorted(grafo_csr.get(nodo)), nodo
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark de la búsqueda multicriterio (costo, transbordos).
+
+    python -m rutas.benchmarks.pareto [--excel datos/datos.xlsx] [--pares 500]
+
+Corre `dijkstra_con_transbordos` y `pareto_con_transbordos` (sin límite y
+con varios `max_transbordos`) sobre los mismos pares. Reporta etiquetas
+asentadas, latencia y tamaño medio del frente, y verifica que sin límite
+la opción más barata cueste lo mismo que Dijkstra.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rutas.busqueda import dijkstra_con_transbordos, pareto_con_transbordos
+from rutas.benchmarks.red import EXCEL_POR_DEFECTO, grafo_desde_excel, pares_aleatorios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--excel", default=EXCEL_POR_DEFECTO)
+    parser.add_argument("--pares", type=int, default=500)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--limites", type=int, nargs="*", default=[0, 1, 2])
+    args = parser.parse_args(argv)
+
+    grafo = grafo_desde_excel(args.excel)
+    pares = pares_aleatorios(grafo, args.pares, args.semilla)
+    print(f"{len(grafo)} nodos, {grafo.num_aristas} aristas, {len(pares)} pares")
+
+    referencia = {}
+    motores = [("dijkstra", None)] + [("pareto", None)] + [
+        (f"pareto<={k}", k) for k in args.limites
+    ]
+
+    print(f"{'motor':>11} {'asentados':>10} {'ms_prom':>8} {'ms_p95':>7} {'frente':>7} {'sin_ruta':>9}")
+    for nombre, limite in motores:
+        asentados, tiempos, frentes, sin_ruta = [], [], [], 0
+        for par in pares:
+            stats = {}
+            t0 = time.perf_counter()
+            if nombre == "dijkstra":
+                costo, _ = dijkstra_con_transbordos(grafo, *par, estadisticas=stats)
+                referencia[par] = costo
+                opciones = [] if costo is None else [costo]
+            else:
+                opciones = pareto_con_transbordos(grafo, *par, limite, estadisticas=stats)
+            tiempos.append(time.perf_counter() - t0)
+            asentados.append(stats["nodos_asentados"])
+            frentes.append(len(opciones))
+            if not opciones:
+                sin_ruta += 1
+
+            if nombre == "pareto":
+                esperado = referencia[par]
+                assert (esperado is None) == (not opciones), par
+                assert not opciones or abs(opciones[0][0] - esperado) < 1e-6, (par, opciones[0], esperado)
+
+        ms = np.array(tiempos) * 1000
+        print(
+            f"{nombre:>11} {np.mean(asentados):>10.1f} {ms.mean():>8.3f} "
+            f"{np.percentile(ms, 95):>7.3f} {np.mean(frentes):>7.2f} {sin_ruta:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Carga la red directamente desde el Excel del import, sin base de datos.
+
+Reproduce lo que hacen `importar_microbuses` y `construir_grafo_csr`
+para que los benchmarks de búsqueda puedan correr en cualquier máquina.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from rutas.busqueda import dijkstra_con_transbordos
+from rutas.csr import GrafoCSR, MODO_BUS, MODO_TRANSFER, SIN_EDGE, SIN_RUTA
+from rutas.normalizacion import aristas_transbordo, normalizar_aristas
+
+EXCEL_POR_DEFECTO = Path(__file__).resolve().parents[2] / "datos" / "datos.xlsx"
+
+
+def leer_hojas(excel_path=EXCEL_POR_DEFECTO):
+    xls = pd.ExcelFile(excel_path, engine="openpyxl")
+    return {
+        nombre: pd.read_excel(xls, nombre)
+        for nombre in ("Puntos", "Lineas", "LineaRuta", "LineasPuntos")
+    }
+
+
+def aristas_de_lineas(lineas_rutas_df, lineas_puntos_df):
+    """Columnas (source, target, cost, ruta) de los Edges de bus del import."""
+    lp = lineas_puntos_df.sort_values(["IdLineaRuta", "Orden"])
+    siguiente = lp.groupby("IdLineaRuta").shift(-1)
+    validas = siguiente["IdPunto"].notna()
+
+    ruta_de = lineas_rutas_df.set_index("IdLineaRuta")["IdLinea"]
+    return (
+        lp.loc[validas, "IdPunto"].to_numpy(np.int64),
+        siguiente.loc[validas, "IdPunto"].to_numpy(np.int64),
+        siguiente.loc[validas, "Tiempo"].to_numpy(np.float64),
+        lp.loc[validas, "IdLineaRuta"].map(ruta_de).to_numpy(np.int64),
+    )
+
+
+def grafo_desde_hojas(hojas):
+    origenes, destinos, costos, rutas = aristas_de_lineas(
+        hojas["LineaRuta"], hojas["LineasPuntos"],
+    )
+
+    puntos = hojas["Puntos"]
+    ids = puntos["IdPunto"].to_numpy(np.int64)
+    lats = puntos["Latitud"].to_numpy(np.float64)
+    lons = puntos["Longitud"].to_numpy(np.float64)
+
+    t_origen, t_destino, t_costo = aristas_transbordo(ids, lats, lons)
+    n_t = len(t_origen)
+
+    (origenes, destinos, costos, rutas, modos, edges), informe = normalizar_aristas(
+        np.concatenate([origenes, t_origen]),
+        np.concatenate([destinos, t_destino]),
+        np.concatenate([costos, t_costo]),
+        np.concatenate([rutas, np.full(n_t, SIN_RUTA)]),
+        np.concatenate([np.full(len(origenes), MODO_BUS), np.full(n_t, MODO_TRANSFER)]),
+        np.full(len(origenes) + n_t, SIN_EDGE),
+    )
+    grafo = GrafoCSR.desde_aristas(
+        origenes, destinos, costos, rutas, modos,
+        edges=edges,
+        coordenadas=(ids, lats, lons),
+    )
+    grafo.meta = {"normalizacion": informe}
+    return grafo
+
+
+def grafo_desde_excel(excel_path=EXCEL_POR_DEFECTO):
+    return grafo_desde_hojas(leer_hojas(excel_path))
+
+
+def pares_aleatorios(grafo, cantidad, semilla=0, conectados=True):
+    """
+    Pares origen/destino entre nodos que tienen aristas salientes. Con
+    `conectados` solo se devuelven pares que tienen ruta (la red es
+    dirigida y muchos pares al azar no se conectan).
+    """
+    rnd = np.random.default_rng(semilla)
+    con_aristas = grafo.nodos[np.diff(grafo.offsets) > 0]
+
+    pares = []
+    for _ in range(cantidad * 50):
+        o, d = (int(v) for v in rnd.choice(con_aristas, size=2))
+        if conectados and dijkstra_con_transbordos(grafo, o, d)[0] is None:
+            continue
+        pares.append((o, d))
+        if len(pares) == cantidad:
+            break
+    return pares
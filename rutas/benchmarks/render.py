@@ -0,0 +1,146 @@
+"""
+Benchmark del render de geometrías y JSON de las respuestas.
+
+    DJANGO_SETTINGS_MODULE=config.settings python -m rutas.benchmarks.render [--edges 20000] [--vertices 2]
+
+Sin base de datos: la geometría se arma una vez como la devolvería
+PostGIS (EWKB en hex para el ORM, WKB para `AsWKB`) y se compara el camino
+anterior con el actual:
+  - coordenadas de un Edge: GEOSGeometry -> .geojson -> json.loads
+    (antes, en `armar_tramos`) contra `coordenadas_wkb`;
+  - coordenadas para el payload de la red: GEOSGeometry -> .coords contra
+    `coordenadas_wkb`;
+  - respuestas de DRF (Puntos y LineaRutas): JSONRenderer contra
+    JSONRapidoRenderer, verificando que el JSON sea el mismo;
+  - un cuerpo de ruta_optima: json.dumps contra `geojson.dumps`;
+  - el mismo cuerpo con `formatear_respuesta` (`?formato=`, `?tolerancia=`):
+    bytes del JSON y tiempo de formatear + serializar.
+`ST_AsGeoJSON` (ruta_por_linea) corre en la BD y no se mide acá.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+
+def medir(funcion, repeticiones=3):
+    """Mejor tiempo (s) de `repeticiones` corridas."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def reportar(nombre, antes, ahora):
+    print(f"{nombre:>28} {antes * 1000:>10.1f} {ahora * 1000:>10.1f} {antes / ahora:>7.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--edges", type=int, default=20000)
+    parser.add_argument("--vertices", type=int, default=2, help="Vértices por Edge (el import usa 2)")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    import django
+    django.setup()
+    from django.contrib.gis.geos import GEOSGeometry, LineString, Point
+    from rest_framework.renderers import JSONRenderer
+
+    from rutas.espacial import RADIO_TIERRA_M
+    from rutas.formatos import formatear_respuesta, leer_parametros_geometria
+    from rutas.geojson import coordenadas_wkb, dumps
+    from rutas.models import LineaRuta, Punto
+    from rutas.renderers import JSONRapidoRenderer
+    from rutas.serializers import LineaRutaSerializer, PuntoSerializer
+
+    rnd = np.random.default_rng(args.semilla)
+    lons = -63.18 + rnd.uniform(-0.1, 0.1, size=(args.edges, args.vertices))
+    lats = -17.78 + rnd.uniform(-0.1, 0.1, size=(args.edges, args.vertices))
+    lineas = [
+        LineString(list(zip(x.tolist(), y.tolist())), srid=4326) for x, y in zip(lons, lats)
+    ]
+    # Lo que entrega psycopg: EWKB en hex para el ORM, bytes para AsWKB
+    ewkb = [g.hexewkb.decode() for g in lineas]
+    wkb = [memoryview(bytes(g.wkb)) for g in lineas]
+    print(f"{args.edges} Edges de {args.vertices} vértices")
+    print(f"{'':>28} {'antes ms':>10} {'ahora ms':>10} {'mejora':>8}")
+
+    # Coordenadas de los tramos de ruta_optima
+    assert json.loads(GEOSGeometry(ewkb[0]).geojson)["coordinates"] == coordenadas_wkb(wkb[0])
+    reportar(
+        "coordenadas (tramos)",
+        medir(lambda: [json.loads(GEOSGeometry(b).geojson)["coordinates"] for b in ewkb]),
+        medir(lambda: [coordenadas_wkb(b) for b in wkb]),
+    )
+    reportar(
+        "coordenadas (payload red)",
+        medir(lambda: [[list(c) for c in GEOSGeometry(b).coords] for b in ewkb]),
+        medir(lambda: [coordenadas_wkb(b) for b in wkb]),
+    )
+
+    # Respuestas de DRF
+    puntos = [
+        Punto(id=i, descripcion=f"P {i}", ubicacion=Point(x, y, srid=4326))
+        for i, (x, y) in enumerate(zip(lons[:, 0].tolist(), lats[:, 0].tolist()))
+    ]
+    segmentos = [LineaRuta(id=i, ruta_id=i % 50, geom=g) for i, g in enumerate(lineas)]
+    for nombre, datos in (
+        ("DRF Puntos", PuntoSerializer(puntos, many=True).data),
+        ("DRF LineaRutas", LineaRutaSerializer(segmentos, many=True).data),
+    ):
+        drf, rapido = JSONRenderer(), JSONRapidoRenderer()
+        assert json.loads(drf.render(datos)) == json.loads(rapido.render(datos))
+        reportar(nombre, medir(lambda: drf.render(datos)), medir(lambda: rapido.render(datos)))
+
+    # Cuerpo de ruta_optima con todos los Edges en tramos de 50
+    coords = [coordenadas_wkb(b) for b in wkb]
+    respuesta = {
+        "costo_total": 42.5,
+        "ruta_optima": [
+            {"tipo": "bus", "linea": f"L{i:03d}", "ruta_id": i, "color": "#FF0000",
+             "geometry": [c for tramo in coords[i:i + 50] for c in tramo]}
+            for i in range(0, len(coords), 50)
+        ],
+    }
+    reportar(
+        "ruta_optima (dumps)",
+        medir(lambda: json.dumps(respuesta, ensure_ascii=False, separators=(",", ":")).encode()),
+        medir(lambda: dumps(respuesta)),
+    )
+
+    # Formatos compactos: una ruta continua (pasos de ~40 m con giros
+    # suaves, como las calles) en lugar de Edges al azar
+    rumbo = np.cumsum(rnd.normal(0, 0.3, size=args.edges))
+    pasos = 40 / RADIO_TIERRA_M * 180 / np.pi
+    recorrido = np.c_[
+        -63.18 + np.cumsum(np.cos(rumbo)) * pasos / np.cos(np.radians(17.78)),
+        -17.78 + np.cumsum(np.sin(rumbo)) * pasos,
+    ].tolist()
+    respuesta["ruta_optima"] = [
+        {"tipo": "bus", "linea": f"L{i:03d}", "ruta_id": i, "color": "#FF0000",
+         "geometry": recorrido[i:i + 100]}
+        for i in range(0, len(recorrido), 100)
+    ]
+    print(f"{'':>28} {'bytes':>10} {'ms':>10}")
+    for query in (
+        {},
+        {"formato": "polyline"},
+        {"formato": "polyline", "precision": "6"},
+        {"formato": "cuantizado"},
+        {"formato": "polyline", "tolerancia": "5"},
+        {"formato": "cuantizado", "tolerancia": "5"},
+        {"formato": "polyline", "tolerancia": "20"},
+    ):
+        opciones, _ = leer_parametros_geometria(query)
+        cuerpo = dumps(formatear_respuesta(respuesta, opciones))
+        segundos = medir(lambda: dumps(formatear_respuesta(respuesta, opciones)))
+        nombre = " ".join(f"{k}={v}" for k, v in query.items()) or "coordenadas"
+        print(f"{nombre:>28} {len(cuerpo):>10} {segundos * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
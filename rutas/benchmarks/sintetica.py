@@ -0,0 +1,209 @@
+"""
+Red sintética a escala a partir de `datos/datos.xlsx`.
+
+    python -m rutas.benchmarks.sintetica --escala 10 --salida /tmp/red_x10.xlsx
+
+La red original se copia `escala` veces en una grilla, cada copia
+desplazada para no solaparse con las vecinas y con ids nuevos en todas
+las hojas. Las copias vecinas se unen con líneas conectoras (ida y
+vuelta) con paradas intermedias, para que los pares origen/destino
+puedan cruzar toda la red. El resultado tiene las mismas hojas y
+columnas que el Excel original, así que `importar_microbuses` lo importa
+sin cambios.
+"""
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+from rutas.benchmarks.red import EXCEL_POR_DEFECTO, leer_hojas
+from rutas.espacial import RADIO_TIERRA_M
+
+SEPARACION = 0.05            # fracción del tamaño de la red entre copias
+CONECTORAS_POR_PAR = 2       # líneas conectoras entre dos copias vecinas
+PARADA_CADA_M = 400          # distancia entre paradas de una conectora
+
+
+def _desplazar(hojas, k, pasos, dlat, dlon):
+    """Copia `k` de las hojas, con ids desplazados y coordenadas movidas."""
+    puntos = hojas["Puntos"].copy()
+    puntos["IdPunto"] += k * pasos["IdPunto"]
+    puntos["Latitud"] += dlat
+    puntos["Longitud"] += dlon
+
+    lineas = hojas["Lineas"].copy()
+    lineas["IdLinea"] += k * pasos["IdLinea"]
+    if k:
+        lineas["NombreLinea"] = lineas["NombreLinea"].astype(str).str.strip() + f"-{k}"
+
+    lineas_ruta = hojas["LineaRuta"].copy()
+    lineas_ruta["IdLineaRuta"] += k * pasos["IdLineaRuta"]
+    lineas_ruta["IdLinea"] += k * pasos["IdLinea"]
+
+    lp = hojas["LineasPuntos"].copy()
+    lp["IdLineaPunto"] += k * pasos["IdLineaPunto"]
+    lp["IdLineaRuta"] += k * pasos["IdLineaRuta"]
+    lp["IdPunto"] += k * pasos["IdPunto"]
+    lp["Latitud"] += dlat
+    lp["Longitud"] += dlon
+
+    return {"Puntos": puntos, "Lineas": lineas, "LineaRuta": lineas_ruta, "LineasPuntos": lp}
+
+
+def _metros_por_minuto(lp):
+    """Velocidad media de los buses en la red original (Distancia / Tiempo)."""
+    validas = lp["Tiempo"] > 0
+    return float(lp.loc[validas, "Distancia"].sum() / lp.loc[validas, "Tiempo"].sum())
+
+
+def _distancia_m(lat1, lon1, lat2, lon2):
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return RADIO_TIERRA_M * math.hypot(x, y)
+
+
+class _Conectoras:
+    """Acumula las filas de las líneas conectoras entre copias."""
+
+    def __init__(self, ids_iniciales, velocidad, plantilla_linea):
+        self.siguiente = dict(ids_iniciales)
+        self.velocidad = velocidad
+        self.plantilla_linea = plantilla_linea
+        self.filas = {"Puntos": [], "Lineas": [], "LineaRuta": [], "LineasPuntos": []}
+
+    def _nuevo_id(self, columna):
+        valor = self.siguiente[columna]
+        self.siguiente[columna] += 1
+        return valor
+
+    def agregar(self, a, b):
+        """Línea de ida y vuelta entre las paradas `a` y `b` (id, lat, lon)."""
+        distancia = _distancia_m(a[1], a[2], b[1], b[2])
+        tramos = max(1, round(distancia / PARADA_CADA_M))
+
+        paradas = [a]
+        for i in range(1, tramos):
+            f = i / tramos
+            pid = self._nuevo_id("IdPunto")
+            lat = a[1] + (b[1] - a[1]) * f
+            lon = a[2] + (b[2] - a[2]) * f
+            self.filas["Puntos"].append({
+                "IdPunto": pid, "Latitud": lat, "Longitud": lon, "Descripcion": f"C {pid}",
+            })
+            paradas.append((pid, lat, lon))
+        paradas.append(b)
+
+        id_linea = self._nuevo_id("IdLinea")
+        self.filas["Lineas"].append({
+            **self.plantilla_linea, "IdLinea": id_linea, "NombreLinea": f"C{id_linea}",
+        })
+
+        for id_ruta, sentido, recorrido in ((1, "Salida", paradas), (2, "Retorno", paradas[::-1])):
+            id_linea_ruta = self._nuevo_id("IdLineaRuta")
+            total_m = 0.0
+            anterior = None
+            for orden, (pid, lat, lon) in enumerate(recorrido, start=1):
+                metros = 0.0 if anterior is None else _distancia_m(anterior[1], anterior[2], lat, lon)
+                total_m += metros
+                self.filas["LineasPuntos"].append({
+                    "IdLineaPunto": self._nuevo_id("IdLineaPunto"),
+                    "IdLineaRuta": id_linea_ruta,
+                    "IdPunto": pid,
+                    "Orden": orden,
+                    "Latitud": lat,
+                    "Longitud": lon,
+                    "Distancia": round(metros, 2),
+                    "Tiempo": round(metros / self.velocidad, 2),
+                })
+                anterior = (pid, lat, lon)
+            self.filas["LineaRuta"].append({
+                "IdLineaRuta": id_linea_ruta,
+                "IdLinea": id_linea,
+                "IdRuta": id_ruta,
+                "Descripcion": f"C{id_linea} Ruta {sentido}",
+                "Distancia": round(total_m / 1000, 2),
+                "Tiempo": round(total_m / self.velocidad / 60, 2),
+            })
+
+
+def escalar_hojas(hojas, escala, semilla=0):
+    """Hojas del Excel con la red copiada `escala` veces y conectada."""
+    if escala < 1:
+        raise ValueError("La escala debe ser >= 1")
+
+    columnas = ("IdPunto", "IdLinea", "IdLineaRuta", "IdLineaPunto")
+    hoja_de = {"IdPunto": "Puntos", "IdLinea": "Lineas", "IdLineaRuta": "LineaRuta", "IdLineaPunto": "LineasPuntos"}
+    pasos = {c: int(hojas[hoja_de[c]][c].max()) + 1 for c in columnas}
+
+    puntos = hojas["Puntos"]
+    alto = (puntos["Latitud"].max() - puntos["Latitud"].min()) * (1 + SEPARACION)
+    ancho = (puntos["Longitud"].max() - puntos["Longitud"].min()) * (1 + SEPARACION)
+    columnas_grilla = math.ceil(math.sqrt(escala))
+    celdas = [divmod(k, columnas_grilla) for k in range(escala)]  # (fila, columna)
+
+    copias = [
+        _desplazar(hojas, k, pasos, -fila * alto, col * ancho)
+        for k, (fila, col) in enumerate(celdas)
+    ]
+
+    # Paradas usadas por alguna línea: extremos posibles de las conectoras
+    usadas = np.unique(hojas["LineasPuntos"]["IdPunto"].to_numpy(np.int64))
+    coords = puntos.set_index("IdPunto").loc[usadas, ["Latitud", "Longitud"]].to_numpy()
+
+    conectoras = _Conectoras(
+        {c: escala * pasos[c] for c in columnas},
+        _metros_por_minuto(hojas["LineasPuntos"]),
+        hojas["Lineas"].iloc[0].to_dict(),
+    )
+    rnd = np.random.default_rng(semilla)
+    posicion = {celda: k for k, celda in enumerate(celdas)}
+    for k, (fila, col) in enumerate(celdas):
+        for vecina in ((fila, col + 1), (fila + 1, col)):
+            j = posicion.get(vecina)
+            if j is None:
+                continue
+            for _ in range(CONECTORAS_POR_PAR):
+                ia, ib = rnd.integers(len(usadas), size=2)
+                a = (
+                    int(usadas[ia] + k * pasos["IdPunto"]),
+                    coords[ia, 0] - celdas[k][0] * alto,
+                    coords[ia, 1] + celdas[k][1] * ancho,
+                )
+                b = (
+                    int(usadas[ib] + j * pasos["IdPunto"]),
+                    coords[ib, 0] - celdas[j][0] * alto,
+                    coords[ib, 1] + celdas[j][1] * ancho,
+                )
+                conectoras.agregar(a, b)
+
+    resultado = {}
+    for hoja in hojas:
+        partes = [c[hoja] for c in copias]
+        if conectoras.filas[hoja]:
+            partes.append(pd.DataFrame(conectoras.filas[hoja], columns=hojas[hoja].columns))
+        resultado[hoja] = pd.concat(partes, ignore_index=True)
+    return resultado
+
+
+def escribir_excel(hojas, ruta):
+    with pd.ExcelWriter(ruta, engine="openpyxl") as writer:
+        for nombre, df in hojas.items():
+            df.to_excel(writer, sheet_name=nombre, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--excel", default=EXCEL_POR_DEFECTO)
+    parser.add_argument("--escala", type=int, default=10)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", required=True)
+    args = parser.parse_args(argv)
+
+    hojas = escalar_hojas(leer_hojas(args.excel), args.escala, args.semilla)
+    escribir_excel(hojas, args.salida)
+    print(", ".join(f"{nombre}: {len(df)}" for nombre, df in hojas.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Archivos binarios de arrays de NumPy que los workers abren con mmap.
+
+Formato: una línea mágica, un encabezado JSON (metadatos y, por array,
+dtype, forma y desplazamiento) y después los datos crudos de cada array
+alineados a 64 bytes. Al abrirlo cada array es una vista de solo lectura
+sobre el mismo mapeo, así que varios procesos comparten las páginas del
+sistema operativo en lugar de tener cada uno su copia.
+
+No depende de Django.
+"""
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+MAGICO = b"RUTASBIN1\n"
+ALINEACION = 64
+
+
+@contextmanager
+def escritura_atomica(ruta):
+    """
+    Abre un temporal único junto a `ruta` para escribir en binario y al
+    salir lo reemplaza con `os.replace`: los lectores ven el archivo viejo
+    o el nuevo completo. El nombre lo elige `tempfile`, así que dos hilos
+    o procesos escribiendo la misma ruta no comparten temporal; empieza con
+    punto para que los globs de limpieza no lo tomen. Si algo falla el
+    temporal se borra.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    f = tempfile.NamedTemporaryFile(dir=ruta.parent, prefix=f".{ruta.name}.", suffix=".tmp", delete=False)
+    try:
+        with f:
+            yield f
+        os.replace(f.name, ruta)
+    except BaseException:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+
+
+def _alinear(n):
+    return -(-n // ALINEACION) * ALINEACION
+
+
+def guardar_arrays(ruta, arrays, meta=None):
+    """
+    Escribe `arrays` (dict nombre -> ndarray) y `meta` (dict serializable
+    a JSON) en `ruta`. Se escribe a un temporal y se reemplaza con
+    `os.replace`, así que los lectores ven el archivo viejo o el nuevo
+    completo, nunca uno a medias.
+    """
+    ruta = Path(ruta)
+    arrays = {nombre: np.ascontiguousarray(a) for nombre, a in arrays.items()}
+
+    indice = {}
+    desplazamiento = 0
+    for nombre, a in arrays.items():
+        indice[nombre] = {
+            "dtype": a.dtype.str,
+            "forma": list(a.shape),
+            "desde": desplazamiento,
+        }
+        desplazamiento = _alinear(desplazamiento + a.nbytes)
+
+    encabezado = json.dumps({"meta": meta or {}, "arrays": indice}).encode("utf-8")
+    inicio_datos = _alinear(len(MAGICO) + 8 + len(encabezado))
+
+    with escritura_atomica(ruta) as f:
+        f.write(MAGICO)
+        f.write(len(encabezado).to_bytes(8, "little"))
+        f.write(encabezado)
+        for nombre, a in arrays.items():
+            f.seek(inicio_datos + indice[nombre]["desde"])
+            f.write(a.tobytes())
+        f.truncate(inicio_datos + desplazamiento)
+
+
+def cargar_arrays(ruta):
+    """(arrays, meta) de un archivo de `guardar_arrays`, mapeados en memoria."""
+    with open(ruta, "rb") as f:
+        if f.read(len(MAGICO)) != MAGICO:
+            raise ValueError(f"{ruta} no es un archivo de arrays de rutas")
+        largo = int.from_bytes(f.read(8), "little")
+        encabezado = json.loads(f.read(largo))
+
+    inicio_datos = _alinear(len(MAGICO) + 8 + largo)
+    mapa = np.memmap(ruta, dtype=np.uint8, mode="r")
+
+    arrays = {}
+    for nombre, info in encabezado["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        cantidad = int(np.prod(info["forma"], dtype=np.int64))
+        desde = inicio_datos + info["desde"]
+        datos = mapa[desde:desde + cantidad * dtype.itemsize]
+        arrays[nombre] = datos.view(dtype).reshape(info["forma"])
+    return arrays, encabezado["meta"]
+
+
+def leer_meta(ruta):
+    """Solo los metadatos, sin mapear los datos (None si no existe)."""
+    try:
+        with open(ruta, "rb") as f:
+            if f.read(len(MAGICO)) != MAGICO:
+                return None
+            largo = int.from_bytes(f.read(8), "little")
+            return json.loads(f.read(largo))["meta"]
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,498 @@
+"""
+Algoritmos de búsqueda de caminos sobre el grafo de la red.
+
+Funcionan con cualquier grafo que exponga `get(nodo, default)` con tuplas
+(vecino, costo, ruta_id, modo, edge_id): el dict de `construir_grafo_con_transbordos`
+o el `GrafoCSR` cacheado. A* y la búsqueda bidireccional además necesitan
+coordenadas y aristas invertidas, así que solo corren sobre `GrafoCSR`.
+
+El origen y el destino pueden ser un id de Punto o un dict
+{id: costo_extra} con varias paradas candidatas (p. ej. el tiempo a pie
+desde las coordenadas pedidas): la búsqueda arranca desde todos los
+orígenes a la vez y devuelve el mejor camino hacia cualquiera de los
+destinos, sumando su costo extra. Los pasos no incluyen esos tramos a pie.
+
+Todas aceptan un dict opcional `estadisticas` donde dejan
+`nodos_asentados` e `inserciones_heap`.
+"""
+from heapq import heapify, heappush, heappop
+
+import numpy as np
+
+from .csr import haversine_m_np
+
+INF = float("inf")
+
+
+def _registrar(estadisticas, asentados, inserciones):
+    if estadisticas is not None:
+        estadisticas["nodos_asentados"] = asentados
+        estadisticas["inserciones_heap"] = inserciones
+
+
+def _candidatos(nodos):
+    """Normaliza un id o un dict {id: costo_extra} a dict."""
+    if isinstance(nodos, dict):
+        return {nodo: float(costo) for nodo, costo in nodos.items()}
+    return {nodos: 0.0}
+
+
+def _reconstruir_pasos(previo, destino_id):
+    """Recorre los punteros al predecesor desde el destino hasta el origen."""
+    pasos = []
+    nodo = destino_id
+    while nodo in previo:
+        anterior, ruta_id, modo, edge_id = previo[nodo]
+        pasos.append({
+            "source": anterior,
+            "target": nodo,
+            "ruta_id": ruta_id,
+            "modo": modo,
+            "edge_id": edge_id,
+        })
+        nodo = anterior
+    pasos.reverse()
+    return pasos
+
+
+def dijkstra_con_transbordos(graph, origen_id, destino_id, estadisticas=None):
+    """
+    Devuelve: (costo_total, pasos)
+    pasos = lista de dicts: {source, target, ruta_id, modo, edge_id}
+
+    El heap solo guarda (costo, nodo); el camino se arma una vez al final
+    a partir de los predecesores. Las relajaciones que no mejoran el mejor
+    costo conocido no se insertan y la búsqueda termina cuando el mínimo
+    del heap ya no puede mejorar el mejor destino encontrado.
+    """
+    origenes = _candidatos(origen_id)
+    destinos = _candidatos(destino_id)
+
+    mejor_costo = dict(origenes)
+    previo = {}  # nodo -> (nodo_anterior, ruta_id, modo, edge_id)
+    cerrados = set()
+
+    heap = [(costo, nodo) for nodo, costo in origenes.items()]
+    heapify(heap)
+    inserciones = len(heap)
+
+    mejor = INF
+    llegada = None
+
+    try:
+        while heap:
+            costo, nodo = heappop(heap)
+            if costo >= mejor:
+                break
+
+            if nodo in cerrados:
+                continue
+            cerrados.add(nodo)
+
+            if nodo in destinos and costo + destinos[nodo] < mejor:
+                mejor = costo + destinos[nodo]
+                llegada = nodo
+
+            for vecino, edge_cost, ruta_id, modo, edge_id in graph.get(nodo, ()):
+                nuevo_costo = costo + edge_cost
+                if nuevo_costo < mejor and nuevo_costo < mejor_costo.get(vecino, INF):
+                    mejor_costo[vecino] = nuevo_costo
+                    previo[vecino] = (nodo, ruta_id, modo, edge_id)
+                    heappush(heap, (nuevo_costo, vecino))
+                    inserciones += 1
+
+        if llegada is None:
+            return None, []
+        return mejor, _reconstruir_pasos(previo, llegada)
+    finally:
+        _registrar(estadisticas, len(cerrados), inserciones)
+
+
+def dijkstra_uno_a_muchos(graph, origen_id, destinos, estadisticas=None):
+    """
+    Un solo árbol de Dijkstra desde `origen_id` para varias consultas.
+    `destinos` es una lista de destinos (id o dict {id: costo_extra}, como
+    en `dijkstra_con_transbordos`) y se devuelve una lista alineada de
+    (costo_total, pasos), con (None, []) para los inalcanzables.
+
+    El árbol se expande hasta que el mínimo del heap ya no puede mejorar
+    ninguno de los destinos, es decir, hasta el más lejano de ellos.
+    """
+    origenes = _candidatos(origen_id)
+    consultas = [_candidatos(d) for d in destinos]
+
+    # nodo -> índices de las consultas que lo tienen como candidato
+    por_nodo = {}
+    for j, candidatos in enumerate(consultas):
+        for nodo in candidatos:
+            por_nodo.setdefault(nodo, []).append(j)
+
+    mejor = [INF] * len(consultas)
+    llegada = [None] * len(consultas)
+    sin_resolver = len(consultas)
+    cota = INF  # máximo de `mejor` una vez que todas tienen camino
+
+    mejor_costo = dict(origenes)
+    previo = {}
+    cerrados = set()
+
+    heap = [(costo, nodo) for nodo, costo in origenes.items()]
+    heapify(heap)
+    inserciones = len(heap)
+
+    try:
+        while heap:
+            costo, nodo = heappop(heap)
+            if costo >= cota:
+                break
+
+            if nodo in cerrados:
+                continue
+            cerrados.add(nodo)
+
+            for j in por_nodo.get(nodo, ()):
+                total = costo + consultas[j][nodo]
+                if total < mejor[j]:
+                    if llegada[j] is None:
+                        sin_resolver -= 1
+                    mejor[j] = total
+                    llegada[j] = nodo
+                    if not sin_resolver:
+                        cota = max(mejor)
+
+            for vecino, edge_cost, ruta_id, modo, edge_id in graph.get(nodo, ()):
+                nuevo_costo = costo + edge_cost
+                if nuevo_costo < cota and nuevo_costo < mejor_costo.get(vecino, INF):
+                    mejor_costo[vecino] = nuevo_costo
+                    previo[vecino] = (nodo, ruta_id, modo, edge_id)
+                    heappush(heap, (nuevo_costo, vecino))
+                    inserciones += 1
+
+        return [
+            (None, []) if nodo is None else (costo, _reconstruir_pasos(previo, nodo))
+            for costo, nodo in zip(mejor, llegada)
+        ]
+    finally:
+        _registrar(estadisticas, len(cerrados), inserciones)
+
+
+def dijkstra_uno_a_todos(graph, origen_id, limite=INF, objetivos=None, estadisticas=None):
+    """
+    Costo mínimo desde `origen_id` (id o dict {id: costo_extra}) a todos
+    los nodos alcanzables con costo <= `limite`: dict {nodo: costo}.
+
+    Sin predecesores ni pasos, pensado para isocronas y matrices. Si se
+    pasa `objetivos` (conjunto de nodos) la búsqueda termina en cuanto
+    todos quedan asentados.
+    """
+    origenes = _candidatos(origen_id)
+    pendientes = set(objetivos) if objetivos is not None else None
+
+    costos = {}
+    mejor_costo = {nodo: costo for nodo, costo in origenes.items() if costo <= limite}
+    heap = [(costo, nodo) for nodo, costo in mejor_costo.items()]
+    heapify(heap)
+    inserciones = len(heap)
+
+    try:
+        while heap:
+            costo, nodo = heappop(heap)
+            if nodo in costos:
+                continue
+            costos[nodo] = costo
+
+            if pendientes is not None:
+                pendientes.discard(nodo)
+                if not pendientes:
+                    break
+
+            for vecino, edge_cost, _, _, _ in graph.get(nodo, ()):
+                nuevo_costo = costo + edge_cost
+                if nuevo_costo <= limite and nuevo_costo < mejor_costo.get(vecino, INF):
+                    mejor_costo[vecino] = nuevo_costo
+                    heappush(heap, (nuevo_costo, vecino))
+                    inserciones += 1
+
+        return costos
+    finally:
+        _registrar(estadisticas, len(costos), inserciones)
+
+
+def astar_con_transbordos(graph, origen_id, destino_id, estadisticas=None):
+    """
+    A* con cota inferior: la mayor entre las cotas ALT de los landmarks del
+    grafo (`GrafoCSR.cotas_landmarks`) y la geográfica, distancia haversine
+    al destino dividida por `graph.velocidad_maxima` (solo si es finita;
+    una arista de costo 0 entre puntos distintos la anula). Con varios
+    destinos la cota es el mínimo entre ellos de (cota + costo extra).
+    Ambas cotas son consistentes, así que un nodo cerrado no se reabre.
+    Misma salida que `dijkstra_con_transbordos`.
+    """
+    origenes = _candidatos(origen_id)
+    destinos = _candidatos(destino_id)
+
+    velocidad = graph.velocidad_maxima
+    cotas = np.full(len(graph.nodos), INF)
+    for destino, extra in destinos.items():
+        i = graph.indice(destino)
+        if i is None:
+            cotas[:] = 0.0  # destino fuera del grafo: sin cota
+            break
+        cota_destino = graph.cotas_landmarks(i)
+        if 0 < velocidad < INF and not np.isnan(graph.lats[i]):
+            # NaN (nodo sin coordenadas) -> 0
+            geografica = haversine_m_np(graph.lats, graph.lons, graph.lats[i], graph.lons[i]) / velocidad
+            cota_destino = np.maximum(cota_destino, np.nan_to_num(geografica, nan=0.0))
+        cotas = np.minimum(cotas, cota_destino + extra)
+    cotas = cotas.tolist()
+    nodos = graph.nodos
+
+    def cota(nodo):
+        return cotas[int(np.searchsorted(nodos, nodo))]
+
+    mejor_costo = dict(origenes)
+    previo = {}
+    cerrados = set()
+
+    heap = [(costo + cota(nodo), costo, nodo) for nodo, costo in origenes.items()]
+    heapify(heap)
+    inserciones = len(heap)
+
+    mejor = INF
+    llegada = None
+
+    try:
+        while heap:
+            estimado, costo, nodo = heappop(heap)
+            if estimado >= mejor:
+                break
+
+            if nodo in cerrados:
+                continue
+            cerrados.add(nodo)
+
+            if nodo in destinos and costo + destinos[nodo] < mejor:
+                mejor = costo + destinos[nodo]
+                llegada = nodo
+
+            for vecino, edge_cost, ruta_id, modo, edge_id in graph.get(nodo, ()):
+                nuevo_costo = costo + edge_cost
+                if vecino not in cerrados and nuevo_costo < mejor_costo.get(vecino, INF):
+                    mejor_costo[vecino] = nuevo_costo
+                    previo[vecino] = (nodo, ruta_id, modo, edge_id)
+                    heappush(heap, (nuevo_costo + cota(vecino), nuevo_costo, vecino))
+                    inserciones += 1
+
+        if llegada is None:
+            return None, []
+        return mejor, _reconstruir_pasos(previo, llegada)
+    finally:
+        _registrar(estadisticas, len(cerrados), inserciones)
+
+
+def dijkstra_bidireccional(graph, origen_id, destino_id, estadisticas=None):
+    """
+    Dijkstra simultáneo desde el origen (grafo normal) y desde el destino
+    (grafo invertido). Se detiene cuando la suma de los mínimos de ambos
+    heaps ya no puede mejorar el mejor camino que une las dos búsquedas.
+    Los costos extra de los destinos son el costo inicial de la búsqueda
+    hacia atrás. Misma salida que `dijkstra_con_transbordos`.
+    """
+    origenes = _candidatos(origen_id)
+    destinos = _candidatos(destino_id)
+
+    grafos = (graph, graph.invertido())
+    costos = (dict(origenes), dict(destinos))
+    # adelante: nodo -> (anterior, ruta, modo, edge); atrás: nodo -> (siguiente, ruta, modo, edge)
+    enlaces = ({}, {})
+    cerrados = (set(), set())
+    heaps = tuple(
+        sorted((costo, nodo) for nodo, costo in candidatos.items())
+        for candidatos in (origenes, destinos)
+    )
+    inserciones = len(origenes) + len(destinos)
+
+    # Paradas que ya son origen y destino a la vez
+    mejor = INF
+    encuentro = None
+    for nodo, costo in origenes.items():
+        if nodo in destinos and costo + destinos[nodo] < mejor:
+            mejor = costo + destinos[nodo]
+            encuentro = nodo
+
+    try:
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= mejor:
+                break
+
+            # Se expande el lado con el heap más chico
+            lado = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            otro = 1 - lado
+
+            costo, nodo = heappop(heaps[lado])
+            if nodo in cerrados[lado]:
+                continue
+            cerrados[lado].add(nodo)
+
+            for vecino, edge_cost, ruta_id, modo, edge_id in grafos[lado].get(nodo, ()):
+                nuevo_costo = costo + edge_cost
+                if nuevo_costo < costos[lado].get(vecino, INF):
+                    costos[lado][vecino] = nuevo_costo
+                    enlaces[lado][vecino] = (nodo, ruta_id, modo, edge_id)
+                    heappush(heaps[lado], (nuevo_costo, vecino))
+                    inserciones += 1
+
+                    total = nuevo_costo + costos[otro].get(vecino, INF)
+                    if total < mejor:
+                        mejor = total
+                        encuentro = vecino
+
+        if encuentro is None:
+            return None, []
+
+        pasos = _reconstruir_pasos(enlaces[0], encuentro)
+        nodo = encuentro
+        while nodo in enlaces[1]:
+            siguiente, ruta_id, modo, edge_id = enlaces[1][nodo]
+            pasos.append({
+                "source": nodo,
+                "target": siguiente,
+                "ruta_id": ruta_id,
+                "modo": modo,
+                "edge_id": edge_id,
+            })
+            nodo = siguiente
+        return mejor, pasos
+    finally:
+        _registrar(estadisticas, len(cerrados[0]) + len(cerrados[1]), inserciones)
+
+
+def pareto_con_transbordos(graph, origen_id, destino_id, max_transbordos=None, estadisticas=None):
+    """
+    Búsqueda multicriterio (costo, transbordos) por etiquetas.
+
+    Un transbordo es tomar una arista de bus de una ruta distinta a la
+    última en la que se viajó (subir a la primera no cuenta; caminar no
+    cambia la ruta actual). Cada etiqueta es (costo, transbordos, nodo,
+    ruta actual); se asientan en orden de (costo, transbordos) y una
+    etiqueta se descarta si ya hay una asentada en el mismo nodo que la
+    domina:
+      - misma ruta (o sin ruta todavía) con menos o igual transbordos, o
+      - cualquier otra ruta con al menos un transbordo menos (le alcanza
+        con un transbordo para seguir por el mismo camino).
+    Como se asientan por costo, la asentada nunca cuesta más.
+
+    Devuelve el frente de Pareto como lista de (costo_total, transbordos,
+    pasos), de menor costo a menor cantidad de transbordos. Sin
+    `max_transbordos` la primera opción tiene el mismo costo que
+    `dijkstra_con_transbordos`.
+    """
+    origenes = _candidatos(origen_id)
+    destinos = _candidatos(destino_id)
+    limite = INF if max_transbordos is None else max_transbordos
+
+    # Etiquetas en listas paralelas: índice -> datos
+    e_nodo, e_ruta, e_trans, e_padre, e_paso = [], [], [], [], []
+    SUMIDERO = object()  # nodo virtual: etiqueta que ya llegó a un destino
+
+    def nueva(nodo, ruta, transbordos, padre, paso):
+        e_nodo.append(nodo)
+        e_ruta.append(ruta)
+        e_trans.append(transbordos)
+        e_padre.append(padre)
+        e_paso.append(paso)
+        return len(e_nodo) - 1
+
+    # Asentadas: (nodo, ruta) -> mínimo de transbordos; nodo -> mínimo con cualquier ruta
+    min_por_estado = {}
+    min_por_nodo = {}
+    sin_ruta = set()  # nodos asentados sin haber subido a ningún bus
+
+    def dominada(nodo, ruta, transbordos):
+        if nodo in sin_ruta:
+            return True
+        if min_por_estado.get((nodo, ruta), INF) <= transbordos:
+            return True
+        return min_por_nodo.get(nodo, INF) + 1 <= transbordos
+
+    heap = []
+    for nodo, costo in origenes.items():
+        heap.append((costo, 0, nueva(nodo, None, 0, None, None)))
+    heapify(heap)
+    inserciones = len(heap)
+    asentadas = 0
+
+    frente = []
+    min_trans_frente = INF  # etiquetas con más transbordos ya no sirven
+
+    try:
+        while heap:
+            costo, transbordos, etiqueta = heappop(heap)
+            if transbordos >= min_trans_frente:
+                continue
+            nodo, ruta = e_nodo[etiqueta], e_ruta[etiqueta]
+
+            if nodo is SUMIDERO:
+                frente.append((costo, transbordos, etiqueta))
+                min_trans_frente = transbordos
+                if transbordos == 0:
+                    break
+                continue
+
+            if dominada(nodo, ruta, transbordos):
+                continue
+            asentadas += 1
+            if ruta is None:
+                sin_ruta.add(nodo)
+            else:
+                min_por_estado[(nodo, ruta)] = min(min_por_estado.get((nodo, ruta), INF), transbordos)
+                min_por_nodo[nodo] = min(min_por_nodo.get(nodo, INF), transbordos)
+
+            if nodo in destinos:
+                heappush(heap, (costo + destinos[nodo], transbordos, nueva(SUMIDERO, None, transbordos, etiqueta, None)))
+                inserciones += 1
+
+            for vecino, edge_cost, ruta_id, modo, edge_id in graph.get(nodo, ()):
+                if modo == "bus" and ruta_id is not None:
+                    nuevo_trans = transbordos + (ruta is not None and ruta != ruta_id)
+                    nueva_ruta = ruta_id
+                else:
+                    nuevo_trans = transbordos
+                    nueva_ruta = ruta
+                if nuevo_trans > limite or nuevo_trans >= min_trans_frente:
+                    continue
+                if dominada(vecino, nueva_ruta, nuevo_trans):
+                    continue
+                heappush(heap, (
+                    costo + edge_cost, nuevo_trans,
+                    nueva(vecino, nueva_ruta, nuevo_trans, etiqueta, (ruta_id, modo, edge_id)),
+                ))
+                inserciones += 1
+
+        opciones = []
+        for costo, transbordos, sumidero in frente:
+            pasos = []
+            etiqueta = e_padre[sumidero]
+            while e_padre[etiqueta] is not None:
+                anterior = e_padre[etiqueta]
+                ruta_id, modo, edge_id = e_paso[etiqueta]
+                pasos.append({
+                    "source": e_nodo[anterior],
+                    "target": e_nodo[etiqueta],
+                    "ruta_id": ruta_id,
+                    "modo": modo,
+                    "edge_id": edge_id,
+                })
+                etiqueta = anterior
+            pasos.reverse()
+            opciones.append((costo, transbordos, pasos))
+        return opciones
+    finally:
+        _registrar(estadisticas, asentadas, inserciones)
+
+
+ALGORITMOS = {
+    "dijkstra": dijkstra_con_transbordos,
+    "astar": astar_con_transbordos,
+    "bidireccional": dijkstra_bidireccional,
+}
@@ -0,0 +1,241 @@
+"""
+Caché de respuestas de `ruta_optima`.
+
+La clave combina la versión de la red, las paradas candidatas de origen y
+de destino (con su costo a pie redondeado a `RESOLUCION_MIN`) y las
+opciones de búsqueda, así que al cambiar la red las claves viejas dejan
+de pedirse. Además, la primera consulta con una versión nueva limpia el
+backend si este lo permite.
+
+Backends (`settings.RUTAS_CACHE_RUTAS["BACKEND"]`):
+  - "memoria": LRU acotado + TTL en cada worker.
+  - "archivo": un JSON por clave en `RUTAS_CACHE_DIR/respuestas`,
+    compartido entre workers de la misma máquina.
+  - "django": cualquier caché de `CACHES` (`ALIAS`), p. ej. Redis o
+    Memcached, compartida entre máquinas. No informa desalojos.
+
+Los contadores (aciertos, fallos, desalojos) son por proceso.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .binario import escritura_atomica
+from .payloads import directorio_cache
+
+CONFIG_POR_DEFECTO = {
+    "BACKEND": "memoria",
+    "MAXIMO": 10000,       # entradas (memoria y archivo)
+    "TTL": 3600,           # segundos
+    "RESOLUCION_MIN": 0.05,  # minutos a pie (~4 m) que se consideran iguales
+    "ALIAS": "default",    # backend "django"
+}
+
+
+def configuracion():
+    return {**CONFIG_POR_DEFECTO, **getattr(settings, "RUTAS_CACHE_RUTAS", {})}
+
+
+class CacheMemoria:
+    nombre = "memoria"
+
+    def __init__(self, maximo, ttl, **_):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.desalojos = 0
+        self._datos = OrderedDict()  # clave -> (vence, valor)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence < time.monotonic():
+                del self._datos[clave]
+                self.desalojos += 1
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def limpiar(self, version):
+        with self._lock:
+            self._datos.clear()
+
+    def entradas(self):
+        return len(self._datos)
+
+
+class CacheArchivo:
+    """
+    Un archivo por clave. El TTL y el orden LRU salen del mtime, que se
+    actualiza en cada acierto; el tamaño se recorta cada `REVISAR_CADA`
+    escrituras para no listar el directorio en cada una.
+    """
+    nombre = "archivo"
+    REVISAR_CADA = 100
+
+    def __init__(self, maximo, ttl, directorio=None, **_):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.directorio = directorio or directorio_cache() / "respuestas"
+        self.desalojos = 0
+        self._escrituras = 0
+
+    def _archivo(self, clave):
+        # Las claves empiezan con "rutas:optima:v{version}:"; el prefijo permite
+        # borrar solo las de otras versiones
+        version = clave.split(":")[2]
+        return self.directorio / f"{version}-{hashlib.sha256(clave.encode()).hexdigest()}.json"
+
+    def obtener(self, clave):
+        archivo = self._archivo(clave)
+        try:
+            if archivo.stat().st_mtime + self.ttl < time.time():
+                archivo.unlink(missing_ok=True)
+                self.desalojos += 1
+                return None
+            valor = json.loads(archivo.read_bytes())
+            os.utime(archivo)
+            return valor
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def guardar(self, clave, valor):
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        archivo = self._archivo(clave)
+        with escritura_atomica(archivo) as f:
+            f.write(json.dumps(valor, ensure_ascii=False).encode("utf-8"))
+
+        self._escrituras += 1
+        if self._escrituras % self.REVISAR_CADA == 0:
+            self._recortar()
+
+    def _recortar(self):
+        archivos = list(self.directorio.glob("*.json"))
+        if len(archivos) <= self.maximo:
+            return
+        archivos.sort(key=lambda a: a.stat().st_mtime)
+        for archivo in archivos[:len(archivos) - self.maximo]:
+            archivo.unlink(missing_ok=True)
+            self.desalojos += 1
+
+    def limpiar(self, version):
+        for archivo in self.directorio.glob("*.json"):
+            if not archivo.name.startswith(f"v{version}-"):
+                archivo.unlink(missing_ok=True)
+
+    def entradas(self):
+        return sum(1 for _ in self.directorio.glob("*.json"))
+
+
+class CacheDjango:
+    nombre = "django"
+
+    def __init__(self, maximo, ttl, alias="default", **_):
+        self.ttl = ttl
+        self.cache = caches[alias]
+        self.desalojos = 0  # el framework de caché no lo informa
+
+    def obtener(self, clave):
+        return self.cache.get(clave)
+
+    def guardar(self, clave, valor):
+        self.cache.set(clave, valor, self.ttl)
+
+    def limpiar(self, version):
+        # No se vacía una caché compartida: las claves llevan la versión
+        pass
+
+    def entradas(self):
+        return None  # desconocido en una caché compartida
+
+
+BACKENDS = {b.nombre: b for b in (CacheMemoria, CacheArchivo, CacheDjango)}
+
+
+class CacheRespuestas:
+
+    def __init__(self, backend, resolucion_min):
+        self.backend = backend
+        self.resolucion_min = resolucion_min
+        self.aciertos = 0
+        self.fallos = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def redondear(self, candidatas):
+        """Costos a pie redondeados a la resolución de la caché."""
+        r = self.resolucion_min
+        return {p: round(costo / r) * r for p, costo in candidatas.items()} if r else candidatas
+
+    def clave(self, version, origenes, destinos, opciones):
+        contenido = json.dumps(
+            [sorted(origenes.items()), sorted(destinos.items()), sorted(opciones.items())],
+            separators=(",", ":"), default=str,
+        )
+        return f"rutas:optima:v{version}:{hashlib.sha1(contenido.encode()).hexdigest()}"
+
+    def _revisar_version(self, version):
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if self._version is not None:
+                        self.backend.limpiar(version)
+                    self._version = version
+
+    def obtener(self, version, clave):
+        self._revisar_version(version)
+        valor = self.backend.obtener(clave)
+        if valor is None:
+            self.fallos += 1
+        else:
+            self.aciertos += 1
+        return valor
+
+    def guardar(self, version, clave, valor):
+        self._revisar_version(version)
+        self.backend.guardar(clave, valor)
+
+    def estadisticas(self):
+        return {
+            "backend": self.backend.nombre,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.backend.desalojos,
+            "entradas": self.backend.entradas(),
+            "version": self._version,
+        }
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def obtener_cache():
+    """Caché de respuestas del proceso, creada según la configuración."""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                config = configuracion()
+                backend = BACKENDS[config["BACKEND"]](
+                    maximo=config["MAXIMO"], ttl=config["TTL"], alias=config["ALIAS"],
+                )
+                _cache = CacheRespuestas(backend, config["RESOLUCION_MIN"])
+    return _cache
@@ -0,0 +1,346 @@
+"""
+Jerarquía de contracción (CH) sobre el grafo CSR de la red.
+
+Preproceso: los nodos se contraen de a uno en orden de importancia
+(diferencia de aristas + vecinos ya contraídos). Al contraer `v`, por
+cada par u -> v -> w sin un camino testigo igual o más corto que evite
+`v` se agrega un atajo u -> w que recuerda los dos arcos que reemplaza.
+Las aristas paralelas se reducen a la de menor costo y los self-loops
+(transbordos en la misma parada) se descartan: no cambian ningún costo
+mínimo entre paradas.
+
+Consulta: Dijkstra bidireccional que solo sube de rango en ambos
+sentidos; cada lado se detiene cuando su mínimo ya no mejora el mejor
+encuentro. El camino se desempaqueta recursivamente hasta los arcos
+originales, así que los pasos son los mismos que devuelve
+`dijkstra_con_transbordos` (mismo formato y mismo costo).
+
+El índice se guarda con `rutas.binario` para que los workers lo abran
+con mmap. No depende de Django.
+"""
+from heapq import heapify, heappush, heappop
+
+import numpy as np
+
+from .binario import guardar_arrays, cargar_arrays
+from .busqueda import INF, _candidatos, _registrar
+from .csr import MODOS, SIN_RUTA, SIN_EDGE
+
+SIN_HIJO = -1
+
+# Nodos que puede asentar cada búsqueda de testigos. Si se corta antes de
+# encontrar un testigo se agrega el atajo igual: sobra, pero no es incorrecto.
+LIMITE_TESTIGO = 60
+
+ARRAYS = (
+    "nodos", "rango",
+    "arriba_offsets", "arriba_destinos", "arriba_costos", "arriba_arcos",
+    "abajo_offsets", "abajo_destinos", "abajo_costos", "abajo_arcos",
+    "arco_origen", "arco_destino", "arco_costo",
+    "arco_hijo1", "arco_hijo2", "arco_ruta", "arco_modo", "arco_edge",
+)
+
+
+class JerarquiaContraccion:
+    """
+    Arrays (índices densos, como en GrafoCSR):
+      arriba_*  aristas de cada nodo hacia nodos de mayor rango
+      abajo_*   aristas que llegan a cada nodo desde nodos de mayor rango,
+                guardadas al revés (destino = nodo de origen del arco)
+      arco_*    tabla de arcos; los atajos tienen sus dos hijos, los
+                arcos originales la ruta, el modo y el pk de Edge
+    """
+
+    def __init__(self, arrays, meta=None):
+        for nombre in ARRAYS:
+            setattr(self, nombre, arrays[nombre])
+        self.meta = dict(meta or {})
+
+    # ---------- Persistencia ----------
+
+    def guardar(self, ruta):
+        guardar_arrays(ruta, {nombre: getattr(self, nombre) for nombre in ARRAYS}, self.meta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Abre el índice con mmap (solo lectura, compartido entre procesos)."""
+        arrays, meta = cargar_arrays(ruta)
+        return cls(arrays, meta)
+
+    # ---------- Consultas ----------
+
+    def __len__(self):
+        return len(self.nodos)
+
+    @property
+    def num_atajos(self):
+        return int(np.count_nonzero(self.arco_hijo1 != SIN_HIJO))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, nombre).nbytes for nombre in ARRAYS)
+
+    def _indices(self, candidatos):
+        """{índice denso: costo} de los ids que existen en el índice."""
+        resultado = {}
+        for nodo_id, costo in candidatos.items():
+            i = int(np.searchsorted(self.nodos, nodo_id))
+            if i < len(self.nodos) and self.nodos[i] == nodo_id:
+                resultado[i] = costo
+        return resultado
+
+    def _vecinos(self, lado, i):
+        if lado == 0:
+            offsets, destinos, costos, arcos = (
+                self.arriba_offsets, self.arriba_destinos, self.arriba_costos, self.arriba_arcos,
+            )
+        else:
+            offsets, destinos, costos, arcos = (
+                self.abajo_offsets, self.abajo_destinos, self.abajo_costos, self.abajo_arcos,
+            )
+        a, b = offsets[i], offsets[i + 1]
+        return zip(destinos[a:b].tolist(), costos[a:b].tolist(), arcos[a:b].tolist())
+
+    def buscar(self, origen_id, destino_id, estadisticas=None):
+        """
+        Misma interfaz y salida que `dijkstra_con_transbordos`: origen y
+        destino son ids de Punto o dicts {id: costo_extra}.
+        """
+        inicios = (
+            self._indices(_candidatos(origen_id)),
+            self._indices(_candidatos(destino_id)),
+        )
+        costos = (dict(inicios[0]), dict(inicios[1]))
+        previo = ({}, {})  # nodo -> arco por el que se llegó
+        cerrados = (set(), set())
+        heaps = tuple([(c, i) for i, c in inicio.items()] for inicio in inicios)
+        for heap in heaps:
+            heapify(heap)
+        inserciones = len(heaps[0]) + len(heaps[1])
+
+        mejor = INF
+        encuentro = None
+
+        try:
+            while True:
+                activos = [lado for lado in (0, 1) if heaps[lado] and heaps[lado][0][0] < mejor]
+                if not activos:
+                    break
+                lado = min(activos, key=lambda l: heaps[l][0][0])
+                otro = 1 - lado
+
+                costo, nodo = heappop(heaps[lado])
+                if nodo in cerrados[lado]:
+                    continue
+                cerrados[lado].add(nodo)
+
+                total = costo + costos[otro].get(nodo, INF)
+                if total < mejor:
+                    mejor = total
+                    encuentro = nodo
+
+                for vecino, arco_costo, arco in self._vecinos(lado, nodo):
+                    nuevo_costo = costo + arco_costo
+                    if nuevo_costo < costos[lado].get(vecino, INF):
+                        costos[lado][vecino] = nuevo_costo
+                        previo[lado][vecino] = arco
+                        heappush(heaps[lado], (nuevo_costo, vecino))
+                        inserciones += 1
+
+            if encuentro is None:
+                return None, []
+            return mejor, self._pasos(previo, encuentro)
+        finally:
+            _registrar(estadisticas, len(cerrados[0]) + len(cerrados[1]), inserciones)
+
+    def _pasos(self, previo, encuentro):
+        # Arcos del camino: subida desde el origen y bajada hacia el destino
+        arcos = []
+        nodo = encuentro
+        while nodo in previo[0]:
+            arco = previo[0][nodo]
+            arcos.append(arco)
+            nodo = int(self.arco_origen[arco])
+        arcos.reverse()
+        nodo = encuentro
+        while nodo in previo[1]:
+            arco = previo[1][nodo]
+            arcos.append(arco)
+            nodo = int(self.arco_destino[arco])
+
+        pasos = []
+        pila = list(reversed(arcos))
+        while pila:
+            arco = pila.pop()
+            hijo1 = int(self.arco_hijo1[arco])
+            if hijo1 != SIN_HIJO:
+                pila.append(int(self.arco_hijo2[arco]))
+                pila.append(hijo1)
+                continue
+            ruta = int(self.arco_ruta[arco])
+            edge = int(self.arco_edge[arco])
+            pasos.append({
+                "source": int(self.nodos[self.arco_origen[arco]]),
+                "target": int(self.nodos[self.arco_destino[arco]]),
+                "ruta_id": None if ruta == SIN_RUTA else ruta,
+                "modo": MODOS[int(self.arco_modo[arco])],
+                "edge_id": None if edge == SIN_EDGE else edge,
+            })
+        return pasos
+
+
+# ---------- Construcción ----------
+
+def construir_jerarquia(grafo, limite_testigo=LIMITE_TESTIGO, meta=None):
+    """Contrae todos los nodos de un `GrafoCSR` y devuelve la jerarquía."""
+    n = len(grafo)
+    origen = np.repeat(np.arange(n, dtype=np.int64), np.diff(grafo.offsets))
+    destino = grafo.destinos.astype(np.int64)
+
+    # Arista de menor costo por (origen, destino), sin self-loops
+    orden = np.lexsort((grafo.costos, destino, origen))
+    orden = orden[origen[orden] != destino[orden]]
+    primero = np.ones(len(orden), dtype=bool)
+    primero[1:] = (
+        (origen[orden][1:] != origen[orden][:-1])
+        | (destino[orden][1:] != destino[orden][:-1])
+    )
+    base = orden[primero]
+
+    arco_origen = origen[base].tolist()
+    arco_destino = destino[base].tolist()
+    arco_costo = grafo.costos[base].tolist()
+    arco_hijo1 = [SIN_HIJO] * len(base)
+    arco_hijo2 = [SIN_HIJO] * len(base)
+    arco_ruta = grafo.rutas[base].tolist()
+    arco_modo = grafo.modos[base].tolist()
+    arco_edge = grafo.edges[base].tolist()
+
+    # Adyacencia entre nodos aún no contraídos: vecino -> arco
+    salientes = [{} for _ in range(n)]
+    entrantes = [{} for _ in range(n)]
+    for arco, (u, v) in enumerate(zip(arco_origen, arco_destino)):
+        salientes[u][v] = arco
+        entrantes[v][u] = arco
+
+    def testigos(u, excluido, objetivos, limite_costo):
+        """Costos desde u (sin pasar por `excluido`) hasta los objetivos."""
+        dist = {u: 0.0}
+        heap = [(0.0, u)]
+        pendientes = set(objetivos)
+        asentados = 0
+        while heap and pendientes and asentados < limite_testigo:
+            costo, x = heappop(heap)
+            if costo > limite_costo:
+                break
+            if costo > dist.get(x, INF):
+                continue
+            asentados += 1
+            pendientes.discard(x)
+            for y, arco in salientes[x].items():
+                if y == excluido:
+                    continue
+                nuevo = costo + arco_costo[arco]
+                if nuevo < dist.get(y, INF):
+                    dist[y] = nuevo
+                    heappush(heap, (nuevo, y))
+        return dist
+
+    def atajos_necesarios(v):
+        """Lista de (u, w, costo, arco_uv, arco_vw) que exige contraer v."""
+        atajos = []
+        for u, arco_uv in entrantes[v].items():
+            via = {
+                w: arco_costo[arco_uv] + arco_costo[arco_vw]
+                for w, arco_vw in salientes[v].items() if w != u
+            }
+            if not via:
+                continue
+            dist = testigos(u, v, via.keys(), max(via.values()))
+            for w, costo in via.items():
+                if dist.get(w, INF) > costo:
+                    atajos.append((u, w, costo, arco_uv, salientes[v][w]))
+        return atajos
+
+    contraidos_vecinos = [0] * n
+    nivel = [0] * n
+
+    def prioridad(v):
+        atajos = len(atajos_necesarios(v))
+        return atajos - len(entrantes[v]) - len(salientes[v]) + contraidos_vecinos[v] + nivel[v]
+
+    heap = [(prioridad(v), v) for v in range(n)]
+    heapify(heap)
+
+    rango = np.zeros(n, dtype=np.int64)
+    arriba = [None] * n
+    abajo = [None] * n
+    siguiente_rango = 0
+
+    while heap:
+        _, v = heappop(heap)
+        if arriba[v] is not None:
+            continue
+        # Actualización perezosa: si ya no es el mínimo se reinserta
+        actual = prioridad(v)
+        if heap and actual > heap[0][0]:
+            heappush(heap, (actual, v))
+            continue
+
+        for u, w, costo, arco_uv, arco_vw in atajos_necesarios(v):
+            existente = salientes[u].get(w)
+            if existente is not None and arco_costo[existente] <= costo:
+                continue
+            arco = len(arco_costo)
+            arco_origen.append(u)
+            arco_destino.append(w)
+            arco_costo.append(costo)
+            arco_hijo1.append(arco_uv)
+            arco_hijo2.append(arco_vw)
+            arco_ruta.append(SIN_RUTA)
+            arco_modo.append(0)
+            arco_edge.append(SIN_EDGE)
+            salientes[u][w] = arco
+            entrantes[w][u] = arco
+
+        rango[v] = siguiente_rango
+        siguiente_rango += 1
+        arriba[v] = list(salientes[v].values())
+        abajo[v] = list(entrantes[v].values())
+
+        for u in entrantes[v]:
+            del salientes[u][v]
+            contraidos_vecinos[u] += 1
+            nivel[u] = max(nivel[u], nivel[v] + 1)
+        for w in salientes[v]:
+            del entrantes[w][v]
+            contraidos_vecinos[w] += 1
+            nivel[w] = max(nivel[w], nivel[v] + 1)
+
+    arcos = {
+        "arco_origen": np.array(arco_origen, dtype=np.int32),
+        "arco_destino": np.array(arco_destino, dtype=np.int32),
+        "arco_costo": np.array(arco_costo, dtype=np.float64),
+        "arco_hijo1": np.array(arco_hijo1, dtype=np.int32),
+        "arco_hijo2": np.array(arco_hijo2, dtype=np.int32),
+        "arco_ruta": np.array(arco_ruta, dtype=np.int64),
+        "arco_modo": np.array(arco_modo, dtype=np.int8),
+        "arco_edge": np.array(arco_edge, dtype=np.int64),
+    }
+
+    def csr(listas, extremo):
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(l) for l in listas], out=offsets[1:])
+        ids = np.array([a for l in listas for a in l], dtype=np.int32)
+        return offsets, arcos[extremo][ids], arcos["arco_costo"][ids], ids
+
+    arriba_csr = csr(arriba, "arco_destino")
+    abajo_csr = csr(abajo, "arco_origen")
+
+    return JerarquiaContraccion({
+        "nodos": np.asarray(grafo.nodos, dtype=np.int64),
+        "rango": rango,
+        **dict(zip(("arriba_offsets", "arriba_destinos", "arriba_costos", "arriba_arcos"), arriba_csr)),
+        **dict(zip(("abajo_offsets", "abajo_destinos", "abajo_costos", "abajo_arcos"), abajo_csr)),
+        **arcos,
+    }, meta)
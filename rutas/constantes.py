@@ -0,0 +1,17 @@
+"""Parámetros de la red compartidos por vistas, comandos y benchmarks."""
+
+TRANSFER_RADIUS_METERS = 25  # radio máximo de un transbordo a pie entre paradas
+
+WALK_SPEED = 80              # velocidad caminando (metros/minuto)
+
+SNAP_RADIUS_METERS = 400     # distancia máxima a pie hasta/desde una parada
+SNAP_K = 5                   # paradas candidatas en el origen y en el destino
+
+
+def costo_caminata(distancia_m):
+    """
+    Minutos a pie para `distancia_m` metros: el costo de un transbordo entre
+    paradas, tanto los que guarda `generar_transbordos` como los que agrega
+    el grafo al cargarse. Acepta escalares o arrays de NumPy.
+    """
+    return distancia_m / WALK_SPEED
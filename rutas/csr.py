@@ -0,0 +1,329 @@
+"""
+Grafo compacto en formato CSR (compressed sparse row).
+
+Las aristas salientes de cada nodo quedan contiguas en arrays de NumPy:
+para el nodo de índice `i` ocupan `offsets[i]:offsets[i + 1]`. Los ids de
+`Punto` se guardan ordenados en `nodos` y el índice denso de un id se
+obtiene con búsqueda binaria, así que no hace falta un dict por nodo.
+
+El grafo se puede guardar en un snapshot binario que los workers abren
+con mmap (`guardar` / `cargar`).
+
+No depende de Django; `rutas.grafo` lo construye a partir de la BD.
+"""
+from heapq import heappush, heappop
+
+import numpy as np
+
+from .binario import guardar_arrays, cargar_arrays
+from .espacial import RADIO_TIERRA_M, IndiceEspacial
+
+MODO_BUS = 0
+MODO_TRANSFER = 1
+MODOS = ("bus", "transfer")
+
+SIN_RUTA = -1  # ruta_id nulo (transbordos a pie)
+SIN_EDGE = -1  # arista que no viene de la tabla Edge (transbordo en memoria)
+
+# Arrays que se guardan en el snapshot (además de lats/lons si hay)
+ARRAYS = ("nodos", "offsets", "destinos", "costos", "rutas", "modos", "edges")
+
+LANDMARKS = 8  # nodos de referencia para las cotas ALT de A*
+
+
+class GrafoCSR:
+
+    def __init__(self, nodos, offsets, destinos, costos, rutas, modos, edges, lats=None, lons=None):
+        self.nodos = nodos          # int64[n]   id de Punto, ordenados
+        self.offsets = offsets      # int64[n+1]
+        self.destinos = destinos    # int32[m]   índice denso del destino
+        self.costos = costos        # float64[m]
+        self.rutas = rutas          # int64[m]   ruta_id o SIN_RUTA
+        self.modos = modos          # int8[m]    MODO_BUS / MODO_TRANSFER
+        self.edges = edges          # int64[m]   pk de Edge o SIN_EDGE
+        self.lats = lats            # float64[n] NaN si no se conoce
+        self.lons = lons            # float64[n]
+        self._invertido = None
+        self._velocidad_maxima = None
+        self._landmarks = None
+        self._indice_espacial = None
+        self.archivo = None         # snapshot del que se abrió (ver `cargar`)
+        self.meta = {}
+
+    @classmethod
+    def desde_aristas(cls, origenes, destinos, costos, rutas, modos, edges=None, coordenadas=None):
+        """
+        Construye el grafo en bloque a partir de columnas de aristas
+        (ids de Punto, no índices). `edges` son los pk de Edge de cada
+        arista (SIN_EDGE si se omite). `coordenadas` es un trío
+        (ids, lats, lons) de Puntos; sus ids se agregan como nodos aunque
+        no tengan aristas.
+        """
+        origenes = np.asarray(origenes, dtype=np.int64)
+        destinos = np.asarray(destinos, dtype=np.int64)
+        costos = np.asarray(costos, dtype=np.float64)
+        rutas = np.asarray(rutas, dtype=np.int64)
+        modos = np.asarray(modos, dtype=np.int8)
+        if edges is None:
+            edges = np.full(len(origenes), SIN_EDGE, dtype=np.int64)
+        edges = np.asarray(edges, dtype=np.int64)
+
+        if coordenadas is not None:
+            ids_coord = np.asarray(coordenadas[0], dtype=np.int64)
+        else:
+            ids_coord = np.empty(0, dtype=np.int64)
+
+        nodos = np.unique(np.concatenate([origenes, destinos, ids_coord]))
+
+        lats = lons = None
+        if coordenadas is not None:
+            pos = np.searchsorted(nodos, ids_coord)
+            lats = np.full(len(nodos), np.nan)
+            lons = np.full(len(nodos), np.nan)
+            lats[pos] = np.asarray(coordenadas[1], dtype=np.float64)
+            lons[pos] = np.asarray(coordenadas[2], dtype=np.float64)
+
+        idx_origen = np.searchsorted(nodos, origenes)
+        idx_destino = np.searchsorted(nodos, destinos).astype(np.int32)
+
+        # Ordenar por nodo origen conserva el orden de carga entre aristas del mismo nodo
+        orden = np.argsort(idx_origen, kind="stable")
+        offsets = np.zeros(len(nodos) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(idx_origen, minlength=len(nodos)), out=offsets[1:])
+
+        return cls(
+            nodos,
+            offsets,
+            idx_destino[orden],
+            costos[orden],
+            rutas[orden],
+            modos[orden],
+            edges[orden],
+            lats,
+            lons,
+        )
+
+    # ---------- Persistencia ----------
+
+    def guardar(self, ruta, meta=None):
+        """Snapshot binario del grafo (ver `rutas.binario`)."""
+        arrays = {nombre: getattr(self, nombre) for nombre in ARRAYS}
+        if self.lats is not None:
+            arrays.update(lats=self.lats, lons=self.lons)
+        guardar_arrays(ruta, arrays, meta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """
+        Abre un snapshot con mmap: los arrays son de solo lectura y sus
+        páginas se comparten entre todos los procesos que lo abren.
+        """
+        arrays, meta = cargar_arrays(ruta)
+        grafo = cls(*(arrays[nombre] for nombre in ARRAYS), arrays.get("lats"), arrays.get("lons"))
+        grafo.archivo = str(ruta)
+        grafo.meta = meta
+        return grafo
+
+    # ---------- Consultas ----------
+
+    def __len__(self):
+        return len(self.nodos)
+
+    @property
+    def num_aristas(self):
+        return len(self.destinos)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, nombre).nbytes for nombre in ARRAYS)
+
+    def indice(self, nodo_id):
+        """Índice denso del Punto `nodo_id`, o None si no está en el grafo."""
+        i = int(np.searchsorted(self.nodos, nodo_id))
+        if i < len(self.nodos) and self.nodos[i] == nodo_id:
+            return i
+        return None
+
+    def __contains__(self, nodo_id):
+        return self.indice(nodo_id) is not None
+
+    def get(self, nodo_id, default=()):
+        """
+        Misma interfaz que el grafo en dict: lista de
+        (vecino_id, costo, ruta_id, modo, edge_id) para las aristas salientes.
+        """
+        i = self.indice(nodo_id)
+        if i is None:
+            return default
+
+        a, b = self.offsets[i], self.offsets[i + 1]
+        vecinos = self.nodos[self.destinos[a:b]].tolist()
+        rutas = [None if r == SIN_RUTA else r for r in self.rutas[a:b].tolist()]
+        modos = [MODOS[m] for m in self.modos[a:b].tolist()]
+        edges = [None if e == SIN_EDGE else e for e in self.edges[a:b].tolist()]
+        return list(zip(vecinos, self.costos[a:b].tolist(), rutas, modos, edges))
+
+    def coordenadas(self, nodo_id):
+        """(lat, lon) del Punto, o None si el grafo no tiene coordenadas."""
+        i = self.indice(nodo_id)
+        if i is None or self.lats is None or np.isnan(self.lats[i]):
+            return None
+        return float(self.lats[i]), float(self.lons[i])
+
+    def paradas_cercanas(self, lat, lon, k, radio_m):
+        """
+        Hasta `k` pares (id, distancia_m) de nodos a menos de `radio_m` de
+        (lat, lon), ordenados por distancia. El índice espacial se arma la
+        primera vez con las coordenadas del grafo y se reutiliza.
+        """
+        indice = self.indice_espacial(radio_m)
+        if indice is None:
+            return []
+        return indice.k_cercanos(lat, lon, k)
+
+    def indice_espacial(self, radio_m):
+        """
+        IndiceEspacial de los nodos con coordenadas para `radio_m` (None si
+        el grafo no tiene coordenadas). Se arma una vez y se reutiliza.
+        """
+        if self.lats is None:
+            return None
+        indice = self._indice_espacial
+        if indice is None or indice.radio_m != radio_m:
+            validos = ~np.isnan(self.lats)
+            indice = IndiceEspacial(
+                self.nodos[validos].tolist(),
+                self.lats[validos].tolist(),
+                self.lons[validos].tolist(),
+                radio_m,
+            )
+            self._indice_espacial = indice
+        return indice
+
+    def invertido(self):
+        """
+        Grafo con todas las aristas invertidas (para búsquedas hacia atrás).
+        Se calcula una vez y se reutiliza.
+        """
+        if self._invertido is None:
+            n = len(self.nodos)
+            origen = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.offsets))
+            orden = np.argsort(self.destinos, kind="stable")
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.destinos, minlength=n), out=offsets[1:])
+
+            inv = GrafoCSR(
+                self.nodos,
+                offsets,
+                origen[orden].astype(np.int32),
+                self.costos[orden],
+                self.rutas[orden],
+                self.modos[orden],
+                self.edges[orden],
+                self.lats,
+                self.lons,
+            )
+            inv._invertido = self
+            inv._velocidad_maxima = self._velocidad_maxima
+            self._invertido = inv
+        return self._invertido
+
+    @property
+    def velocidad_maxima(self):
+        """
+        Máxima distancia en línea recta por unidad de costo entre los
+        extremos de una arista (metros por minuto con los costos del
+        import). Divide la distancia haversine en la cota inferior de A*.
+
+        Se consideran todas las aristas, también los transbordos: si alguna
+        une dos puntos distintos con costo 0 (p. ej. un tramo con Tiempo 0
+        en el Excel) ninguna velocidad finita es cota y el resultado es
+        infinito; A* usa entonces solo las cotas de `landmarks`.
+        """
+        if self._velocidad_maxima is None:
+            self._velocidad_maxima = 0.0
+            if self.lats is not None and self.num_aristas:
+                n = len(self.nodos)
+                origen = np.repeat(np.arange(n), np.diff(self.offsets))
+                d = haversine_m_np(
+                    self.lats[origen], self.lons[origen],
+                    self.lats[self.destinos], self.lons[self.destinos],
+                )
+                con_largo = d > 0  # NaN (sin coordenadas) queda afuera
+                if np.any(con_largo & (self.costos <= 0)):
+                    self._velocidad_maxima = float("inf")
+                elif con_largo.any():
+                    self._velocidad_maxima = float(np.max(d[con_largo] / self.costos[con_largo]))
+        return self._velocidad_maxima
+
+    def _costos_desde(self, inicio):
+        """Costo mínimo desde el índice `inicio` a cada nodo (inf si no llega)."""
+        offsets = self.offsets.tolist()
+        destinos = self.destinos.tolist()
+        costos = self.costos.tolist()
+        resultado = [float("inf")] * len(self.nodos)
+        resultado[inicio] = 0.0
+        heap = [(0.0, inicio)]
+        while heap:
+            costo, i = heappop(heap)
+            if costo > resultado[i]:
+                continue
+            for j in range(offsets[i], offsets[i + 1]):
+                nuevo = costo + costos[j]
+                if nuevo < resultado[destinos[j]]:
+                    resultado[destinos[j]] = nuevo
+                    heappush(heap, (nuevo, destinos[j]))
+        return np.array(resultado)
+
+    def landmarks(self):
+        """
+        Distancias para las cotas ALT de A* (landmarks y desigualdad
+        triangular): (desde, hacia), float64[k, n] con el costo mínimo de
+        cada landmark a cada nodo y de cada nodo al landmark (inf si no hay
+        camino). Para cualquier nodo v y destino t,
+            costo(v, t) >= desde[L, t] - desde[L, v]
+            costo(v, t) >= hacia[L, v] - hacia[L, t]
+        sin importar las velocidades ni las aristas de costo 0.
+
+        Los LANDMARKS se eligen por lejanía: cada uno es el nodo más lejano
+        (o inalcanzable) desde los ya elegidos, así quedan en la periferia
+        y en cada componente. Se calcula una vez por grafo (2k Dijkstra).
+        """
+        if self._landmarks is None:
+            n = len(self.nodos)
+            k = min(LANDMARKS, n)
+            invertido = self.invertido()
+            desde = np.empty((k, n))
+            hacia = np.empty((k, n))
+            lejania = self._costos_desde(0) if n else None
+            for fila in range(k):
+                landmark = int(np.argmax(lejania))
+                desde[fila] = self._costos_desde(landmark)
+                hacia[fila] = invertido._costos_desde(landmark)
+                lejania = desde[fila].copy() if fila == 0 else np.minimum(lejania, desde[fila])
+                lejania[landmark] = -1.0  # no repetir
+            self._landmarks = (desde, hacia)
+        return self._landmarks
+
+    def cotas_landmarks(self, destino):
+        """
+        Cota ALT del costo de cada nodo al índice `destino`: float64[n],
+        inf para los nodos que no pueden llegar a él.
+        """
+        desde, hacia = self.landmarks()
+        with np.errstate(invalid="ignore"):
+            por_desde = desde[:, destino, None] - desde
+            por_hacia = hacia - hacia[:, destino, None]
+        # inf - inf (ese landmark no dice nada del par) da NaN: fmax lo ignora
+        cotas = np.fmax(np.fmax.reduce(por_desde, axis=0), np.fmax.reduce(por_hacia, axis=0))
+        return np.maximum(np.where(np.isnan(cotas), 0.0, cotas), 0.0)
+
+
+def haversine_m_np(lat1, lon1, lat2, lon2):
+    """Versión vectorizada de `rutas.espacial.haversine_m`."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,117 @@
+"""
+Índice espacial en memoria para búsquedas por radio entre paradas.
+
+No depende de Django: se puede usar desde las vistas, los comandos de
+gestión y los benchmarks.
+"""
+from collections import defaultdict
+from math import radians, cos, sin, sqrt, atan2, floor, ceil, pi
+
+RADIO_TIERRA_M = 6371000
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    R = RADIO_TIERRA_M  # radio de la Tierra en metros
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return R * c
+
+
+class IndiceEspacial:
+    """
+    Rejilla uniforme sobre una proyección equirectangular local.
+
+    Los puntos se proyectan a metros alrededor de la latitud media y se
+    agrupan en celdas del tamaño del radio de búsqueda, así que un vecino
+    dentro del radio siempre cae en la misma celda o en una adyacente. La
+    distancia final se confirma con haversine, por lo que el resultado es
+    el mismo que el de comparar todos los pares.
+    """
+
+    def __init__(self, ids, lats, lons, radio_m):
+        self.ids = list(ids)
+        self.lats = [float(v) for v in lats]
+        self.lons = [float(v) for v in lons]
+        self.radio_m = float(radio_m)
+
+        if self.lats:
+            lat0 = sum(self.lats) / len(self.lats)
+            lat_max = max(abs(v) for v in self.lats)
+        else:
+            lat0 = lat_max = 0.0
+
+        # metros por grado en la latitud de referencia
+        self._ky = RADIO_TIERRA_M * pi / 180
+        self._kx = self._ky * cos(radians(lat0))
+
+        # Lejos de lat0 la proyección alarga las distancias este-oeste;
+        # se agranda la celda para que un vecino real nunca quede a más
+        # de una celda de distancia.
+        escala = cos(radians(lat0)) / max(cos(radians(lat_max)), 1e-9)
+        self._celda = max(self.radio_m * max(escala, 1.0), 1e-9)
+
+        self._celdas = defaultdict(list)
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            self._celdas[self._celda_de(lat, lon)].append(i)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _celda_de(self, lat, lon):
+        return (
+            floor(lon * self._kx / self._celda),
+            floor(lat * self._ky / self._celda),
+        )
+
+    def cercanos(self, lat, lon, radio_m=None):
+        """Lista de (id, distancia_m) a menos de `radio_m` de (lat, lon)."""
+        radio_m = self.radio_m if radio_m is None else radio_m
+        alcance = max(1, ceil(radio_m / self._celda))
+        cx, cy = self._celda_de(lat, lon)
+
+        resultado = []
+        for dx in range(-alcance, alcance + 1):
+            for dy in range(-alcance, alcance + 1):
+                for i in self._celdas.get((cx + dx, cy + dy), ()):
+                    d = haversine_m(lat, lon, self.lats[i], self.lons[i])
+                    if d <= radio_m:
+                        resultado.append((self.ids[i], d))
+        return resultado
+
+    def k_cercanos(self, lat, lon, k, radio_m=None):
+        """Hasta `k` pares (id, distancia_m) dentro del radio, del más cercano al más lejano."""
+        return sorted(self.cercanos(lat, lon, radio_m), key=lambda par: par[1])[:k]
+
+    def pares_cercanos(self):
+        """
+        Genera (id_a, id_b, distancia_m) para cada par de puntos a menos de
+        `radio_m`, una sola vez por par (id_a aparece antes que id_b en el
+        orden en que se cargaron).
+        """
+        lats, lons, ids = self.lats, self.lons, self.ids
+        radio = self.radio_m
+        # Media vecindad: cada par de celdas se visita una sola vez
+        vecinas = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+        for (cx, cy), miembros in self._celdas.items():
+            # Pares dentro de la misma celda
+            for a in range(len(miembros)):
+                i = miembros[a]
+                for b in range(a + 1, len(miembros)):
+                    j = miembros[b]
+                    d = haversine_m(lats[i], lons[i], lats[j], lons[j])
+                    if d <= radio:
+                        yield (ids[i], ids[j], d) if i < j else (ids[j], ids[i], d)
+
+            # Pares con las celdas vecinas
+            for dx, dy in vecinas:
+                otros = self._celdas.get((cx + dx, cy + dy))
+                if not otros:
+                    continue
+                for i in miembros:
+                    for j in otros:
+                        d = haversine_m(lats[i], lons[i], lats[j], lons[j])
+                        if d <= radio:
+                            yield (ids[i], ids[j], d) if i < j else (ids[j], ids[i], d)
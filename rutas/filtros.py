@@ -0,0 +1,55 @@
+"""
+Filtros espaciales de los viewsets (backends de DRF).
+
+Las geometrías son geography en PostGIS, así que se usan los operadores
+que el índice GiST de geography soporta: `&&` (bboverlaps) para el bbox y
+ST_DWithin en metros para la cercanía.
+
+Cada vista indica su columna en `campo_geo`; puede cruzar una relación
+(p. ej. "segmentos__geom" para las Rutas), y en ese caso se quitan los
+duplicados del join.
+"""
+from django.contrib.gis.measure import D
+from rest_framework.exceptions import ParseError
+from rest_framework_gis.filters import DistanceToPointFilter, InBBoxFilter
+
+RADIO_NEAR_M = 500        # radio por defecto de ?near=
+RADIO_NEAR_MAX_M = 20000
+
+
+def _filtrar(queryset, campo, lookup, valor):
+    queryset = queryset.filter(**{f"{campo}__{lookup}": valor})
+    return queryset.distinct() if "__" in campo else queryset
+
+
+class EnBBoxFilter(InBBoxFilter):
+    """?in_bbox=min_lon,min_lat,max_lon,max_lat: geometrías que tocan el bbox."""
+
+    def filter_queryset(self, request, queryset, view):
+        campo = getattr(view, "campo_geo", None)
+        bbox = self.get_filter_bbox(request) if campo else None
+        if bbox is None:
+            return queryset
+        bbox.srid = 4326
+        return _filtrar(queryset, campo, "bboverlaps", bbox)
+
+
+class CercaFilter(DistanceToPointFilter):
+    """?near=lon,lat[&radio=metros]: geometrías a menos de `radio` metros."""
+    point_param = "near"
+    dist_param = "radio"
+
+    def filter_queryset(self, request, queryset, view):
+        campo = getattr(view, "campo_geo", None)
+        punto = self.get_filter_point(request, srid=4326) if campo else None
+        if punto is None:
+            return queryset
+
+        try:
+            radio = float(request.query_params.get(self.dist_param, RADIO_NEAR_M))
+        except ValueError:
+            raise ParseError(f"'{self.dist_param}' debe ser un número de metros")
+        if not 0 < radio <= RADIO_NEAR_MAX_M:
+            raise ParseError(f"'{self.dist_param}' debe estar entre 0 y {RADIO_NEAR_MAX_M} metros")
+
+        return _filtrar(queryset, campo, "dwithin", (punto, D(m=radio)))
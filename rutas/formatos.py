@@ -0,0 +1,198 @@
+"""
+Formatos compactos para las geometrías de las respuestas de ruta.
+
+Por defecto las geometrías van como listas de [lon, lat] con toda la
+precisión. Con `?formato=`:
+  - `polyline`: Encoded Polyline de Google (pares lat, lon) con
+    `?precision=` 5 (por defecto) o 6 decimales; lo decodifican Leaflet,
+    Mapbox, OSRM y compañía.
+  - `cuantizado`: enteros [lon, lat] * 10**precision, el primer vértice
+    absoluto y los demás como diferencia con el anterior:
+    `[x0, y0, dx1, dy1, ...]`. Se decodifica con una suma acumulada.
+Con `?tolerancia=` (metros) las líneas se simplifican antes con
+Douglas-Peucker. El primer y el último vértice se conservan siempre, así
+que los tramos siguen encadenados y la ruta es la misma.
+
+No depende de Django.
+"""
+from math import cos, radians
+
+import numpy as np
+
+from .espacial import RADIO_TIERRA_M
+
+FORMATOS = ("coordenadas", "polyline", "cuantizado")
+PRECISIONES = (5, 6)
+TOLERANCIA_MAX_M = 500
+
+POR_DEFECTO = {"formato": "coordenadas", "precision": 5, "tolerancia": 0.0}
+
+
+def leer_parametros_geometria(query):
+    """
+    Valida ?formato=, ?precision= y ?tolerancia=. Devuelve (opciones, None)
+    o (None, error) con el dict de error para un 400.
+    """
+    formato = query.get("formato", POR_DEFECTO["formato"])
+    if formato not in FORMATOS:
+        return None, {"error": f"Formato inválido, opciones: {', '.join(FORMATOS)}"}
+
+    try:
+        precision = int(query.get("precision", POR_DEFECTO["precision"]))
+        if precision not in PRECISIONES:
+            raise ValueError
+    except ValueError:
+        return None, {"error": "precision debe ser 5 o 6"}
+
+    try:
+        tolerancia = float(query.get("tolerancia", POR_DEFECTO["tolerancia"]))
+        if not 0 <= tolerancia <= TOLERANCIA_MAX_M:
+            raise ValueError
+    except ValueError:
+        return None, {"error": f"tolerancia debe estar entre 0 y {TOLERANCIA_MAX_M} metros"}
+
+    return {"formato": formato, "precision": precision, "tolerancia": tolerancia}, None
+
+
+def es_original(opciones):
+    """Sin formato ni simplificación: las geometrías van tal cual."""
+    return opciones["formato"] == "coordenadas" and not opciones["tolerancia"]
+
+
+def metadatos_formato(opciones):
+    """Lo que el cliente necesita para decodificar las geometrías."""
+    if es_original(opciones):
+        return {}
+    datos = {"formato": opciones["formato"]}
+    if opciones["formato"] != "coordenadas":
+        datos["precision"] = opciones["precision"]
+    if opciones["tolerancia"]:
+        datos["tolerancia_m"] = opciones["tolerancia"]
+    return datos
+
+
+def simplificar(coords, tolerancia_m):
+    """
+    Douglas-Peucker sobre [[lon, lat], ...] con la tolerancia en metros
+    (proyección equirectangular local, suficiente a escala de ciudad).
+    Devuelve los vértices conservados, en orden.
+
+    En lugar de recursión, cada vuelta procesa todos los tramos pendientes
+    a la vez con NumPy: cada vértice libre se mide contra el segmento entre
+    los vértices conservados que lo rodean y en cada tramo se conserva el
+    más lejano si supera la tolerancia. El resultado es el mismo.
+    """
+    if tolerancia_m <= 0 or len(coords) < 3:
+        return coords
+
+    lonlat = np.asarray(coords, dtype=np.float64)
+    escala_lon = cos(radians(float(lonlat[:, 1].mean())))
+    xy = np.radians(lonlat) * RADIO_TIERRA_M
+    xy[:, 0] *= escala_lon
+
+    n = len(xy)
+    indices = np.arange(n)
+    conservar = np.zeros(n, dtype=bool)
+    conservar[[0, -1]] = True
+    descartar = np.zeros(n, dtype=bool)  # en tramos que ya cumplen la tolerancia
+    while True:
+        libres = np.flatnonzero(~conservar & ~descartar)
+        if not len(libres):
+            break
+        anterior = np.maximum.accumulate(np.where(conservar, indices, 0))[libres]
+        siguiente = np.minimum.accumulate(np.where(conservar, indices, n - 1)[::-1])[::-1][libres]
+
+        # Distancia al segmento anterior-siguiente (no a la recta: el recorrido puede volver)
+        a = xy[anterior]
+        ab = xy[siguiente] - a
+        ap = xy[libres] - a
+        largo2 = np.einsum("ij,ij->i", ab, ab)
+        t = np.divide(np.einsum("ij,ij->i", ap, ab), largo2, out=np.zeros(len(libres)), where=largo2 > 0)
+        distancias = np.hypot(*(ap - np.clip(t, 0.0, 1.0)[:, None] * ab).T)
+
+        # Los libres de un mismo tramo son contiguos
+        inicios = np.flatnonzero(np.r_[True, anterior[1:] != anterior[:-1]])
+        maximos = np.maximum.reduceat(distancias, inicios)
+        maximo = np.repeat(maximos, np.diff(np.r_[inicios, len(libres)]))
+        descartar[libres[maximo <= tolerancia_m]] = True
+
+        lejanos = np.flatnonzero((distancias == maximo) & (maximo > tolerancia_m))
+        if not len(lejanos):
+            break
+        _, primeros = np.unique(anterior[lejanos], return_index=True)
+        conservar[libres[lejanos[primeros]]] = True
+
+    return [coords[i] for i in np.flatnonzero(conservar)]
+
+
+def _enteros(coords, precision):
+    return np.rint(np.asarray(coords, dtype=np.float64) * 10 ** precision).astype(np.int64)
+
+
+def codificar_polyline(coords, precision=5):
+    """Encoded Polyline de [[lon, lat], ...] (el formato va en lat, lon)."""
+    if not len(coords):
+        return ""
+    enteros = _enteros(coords, precision)[:, ::-1]
+    deltas = np.diff(enteros, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+
+    salida = []
+    for valor in deltas.ravel().tolist():
+        valor = ~(valor << 1) if valor < 0 else valor << 1
+        while valor >= 0x20:
+            salida.append(chr((0x20 | (valor & 0x1F)) + 63))
+            valor >>= 5
+        salida.append(chr(valor + 63))
+    return "".join(salida)
+
+
+def decodificar_polyline(texto, precision=5):
+    """Inversa de `codificar_polyline`: [[lon, lat], ...]."""
+    valores = []
+    valor = desplazamiento = 0
+    for caracter in texto:
+        b = ord(caracter) - 63
+        valor |= (b & 0x1F) << desplazamiento
+        desplazamiento += 5
+        if b < 0x20:
+            valores.append(~(valor >> 1) if valor & 1 else valor >> 1)
+            valor = desplazamiento = 0
+    latlon = np.cumsum(np.array(valores, dtype=np.int64).reshape(-1, 2), axis=0)
+    return (latlon[:, ::-1] / 10 ** precision).tolist()
+
+
+def cuantizar(coords, precision=5):
+    """[x0, y0, dx1, dy1, ...] en enteros de 10**-precision grados."""
+    if not len(coords):
+        return []
+    enteros = _enteros(coords, precision)
+    enteros[1:] = np.diff(enteros, axis=0)
+    return enteros.ravel().tolist()
+
+
+def formatear_geometria(coords, opciones):
+    """Una geometría [[lon, lat], ...] simplificada y en el formato pedido."""
+    if opciones["tolerancia"]:
+        coords = simplificar(coords, opciones["tolerancia"])
+    if opciones["formato"] == "polyline":
+        return codificar_polyline(coords, opciones["precision"])
+    if opciones["formato"] == "cuantizado":
+        return cuantizar(coords, opciones["precision"])
+    return coords
+
+
+def formatear_respuesta(respuesta, opciones):
+    """
+    Respuesta de ruta_optima con los tramos en el formato pedido. Es una
+    copia: la original (la que guarda la caché) no se modifica.
+    """
+    if es_original(opciones) or "ruta_optima" not in respuesta:
+        return respuesta
+    return {
+        **respuesta,
+        **metadatos_formato(opciones),
+        "ruta_optima": [
+            {**tramo, "geometry": formatear_geometria(tramo["geometry"], opciones)}
+            for tramo in respuesta["ruta_optima"]
+        ],
+    }
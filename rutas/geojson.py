@@ -0,0 +1,94 @@
+"""
+Geometrías y JSON de las respuestas sin pasar por GEOS.
+
+Las consultas piden la geometría ya convertida por PostGIS: WKB
+(`ST_AsBinary`, función `AsWKB`) cuando hay que operar con las
+coordenadas, o el texto GeoJSON (`ST_AsGeoJSON`) cuando solo se copia a
+la respuesta. El WKB se decodifica con NumPy directamente a listas de
+[lon, lat], en lugar de armar un objeto GEOS, pasarlo a texto GeoJSON y
+volver a parsearlo.
+
+`dumps` serializa con orjson si está instalado (opcional) y si no con la
+librería estándar; ambas dan el mismo JSON compacto en UTF-8. Las fechas
+no las convierte orjson sino `por_defecto`, igual que con la librería
+estándar (en las vistas de DRF, el JSONEncoder de DRF: ISO 8601 con
+"Z" para UTC).
+"""
+import json
+import struct
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+WKB_POINT = 1
+WKB_LINESTRING = 2
+
+# Banderas de EWKB (PostGIS)
+EWKB_Z = 0x80000000
+EWKB_M = 0x40000000
+EWKB_SRID = 0x20000000
+
+
+def _dimensiones(tipo):
+    """(tipo base, coordenadas por vértice) de un tipo WKB o EWKB."""
+    z = bool(tipo & EWKB_Z)
+    m = bool(tipo & EWKB_M)
+    tipo &= 0x0FFFFFFF
+    # WKB ISO: 1001 = Point Z, 2002 = LineString M, 3002 = LineString ZM, ...
+    iso, tipo = divmod(tipo, 1000)
+    z = z or iso in (1, 3)
+    m = m or iso in (2, 3)
+    return tipo, 2 + z + m
+
+
+def coordenadas_wkb(wkb):
+    """
+    Coordenadas [x, y] de un Point ([x, y]) o LineString ([[x, y], ...])
+    en WKB o EWKB. Las dimensiones Z/M se descartan.
+    """
+    datos = bytes(wkb)
+    orden = "<" if datos[0] == 1 else ">"
+    crudo = struct.unpack_from(orden + "I", datos, 1)[0]
+    tipo, ndim = _dimensiones(crudo)
+    pos = 9 if crudo & EWKB_SRID else 5
+
+    if tipo == WKB_POINT:
+        return list(struct.unpack_from(f"{orden}2d", datos, pos))
+    if tipo == WKB_LINESTRING:
+        n = struct.unpack_from(orden + "I", datos, pos)[0]
+        vertices = np.frombuffer(datos, dtype=orden + "f8", count=n * ndim, offset=pos + 4)
+        return vertices.reshape(n, ndim)[:, :2].tolist()
+    raise ValueError(f"Tipo WKB no soportado: {tipo}")
+
+
+def _numpy_a_json(obj, por_defecto=None):
+    # Lo que la librería estándar no sabe serializar y aparece en las respuestas
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if por_defecto is not None:
+        return por_defecto(obj)
+    raise TypeError(f"{type(obj).__name__} no es serializable a JSON")
+
+
+def dumps(datos, por_defecto=None):
+    """
+    JSON compacto (bytes, UTF-8). `por_defecto` convierte los tipos que no
+    son de JSON ni de NumPy (como `default` de json.dumps).
+    """
+    def convertir(obj):
+        return _numpy_a_json(obj, por_defecto)
+
+    if orjson is not None:
+        return orjson.dumps(
+            datos, default=convertir,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    return json.dumps(
+        datos, ensure_ascii=False, separators=(",", ":"), default=convertir,
+    ).encode("utf-8")
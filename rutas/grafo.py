@@ -0,0 +1,324 @@
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Punto, Edge, VersionGrafo
+from .signals import red_actualizada
+from .constantes import TRANSFER_RADIUS_METERS, SNAP_RADIUS_METERS, costo_caminata
+from .espacial import IndiceEspacial, haversine_m
+from .csr import GrafoCSR, MODO_BUS, MODO_TRANSFER, SIN_RUTA, SIN_EDGE
+from .ch import JerarquiaContraccion
+from .normalizacion import aristas_transbordo, normalizar_aristas
+from .binario import leer_meta
+
+
+def construir_grafo_con_transbordos():
+    """
+    Grafo como dict de listas de adyacencia, con la misma normalización
+    que `construir_grafo_csr` (ver `rutas.normalizacion`).
+    """
+    # (source, target, ruta, modo) -> arista de menor costo, en orden de carga
+    mejores = {}
+
+    def agregar(source, target, cost, ruta_id, modo, edge_id):
+        if source == target:
+            return  # self-loop: no mejora ningún costo
+        clave = (source, target, ruta_id, modo)
+        if clave not in mejores or cost < mejores[clave][1]:
+            mejores[clave] = (target, cost, ruta_id, modo, edge_id)
+
+    #Edges de la BD (movimiento en microbus; sin ruta, transbordo guardado)
+    for e in Edge.objects.all():
+        # Edge dirigido
+        agregar(e.source_id, e.target_id, e.cost, e.ruta_id, "bus" if e.ruta_id else "transfer", e.id)
+        # Si quieres que sea bidireccional, descomenta:
+        # agregar(e.target_id, e.source_id, e.cost, e.ruta_id, "bus", e.id)
+
+    #Edges de transbordo entre puntos cercanos (a pie)
+    puntos = list(Punto.objects.all())
+    indice = IndiceEspacial(
+        [p.id for p in puntos],
+        [p.ubicacion.y for p in puntos],
+        [p.ubicacion.x for p in puntos],
+        TRANSFER_RADIUS_METERS,
+    )
+
+    for id_a, id_b, distancia in indice.pares_cercanos():
+        # Edge de "caminar" entre paradas (bidireccional)
+        agregar(id_a, id_b, costo_caminata(distancia), None, "transfer", None)
+        agregar(id_b, id_a, costo_caminata(distancia), None, "transfer", None)
+
+    graph = defaultdict(list)
+    for (source, _, _, _), arista in mejores.items():
+        graph[source].append(arista)
+    return graph
+
+
+def construir_grafo_csr():
+    """
+    Mismo grafo que `construir_grafo_con_transbordos`, en formato CSR.
+
+    Los Edges se leen con una sola consulta `values_list` directamente a
+    arrays; los Edges sin ruta (transbordos guardados por
+    `generar_transbordos`) se marcan como modo "transfer". Las aristas
+    pasan por `normalizar_aristas` y su informe queda en
+    `grafo.meta["normalizacion"]`.
+    """
+    filas = Edge.objects.values_list(
+        "id", "source_id", "target_id", "cost", Coalesce("ruta_id", Value(SIN_RUTA)),
+    )
+    aristas = np.fromiter(
+        filas.iterator(chunk_size=20000),
+        dtype=[("id", "i8"), ("source", "i8"), ("target", "i8"), ("cost", "f8"), ("ruta", "i8")],
+    )
+    modos = np.where(aristas["ruta"] == SIN_RUTA, MODO_TRANSFER, MODO_BUS)
+
+    #Edges de transbordo entre puntos cercanos (a pie)
+    puntos = list(Punto.objects.values_list("id", "ubicacion"))
+    ids = [pid for pid, _ in puntos]
+    lats = [u.y for _, u in puntos]
+    lons = [u.x for _, u in puntos]
+    t_origen, t_destino, t_costo = aristas_transbordo(ids, lats, lons)
+    n_t = len(t_origen)
+
+    (origenes, destinos, costos, rutas, modos, edges), informe = normalizar_aristas(
+        np.concatenate([aristas["source"], t_origen]),
+        np.concatenate([aristas["target"], t_destino]),
+        np.concatenate([aristas["cost"], t_costo]),
+        np.concatenate([aristas["ruta"], np.full(n_t, SIN_RUTA)]),
+        np.concatenate([modos, np.full(n_t, MODO_TRANSFER)]),
+        np.concatenate([aristas["id"], np.full(n_t, SIN_EDGE)]),
+    )
+    grafo = GrafoCSR.desde_aristas(
+        origenes, destinos, costos, rutas, modos,
+        edges=edges,
+        coordenadas=(ids, lats, lons),
+    )
+    grafo.meta = {"normalizacion": informe}
+    return grafo
+
+
+# ---------- VERSIÓN DE LA RED ----------
+
+def version_grafo():
+    """Versión actual de la red (0 si nunca se importó nada)."""
+    version = VersionGrafo.objects.filter(pk=1).values_list("version", flat=True).first()
+    return version or 0
+
+
+async def aversion_grafo():
+    """`version_grafo` con el ORM asíncrono."""
+    version = await VersionGrafo.objects.filter(pk=1).values_list("version", flat=True).afirst()
+    return version or 0
+
+
+def token_grafo():
+    """
+    Identificador de esta base de datos (`VersionGrafo.token`), o None si
+    la red nunca se modificó. Los snapshots lo guardan junto a la versión.
+    """
+    token = VersionGrafo.objects.filter(pk=1).values_list("token", flat=True).first()
+    return str(token) if token else None
+
+
+def es_de_esta_red(meta, version, token):
+    """Si los metadatos de un snapshot son de `version` en esta base de datos."""
+    return (
+        meta is not None and token is not None
+        and meta.get("version") == version and meta.get("token") == token
+    )
+
+
+def estado_grafo():
+    """(versión, fecha de la última modificación o None)."""
+    fila = VersionGrafo.objects.filter(pk=1).values_list("version", "actualizado").first()
+    return fila or (0, None)
+
+
+def incrementar_version_grafo():
+    """
+    Marca la red como modificada. Lo llaman los comandos que escriben
+    Edge/Punto para que cada worker reconstruya su grafo en la siguiente
+    consulta, y emite `red_actualizada` para que se rehagan las cachés.
+    """
+    VersionGrafo.objects.get_or_create(pk=1)
+    VersionGrafo.objects.filter(pk=1).update(
+        version=F("version") + 1,
+        actualizado=timezone.now(),
+    )
+    version = version_grafo()
+    red_actualizada.send(sender=VersionGrafo, version=version)
+    return version
+
+
+# ---------- CACHÉ POR PROCESO ----------
+
+_lock = threading.Lock()
+_cache = (None, None)  # (version, grafo)
+
+
+def obtener_grafo():
+    """
+    Devuelve el grafo de la red construido una sola vez por worker.
+
+    En cada llamada se consulta la versión (una lectura por PK) y el grafo
+    solo se reconstruye si un import o la generación de transbordos la
+    cambió. La versión se lee antes de construir: si la red cambia durante
+    la construcción, la siguiente consulta vuelve a reconstruir.
+    """
+    return obtener_grafo_versionado()[1]
+
+
+def obtener_grafo_versionado():
+    """Como `obtener_grafo`, pero devuelve (version, grafo)."""
+    global _cache
+    version = version_grafo()
+
+    version_cache, grafo = _cache
+    if version_cache == version and grafo is not None:
+        return version, grafo
+
+    with _lock:
+        version_cache, grafo = _cache
+        if version_cache != version or grafo is None:
+            # El snapshot de esta versión se abre con mmap; si no hay, se lee la BD
+            grafo = cargar_snapshot(version) or construir_grafo_csr()
+            # El índice para ajustar coordenadas a paradas se arma acá y no en
+            # la primera consulta (en las vistas async, fuera del event loop)
+            grafo.indice_espacial(SNAP_RADIUS_METERS)
+            _cache = (version, grafo)
+        return version, grafo
+
+
+def grafo_cargado():
+    """(version, grafo) en memoria de este proceso, sin consultar la BD."""
+    return _cache
+
+
+async def aobtener_grafo_versionado():
+    """
+    Versión asíncrona de `obtener_grafo_versionado`: la versión se lee con
+    el ORM asíncrono y solo si hay que reconstruir se pasa a código síncrono.
+    """
+    version = await aversion_grafo()
+    version_cache, grafo = _cache
+    if version_cache == version and grafo is not None:
+        return version, grafo
+    return await sync_to_async(obtener_grafo_versionado)()
+
+
+def invalidar_grafo():
+    """Descarta el grafo en memoria de este proceso."""
+    global _cache
+    with _lock:
+        _cache = (None, None)
+
+
+# ---------- SNAPSHOT EN DISCO ----------
+
+def ruta_snapshot():
+    """Archivo del grafo que escriben `exportar_grafo` y cada import."""
+    directorio = Path(getattr(settings, "RUTAS_CACHE_DIR", settings.BASE_DIR / "cache"))
+    return Path(getattr(settings, "RUTAS_GRAFO_PATH", directorio / "grafo.bin"))
+
+
+def cargar_snapshot(version, ruta=None):
+    """
+    Grafo de `version` abierto con mmap desde el snapshot, o None si no
+    existe, es de otra versión o lo escribió otra base de datos (p. ej. la
+    de prueba del benchmark, que también numera sus versiones desde 1).
+    """
+    ruta = ruta or ruta_snapshot()
+    token = token_grafo()
+    if not es_de_esta_red(leer_meta(ruta), version, token):
+        return None
+    grafo = GrafoCSR.cargar(ruta)
+    # Se pudo reemplazar entre leer el encabezado y mapearlo
+    return grafo if es_de_esta_red(grafo.meta, version, token) else None
+
+
+def exportar_snapshot(ruta=None):
+    """
+    Construye el grafo desde la BD y lo guarda con su versión. El archivo
+    se reemplaza de forma atómica: los workers que ya lo tienen mapeado
+    siguen con el anterior hasta que cambie la versión. Devuelve el grafo,
+    o None si la red cambió durante la construcción (no se escribe nada).
+    """
+    version = version_grafo()
+    grafo = construir_grafo_csr()
+    if version_grafo() != version:
+        return None
+    grafo.meta = {
+        **grafo.meta,
+        "version": version,
+        "token": token_grafo(),
+        "nodos": len(grafo),
+        "aristas": grafo.num_aristas,
+        "creado": timezone.now().isoformat(),
+    }
+    grafo.guardar(ruta or ruta_snapshot(), grafo.meta)
+    return grafo
+
+
+@receiver(red_actualizada)
+def _al_actualizar_red(sender, version, **kwargs):
+    # En el proceso que hizo el import: deja el snapshot de la nueva versión
+    # listo para que los workers lo abran en lugar de leer la BD.
+    exportar_snapshot()
+
+
+# ---------- JERARQUÍA DE CONTRACCIÓN ----------
+
+def ruta_jerarquia():
+    """Archivo del índice CH que escribe `construir_jerarquia`."""
+    directorio = Path(getattr(settings, "RUTAS_CACHE_DIR", settings.BASE_DIR / "cache"))
+    return Path(getattr(settings, "RUTAS_CH_PATH", directorio / "jerarquia.bin"))
+
+
+_cache_ch = (None, None)  # (version, jerarquia)
+
+
+async def aobtener_jerarquia():
+    """Versión asíncrona de `obtener_jerarquia`."""
+    version = await aversion_grafo()
+    version_cache, jerarquia = _cache_ch
+    if version_cache == version and jerarquia is not None:
+        return jerarquia
+    return await sync_to_async(obtener_jerarquia)()
+
+
+def obtener_jerarquia():
+    """
+    Índice CH de la versión actual de la red, abierto con mmap una vez por
+    worker. Devuelve None si no se construyó o si es de una versión
+    anterior (hay que volver a correr `construir_jerarquia`); en ese caso
+    se vuelve a mirar el archivo en la siguiente llamada.
+    """
+    global _cache_ch
+    version = version_grafo()
+
+    version_cache, jerarquia = _cache_ch
+    if version_cache == version and jerarquia is not None:
+        return jerarquia
+
+    with _lock:
+        version_cache, jerarquia = _cache_ch
+        if version_cache != version or jerarquia is None:
+            ruta = ruta_jerarquia()
+            token = token_grafo()
+            if es_de_esta_red(leer_meta(ruta), version, token):
+                jerarquia = JerarquiaContraccion.cargar(ruta)
+                if not es_de_esta_red(jerarquia.meta, version, token):
+                    jerarquia = None
+            else:
+                jerarquia = None
+            _cache_ch = (version, jerarquia)
+        return jerarquia
@@ -0,0 +1,198 @@
+"""
+Instrumentación del ruteo: tiempos por etapa, consultas SQL y contadores
+de la búsqueda para cada pedido, más métricas agregadas en formato de
+texto de Prometheus.
+
+`Medicion` junta los datos de un pedido (se exponen en el header
+Server-Timing y, con `debug=1`, en la respuesta). `registrar` los vuelca
+en histogramas y contadores del proceso que sirve `/metrics`. Las
+métricas son por proceso: con varios workers cada uno reporta las suyas.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BUCKETS_NODOS = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+
+class Medicion:
+    """Datos de un pedido de ruteo."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}        # nombre -> segundos
+        self.consultas_sql = 0
+        self.segundos_sql = 0.0
+        self.busqueda = {}      # nodos_asentados, inserciones_heap (de los motores)
+
+    @contextmanager
+    def etapa(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + time.perf_counter() - t0
+
+    @contextmanager
+    def contar_sql(self):
+        """Cuenta y cronometra las consultas de la conexión por defecto."""
+        with connection.execute_wrapper(self._envolver_sql):
+            yield
+
+    @asynccontextmanager
+    async def acontar_sql(self):
+        """
+        `contar_sql` para vistas async: el ORM asíncrono consulta desde el
+        hilo de `sync_to_async`, así que el wrapper se instala en ese hilo.
+        """
+        await sync_to_async(self._instalar_wrapper)()
+        try:
+            yield
+        finally:
+            await sync_to_async(self._quitar_wrapper)()
+
+    def _instalar_wrapper(self):
+        connection.execute_wrappers.append(self._envolver_sql)
+
+    def _quitar_wrapper(self):
+        connection.execute_wrappers.remove(self._envolver_sql)
+
+    def _envolver_sql(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas_sql += 1
+            self.segundos_sql += time.perf_counter() - t0
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+    def server_timing(self):
+        """Valor del header Server-Timing (duraciones en ms)."""
+        partes = [f"{nombre};dur={s * 1000:.2f}" for nombre, s in self.etapas.items()]
+        partes.append(f'sql;dur={self.segundos_sql * 1000:.2f};desc="{self.consultas_sql} consultas"')
+        partes.append(f"total;dur={self.total * 1000:.2f}")
+        return ", ".join(partes)
+
+    def resumen(self):
+        """Bloque `debug` de la respuesta."""
+        return {
+            "ms_etapas": {nombre: round(s * 1000, 3) for nombre, s in self.etapas.items()},
+            "ms_total": round(self.total * 1000, 3),
+            "consultas_sql": self.consultas_sql,
+            "ms_sql": round(self.segundos_sql * 1000, 3),
+            **self.busqueda,
+        }
+
+
+# ---------- Métricas agregadas ----------
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in etiquetas) + "}"
+
+
+class Histograma:
+
+    def __init__(self, nombre, ayuda, buckets):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(buckets)
+        self._series = {}  # etiquetas -> [conteos por bucket..., suma, cantidad]
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        serie = self._series.get(clave)
+        if serie is None:
+            serie = self._series[clave] = [0] * len(self.buckets) + [0.0, 0]
+        i = bisect_left(self.buckets, valor)
+        if i < len(self.buckets):
+            serie[i] += 1
+        serie[-2] += valor
+        serie[-1] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for clave, serie in sorted(self._series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, serie):
+                acumulado += conteo
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(clave + (('le', limite),))} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(clave + (('le', '+Inf'),))} {serie[-1]}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(clave)} {serie[-2]}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(clave)} {serie[-1]}")
+        return lineas
+
+
+class Contador:
+
+    def __init__(self, nombre, ayuda, tipo="counter"):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self._series = {}
+
+    def sumar(self, valor=1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        self._series[clave] = self._series.get(clave, 0) + valor
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for clave, valor in sorted(self._series.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(clave)} {valor}")
+        return lineas
+
+
+_lock = threading.Lock()
+
+DURACION = Histograma(
+    "rutas_optima_duracion_segundos",
+    "Duración de los pedidos de ruteo por vista (optima, batch) y etapa",
+    BUCKETS_SEGUNDOS,
+)
+NODOS = Histograma(
+    "rutas_optima_nodos_asentados",
+    "Nodos (o etiquetas) asentados por búsqueda",
+    BUCKETS_NODOS,
+)
+PEDIDOS = Contador("rutas_optima_pedidos_total", "Pedidos de ruteo por vista y código de estado")
+CONSULTAS_SQL = Contador("rutas_optima_consultas_sql_total", "Consultas SQL hechas por pedidos de ruteo")
+INSERCIONES = Contador("rutas_optima_inserciones_heap_total", "Inserciones en el heap de las búsquedas")
+
+
+def registrar(medicion, estado, algoritmo, vista="optima"):
+    """
+    Agrega la medición de un pedido terminado a las métricas del proceso.
+    `vista` separa /rutas/optima-coords/ (sync o async) del batch.
+    """
+    with _lock:
+        for nombre, segundos in medicion.etapas.items():
+            DURACION.observar(segundos, vista=vista, etapa=nombre)
+        DURACION.observar(medicion.total, vista=vista, etapa="total")
+        PEDIDOS.sumar(vista=vista, estado=estado)
+        CONSULTAS_SQL.sumar(medicion.consultas_sql)
+        if "nodos_asentados" in medicion.busqueda:
+            NODOS.observar(medicion.busqueda["nodos_asentados"], algoritmo=algoritmo)
+            INSERCIONES.sumar(medicion.busqueda["inserciones_heap"], algoritmo=algoritmo)
+
+
+def exponer_metricas(extras=()):
+    """
+    Texto de Prometheus con las métricas de ruteo. `extras` son tuplas
+    (nombre, ayuda, tipo, valor) calculadas al momento (p. ej. la caché).
+    """
+    with _lock:
+        lineas = []
+        for metrica in (DURACION, NODOS, PEDIDOS, CONSULTAS_SQL, INSERCIONES):
+            lineas.extend(metrica.exponer())
+    for nombre, ayuda, tipo, valor in extras:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}", f"{nombre} {valor}"]
+    return "\n".join(lineas) + "\n"
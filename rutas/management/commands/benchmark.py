@@ -0,0 +1,247 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from rutas import grafo as modulo_grafo, payloads, teselas
+from rutas.benchmarks.red import EXCEL_POR_DEFECTO, leer_hojas, pares_aleatorios
+from rutas.benchmarks.sintetica import escalar_hojas, escribir_excel
+from rutas.busqueda import ALGORITMOS
+from rutas.ch import construir_jerarquia
+from rutas.grafo import construir_grafo_con_transbordos, construir_grafo_csr
+from rutas.models import Punto, Ruta, Edge
+from rutas.signals import red_actualizada
+
+FORMATO = 1  # versión del JSON de resultados
+
+
+def percentiles(segundos):
+    ms = np.asarray(segundos) * 1000
+    return {
+        "media_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+    }
+
+
+@contextmanager
+def red_aislada():
+    """
+    Los archivos de caché (payload de la red, teselas, snapshots del grafo
+    y de la CH) van a un directorio temporal y los receptores de
+    `red_actualizada` no corren: los imports de la base de prueba no
+    pisan las cachés de la red real y su tiempo es solo el del import.
+    """
+    receptores = [modulo_grafo._al_actualizar_red, payloads._al_actualizar_red, teselas._al_actualizar_red]
+    with tempfile.TemporaryDirectory() as directorio, override_settings(
+        RUTAS_CACHE_DIR=Path(directorio),
+        RUTAS_GRAFO_PATH=Path(directorio) / "grafo.bin",
+        RUTAS_CH_PATH=Path(directorio) / "jerarquia.bin",
+    ):
+        for receptor in receptores:
+            red_actualizada.disconnect(receptor)
+        try:
+            yield
+        finally:
+            for receptor in receptores:
+                red_actualizada.connect(receptor)
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide importación, generación de transbordos, construcción del grafo y "
+        "consultas origen/destino sobre la red (y copias sintéticas a escala) "
+        "en una base de datos de prueba, y guarda los resultados en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--excel', default=str(EXCEL_POR_DEFECTO), help='Red de base')
+        parser.add_argument(
+            '--escalas', type=int, nargs='+', default=[1, 10],
+            help='Copias de la red a medir (1 = la red original; default: 1 10)',
+        )
+        parser.add_argument('--pares', type=int, default=200, help='Consultas origen/destino por escala')
+        parser.add_argument(
+            '--algoritmos', nargs='+', default=['dijkstra'],
+            choices=[*ALGORITMOS, 'ch'],
+            help='Motores a medir (ch construye además la jerarquía)',
+        )
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--salida', help='Archivo JSON (default: benchmark-<fecha>.json)')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior para comparar')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Conserva la base de prueba entre corridas (como en manage.py test)',
+        )
+
+    def handle(self, *args, **options):
+        if any(e < 1 for e in options['escalas']):
+            raise CommandError("Las escalas deben ser >= 1")
+        anterior = None
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as f:
+                anterior = json.load(f)
+
+        hojas = leer_hojas(options['excel'])
+
+        # Todo corre en la base de prueba (test_<NAME>) y sin tocar las cachés
+        # en disco: la red real no se toca
+        self.stdout.write(f"🧪 Creando base de prueba ({connection.vendor})...")
+        with red_aislada():
+            nombre_original = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False,
+            )
+            try:
+                escalas = [self.medir_escala(hojas, escala, options) for escala in options['escalas']]
+            finally:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=options['keepdb'])
+
+        resultados = {
+            "formato": FORMATO,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit_actual(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "bd": connection.vendor,
+            "parametros": {
+                "excel": os.path.basename(options['excel']),
+                "pares": options['pares'],
+                "algoritmos": options['algoritmos'],
+                "semilla": options['semilla'],
+            },
+            "escalas": escalas,
+        }
+
+        salida = options['salida'] or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"🎉 Resultados en {salida}"))
+
+        if anterior is not None:
+            self.comparar(anterior, resultados)
+
+    def medir_escala(self, hojas, escala, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"📏 Escala x{escala}"))
+        if escala > 1:
+            hojas = escalar_hojas(hojas, escala, options['semilla'])
+
+        tiempos = {}
+        with tempfile.TemporaryDirectory() as directorio:
+            excel = os.path.join(directorio, f"red_x{escala}.xlsx")
+            escribir_excel(hojas, excel)
+
+            _, tiempos["importar"] = self.cronometrar(
+                "importar_microbuses", call_command, "importar_microbuses", excel, stdout=StringIO(),
+            )
+        _, tiempos["transbordos"] = self.cronometrar(
+            "generar_transbordos", call_command, "generar_transbordos", stdout=StringIO(),
+        )
+        _, tiempos["grafo_dict"] = self.cronometrar(
+            "construir_grafo_con_transbordos", construir_grafo_con_transbordos,
+        )
+        grafo, tiempos["grafo_csr"] = self.cronometrar("construir_grafo_csr", construir_grafo_csr)
+
+        motores = {a: ALGORITMOS[a] for a in options['algoritmos'] if a != 'ch'}
+        if 'ch' in options['algoritmos']:
+            jerarquia, tiempos["jerarquia_ch"] = self.cronometrar(
+                "construir_jerarquia", construir_jerarquia, grafo,
+            )
+            motores['ch'] = lambda _, o, d, estadisticas: jerarquia.buscar(o, d, estadisticas)
+
+        red = {
+            "puntos": Punto.objects.count(),
+            "rutas": Ruta.objects.count(),
+            "edges": Edge.objects.count(),
+            "nodos": len(grafo),
+            "aristas": grafo.num_aristas,
+            "normalizacion": grafo.meta.get("normalizacion"),
+        }
+        self.stdout.write(f"   {red}")
+
+        pares = pares_aleatorios(grafo, options['pares'], options['semilla'])
+        consultas = {}
+        for nombre, motor in motores.items():
+            segundos, asentados = [], []
+            for origen, destino in pares:
+                stats = {}
+                t0 = time.perf_counter()
+                motor(grafo, origen, destino, estadisticas=stats)
+                segundos.append(time.perf_counter() - t0)
+                asentados.append(stats.get("nodos_asentados", 0))
+            consultas[nombre] = {
+                "pares": len(pares),
+                **percentiles(segundos),
+                "nodos_asentados": round(float(np.mean(asentados)), 1),
+            }
+            c = consultas[nombre]
+            self.stdout.write(
+                f"   ⏱️ {nombre}: p50 {c['p50_ms']:.3f} ms, p95 {c['p95_ms']:.3f} ms, "
+                f"p99 {c['p99_ms']:.3f} ms ({len(pares)} pares)"
+            )
+
+        return {
+            "escala": escala,
+            "red": red,
+            "tiempos_s": {k: round(v, 4) for k, v in tiempos.items()},
+            "consultas": consultas,
+        }
+
+    def cronometrar(self, nombre, funcion, *args, **kwargs):
+        """(resultado de `funcion`, segundos)."""
+        t0 = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        segundos = time.perf_counter() - t0
+        self.stdout.write(f"   ⏱️ {nombre}: {segundos:.2f}s")
+        return resultado, segundos
+
+    def comparar(self, anterior, actual):
+        """Tabla antes/ahora de las métricas presentes en ambas corridas."""
+        if anterior.get("formato") != FORMATO:
+            self.stdout.write(self.style.WARNING("⚠️ El JSON anterior tiene otro formato; no se compara"))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"🔍 Comparación con {anterior.get('commit') or '?'} ({anterior.get('fecha')})"
+        ))
+        previas = {e["escala"]: e for e in anterior["escalas"]}
+        for escala in actual["escalas"]:
+            previa = previas.get(escala["escala"])
+            if previa is None:
+                continue
+            filas = [
+                (f"{k} (s)", previa["tiempos_s"][k], v)
+                for k, v in escala["tiempos_s"].items() if k in previa["tiempos_s"]
+            ]
+            for motor, c in escala["consultas"].items():
+                p = previa["consultas"].get(motor)
+                if p:
+                    filas += [(f"{motor} {k}", p[k], c[k]) for k in ("p50_ms", "p95_ms", "p99_ms")]
+
+            self.stdout.write(f"x{escala['escala']}")
+            for nombre, antes, ahora in filas:
+                cambio = (ahora - antes) / antes * 100 if antes else 0.0
+                estilo = self.style.ERROR if cambio > 10 else self.style.SUCCESS if cambio < -10 else str
+                self.stdout.write(estilo(f"   {nombre:>28} {antes:>10.3f} → {ahora:>10.3f} ({cambio:+.1f}%)"))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rutas.ch import construir_jerarquia
+from rutas.grafo import construir_grafo_csr, ruta_jerarquia, token_grafo, version_grafo
+
+
+class Command(BaseCommand):
+    help = (
+        "Construye la jerarquía de contracción (algoritmo=ch) de la red actual. "
+        "Correr después de importar_microbuses y generar_transbordos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--salida',
+            help='Archivo de salida (por defecto settings.RUTAS_CH_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        version = version_grafo()
+        salida = options['salida'] or ruta_jerarquia()
+
+        self.stdout.write(f"🧱 Leyendo la red (versión {version})...")
+        t0 = time.perf_counter()
+        grafo = construir_grafo_csr()
+        self.stdout.write(
+            f"   {len(grafo)} nodos, {grafo.num_aristas} aristas "
+            f"({time.perf_counter() - t0:.2f}s)"
+        )
+
+        self.stdout.write("🔧 Contrayendo nodos...")
+        t0 = time.perf_counter()
+        jerarquia = construir_jerarquia(grafo, meta={"version": version, "token": token_grafo()})
+        self.stdout.write(
+            f"   {jerarquia.num_atajos} atajos, {len(jerarquia.arco_costo)} arcos en total "
+            f"({time.perf_counter() - t0:.2f}s)"
+        )
+
+        # Si la red cambió mientras se contraía, el índice ya nace viejo
+        if version_grafo() != version:
+            self.stdout.write(self.style.ERROR(
+                "❌ La red cambió durante la construcción; vuelve a correr el comando"
+            ))
+            return
+
+        jerarquia.guardar(salida)
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Jerarquía guardada en {salida} "
+            f"({jerarquia.nbytes / 1e6:.1f} MB, {time.perf_counter() - inicio:.2f}s)"
+        ))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rutas.grafo import exportar_snapshot, ruta_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe el grafo de la red (adyacencia, costos, rutas y coordenadas) "
+        "en un snapshot binario versionado que los workers abren con mmap. "
+        "importar_microbuses y generar_transbordos ya lo regeneran al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--salida',
+            help='Archivo de salida (por defecto settings.RUTAS_GRAFO_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        salida = options['salida'] or ruta_snapshot()
+
+        self.stdout.write("🧱 Leyendo la red...")
+        grafo = exportar_snapshot(salida)
+        if grafo is None:
+            self.stdout.write(self.style.ERROR(
+                "❌ La red cambió durante la exportación; vuelve a correr el comando"
+            ))
+            return
+
+        informe = grafo.meta.get("normalizacion")
+        if informe:
+            self.stdout.write(
+                f"🧹 Normalización: {informe['nodos_antes']} → {informe['nodos_despues']} nodos, "
+                f"{informe['aristas_antes']} → {informe['aristas_despues']} aristas "
+                f"({informe['self_loops']} self-loops y {informe['paralelas']} paralelas descartadas)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Grafo v{grafo.meta['version']} guardado en {salida}: "
+            f"{len(grafo)} nodos, {grafo.num_aristas} aristas "
+            f"({grafo.nbytes / 1e6:.1f} MB, {time.perf_counter() - inicio:.2f}s)"
+        ))
@@ -1,97 +1,167 @@
+import time
+
 from django.core.management.base import BaseCommand
 from django.contrib.gis.geos import LineString
-from django.contrib.gis.db.models.functions import Distance
-from rutas.models import Punto, Edge, Ruta
-from django.db.models import F
-from django.db import transaction
-
-# Distancia máxima para transbordo caminando (en metros)
-MAX_DIST = 20  # puedes subirlo a 30 si quieres
-
-# Velocidad caminando (metros/minuto)
-WALK_SPEED = 80
+from django.db import connection, transaction
+from django.db.models import F, Q
+from rutas.models import Punto, Edge
+from rutas.grafo import incrementar_version_grafo
+from rutas.espacial import IndiceEspacial
+from rutas.constantes import TRANSFER_RADIUS_METERS, WALK_SPEED, costo_caminata
+
+EDGE = Edge._meta.db_table
+PUNTO = Punto._meta.db_table
+
+# Cambiar de micro en la misma parada no necesita Edge: la búsqueda llega a
+# la parada y sigue por cualquier ruta que salga de ella. Solo se guardan
+# los transbordos a pie entre paradas distintas.
+
+# Pares de Puntos a menos de TRANSFER_RADIUS_METERS, en ambos sentidos.
+# ST_DWithin sobre geography usa el índice GiST de `ubicacion` y mide en
+# metros; el costo es `costo_caminata` (distancia / WALK_SPEED).
+SQL_CERCANIA = f"""
+    SELECT NULL::bigint AS ruta_id, a.id AS source_id, b.id AS target_id,
+           ST_Distance(a.ubicacion, b.ubicacion) / %(velocidad)s AS cost,
+           ST_MakeLine(a.ubicacion::geometry, b.ubicacion::geometry)::geography AS geom
+    FROM {PUNTO} a
+    JOIN {PUNTO} b ON a.id <> b.id AND ST_DWithin(a.ubicacion, b.ubicacion, %(distancia)s)
+"""
+
+# Solo los pares en los que está alguno de %(puntos)s
+SQL_CERCANIA_DE = SQL_CERCANIA + """
+    WHERE a.id = ANY(%(puntos)s) OR b.id = ANY(%(puntos)s)
+"""
+
+INSERTAR = f"INSERT INTO {EDGE} (ruta_id, source_id, target_id, cost, geom) "
+CONTAR = "SELECT COUNT(*) FROM ({}) AS q"
+
+
+def edges_cercania(por_id, pares):
+    """Edges a pie en ambos sentidos para pares (id_a, id_b, distancia_m)."""
+    for id_a, id_b, distancia in pares:
+        p1, p2 = por_id[id_a], por_id[id_b]
+        cost = costo_caminata(distancia)  # minutos
+        for a, b in ((p1, p2), (p2, p1)):
+            yield Edge(
+                ruta=None,
+                source=a,
+                target=b,
+                cost=cost,
+                geom=LineString(
+                    (a.ubicacion.x, a.ubicacion.y),
+                    (b.ubicacion.x, b.ubicacion.y),
+                    srid=4326
+                )
+            )
+
+
+def indice_puntos(puntos):
+    return IndiceEspacial(
+        [p.id for p in puntos],
+        [p.ubicacion.y for p in puntos],
+        [p.ubicacion.x for p in puntos],
+        TRANSFER_RADIUS_METERS,
+    )
+
+
+def refrescar_cercania(punto_ids, batch_size=5000):
+    """
+    Rehace los transbordos por cercanía de los Puntos `punto_ids` (nuevos o
+    movidos) sin tocar el resto. Lo usa la importación incremental: un
+    Edge a pie con la posición vieja tendría un costo que ya no es el de
+    caminar. Devuelve (borrados, creados).
+    """
+    punto_ids = sorted(punto_ids)
+    borrados, _ = Edge.objects.filter(
+        Q(source_id__in=punto_ids) | Q(target_id__in=punto_ids), ruta__isnull=True,
+    ).delete()
+
+    if connection.vendor == 'postgresql':
+        params = {"velocidad": WALK_SPEED, "distancia": TRANSFER_RADIUS_METERS, "puntos": punto_ids}
+        with connection.cursor() as cursor:
+            cursor.execute(INSERTAR + SQL_CERCANIA_DE, params)
+            return borrados, cursor.rowcount
+
+    puntos = list(Punto.objects.all())
+    cambiados = set(punto_ids)
+    pares = (
+        par for par in indice_puntos(puntos).pares_cercanos()
+        if par[0] in cambiados or par[1] in cambiados
+    )
+    creados = Edge.objects.bulk_create(
+        edges_cercania({p.id: p for p in puntos}, pares), batch_size=batch_size,
+    )
+    return borrados, len(creados)
 
 
 class Command(BaseCommand):
-    help = "Genera transbordos entre líneas (exactos y por cercanía)"
+    help = "Genera los transbordos a pie entre paradas cercanas"
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write("🔄 Eliminando transbordos previos...")
-        
-        # Borrar todos los edges que sean transbordos:
-        Edge.objects.filter(source_id=F('target_id')).delete()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Solo cuenta los transbordos que se generarían, sin escribir',
+        )
 
-        self.stdout.write("🚏 Generando transbordos exactos (mismo IdPunto)...")
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        inicio = time.perf_counter()
 
-        puntos = Punto.objects.all()
+        # Transbordos previos: Edges sin ruta (a pie) y los self-loops de
+        # mismo punto que generaban versiones anteriores del comando
+        previos = Edge.objects.filter(Q(source_id=F('target_id')) | Q(ruta__isnull=True))
 
-        total_exactos = 0
         with transaction.atomic():
-            for punto in puntos:
-                # Rutas distintas en el mismo punto
-                edges = Edge.objects.filter(source=punto)
-
-                rutas_distintas = Ruta.objects.filter(
-                    id__in=edges.values_list('ruta', flat=True)
-                ).distinct()
-
-                if rutas_distintas.count() > 1:
-                    # Transbordo directo dentro del mismo punto
-                    for ruta in rutas_distintas:
-                        for ruta2 in rutas_distintas:
-                            if ruta != ruta2:
-                                Edge.objects.create(
-                                    ruta=ruta2,
-                                    source=punto,
-                                    target=punto,
-                                    cost=0.1,  # costo mínimo por cambio de micro
-                                    geom=LineString(
-                                        (punto.ubicacion.x, punto.ubicacion.y),
-                                        (punto.ubicacion.x, punto.ubicacion.y),
-                                        srid=4326
-                                    )
-                                )
-                                total_exactos += 1
-
-        self.stdout.write(self.style.SUCCESS(f"✔️ {total_exactos} transbordos exactos generados"))
-
-        self.stdout.write("🚶 Generando transbordos por cercanía (< 20 m)...")
-
+            t0 = time.perf_counter()
+            if dry_run:
+                borrados = previos.count()
+            else:
+                self.stdout.write("🔄 Eliminando transbordos previos...")
+                borrados, _ = previos.delete()
+            self.reportar(f"{borrados} transbordos previos", t0)
+
+            self.stdout.write(f"🚶 Transbordos por cercanía (< {TRANSFER_RADIUS_METERS} m)...")
+            t0 = time.perf_counter()
+            if connection.vendor == 'postgresql':
+                total = self.generar_sql(dry_run)
+            else:
+                total = self.generar_python(dry_run)
+            self.stdout.write(self.style.SUCCESS(f"✔️ {total} transbordos"))
+            self.reportar("Transbordos por cercanía", t0)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"🧪 Dry run: se borrarían {borrados} y se generarían "
+                f"{total} por cercanía ({time.perf_counter() - inicio:.2f}s)"
+            ))
+            return
+
+        version = incrementar_version_grafo()
+        self.stdout.write(f"🔁 Red actualizada a la versión {version}")
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Todos los transbordos generados correctamente ({time.perf_counter() - inicio:.2f}s)"
+        ))
+
+    def reportar(self, que, inicio):
+        self.stdout.write(f"   ⏱️ {que} en {time.perf_counter() - inicio:.2f}s")
+
+    def generar_sql(self, dry_run):
+        """INSERT ... SELECT en PostGIS. Devuelve cuántos transbordos genera."""
+        params = {"velocidad": WALK_SPEED, "distancia": TRANSFER_RADIUS_METERS}
+        with connection.cursor() as cursor:
+            if dry_run:
+                cursor.execute(CONTAR.format(SQL_CERCANIA), params)
+                return cursor.fetchone()[0]
+            cursor.execute(INSERTAR + SQL_CERCANIA, params)
+            return cursor.rowcount
+
+    def generar_python(self, dry_run):
+        """
+        Misma lógica para bases sin PostGIS (p. ej. SpatiaLite en los
+        benchmarks): índice espacial en memoria y bulk_create.
+        """
         puntos = list(Punto.objects.all())
-        total_cercania = 0
-
-        with transaction.atomic():
-            for i, p1 in enumerate(puntos):
-                for p2 in puntos[i+1:]:
-                    distancia = p1.ubicacion.distance(p2.ubicacion) * 111139  # grados → metros
-
-                    if distancia <= MAX_DIST:
-                        cost = distancia / WALK_SPEED  # minutos
-                        
-                        # Crear transbordo bidireccional
-                        Edge.objects.create(
-                            ruta=None,
-                            source=p1,
-                            target=p2,
-                            cost=cost,
-                            geom=LineString(
-                                (p1.ubicacion.x, p1.ubicacion.y),
-                                (p2.ubicacion.x, p2.ubicacion.y),
-                                srid=4326
-                            )
-                        )
-                        Edge.objects.create(
-                            ruta=None,
-                            source=p2,
-                            target=p1,
-                            cost=cost,
-                            geom=LineString(
-                                (p2.ubicacion.x, p2.ubicacion.y),
-                                (p1.ubicacion.x, p1.ubicacion.y),
-                                srid=4326
-                            )
-                        )
-                        total_cercania += 2
-
-        self.stdout.write(self.style.SUCCESS(f"✔️ {total_cercania} transbordos de cercanía generados"))
-        self.stdout.write(self.style.SUCCESS("🎉 Todos los transbordos generados correctamente"))
+        cercania = list(edges_cercania({p.id: p for p in puntos}, indice_puntos(puntos).pares_cercanos()))
+        if not dry_run:
+            Edge.objects.bulk_create(cercania, batch_size=5000)
+        return len(cercania)
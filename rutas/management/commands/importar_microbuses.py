@@ -1,8 +1,124 @@
+import hashlib
+import time
+from itertools import islice
+
 import pandas as pd
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.gis.geos import Point, LineString
+from django.db import transaction
+from django.db.models import F, Q
 
 from rutas.models import Punto, Ruta, LineaRuta, Edge
+from rutas.grafo import incrementar_version_grafo
+from rutas.management.commands.generar_transbordos import refrescar_cercania
+
+
+def insertar_en_lotes(modelo, objetos, batch_size):
+    """bulk_create por tandas consumiendo un iterador, sin armar la lista completa."""
+    objetos = iter(objetos)
+    total = 0
+    while True:
+        lote = list(islice(objetos, batch_size))
+        if not lote:
+            return total
+        modelo.objects.bulk_create(lote, batch_size=batch_size)
+        total += len(lote)
+
+
+COLUMNAS_HUELLA = ['Orden', 'IdPunto', 'Latitud', 'Longitud', 'Tiempo']
+# Se incrementa cuando cambia lo que se deriva de LineasPuntos (v2: la
+# geometría de LineaRuta), así el siguiente import incremental reescribe
+# todas las líneas una vez
+FORMATO_HUELLA = b"v2"
+
+
+def huellas_por_linea(lineas_puntos_df, ruta_de_linea_ruta):
+    """
+    sha256 por IdLineaRuta de sus filas de LineasPuntos (ordenadas) y de
+    la Ruta a la que pertenece: si no cambia, sus Edges tampoco.
+    """
+    lp = lineas_puntos_df.sort_values(['IdLineaRuta', 'Orden'], kind='stable')
+    filas = pd.util.hash_pandas_object(lp[COLUMNAS_HUELLA], index=False).to_numpy()
+
+    huellas = {}
+    inicio = 0
+    for id_linea_ruta, n in lp.groupby('IdLineaRuta', sort=False).size().items():
+        h = hashlib.sha256(FORMATO_HUELLA)
+        h.update(filas[inicio:inicio + n].tobytes())
+        h.update(str(ruta_de_linea_ruta.get(id_linea_ruta)).encode())
+        huellas[int(id_linea_ruta)] = h.hexdigest()
+        inicio += n
+    return huellas
+
+
+def geometrias_por_linea(lineas_puntos_df):
+    """
+    LineString por IdLineaRuta con sus paradas en orden (vacía si tiene
+    menos de dos). Es la geometría que usan los filtros ?in_bbox= / ?near=
+    de /lineas/ y /rutas/.
+    """
+    lp = lineas_puntos_df.sort_values(['IdLineaRuta', 'Orden'], kind='stable')
+    geometrias = {}
+    for id_linea_ruta, grupo in lp.groupby('IdLineaRuta', sort=False):
+        coords = list(zip(grupo['Longitud'].astype(float).tolist(), grupo['Latitud'].astype(float).tolist()))
+        geometrias[int(id_linea_ruta)] = LineString(coords, srid=4326) if len(coords) > 1 else LineString()
+    return geometrias
+
+
+def validar_lineas_puntos(lineas_puntos_df, ids_puntos, ruta_de_linea_ruta):
+    sin_ruta = sorted(set(lineas_puntos_df['IdLineaRuta'].tolist()) - ruta_de_linea_ruta.keys())
+    if sin_ruta:
+        raise CommandError(f"IdLineaRuta sin LineaRuta en el Excel: {sin_ruta[:20]}")
+    faltantes = sorted(set(lineas_puntos_df['IdPunto'].tolist()) - ids_puntos)
+    if faltantes:
+        raise CommandError(f"IdPunto usados en LineasPuntos que no están en Puntos: {faltantes[:20]}")
+
+
+def edges_de_lineas(lineas_puntos_df, ruta_de_linea_ruta):
+    """Genera los Edge de bus: cada parada se une con la siguiente de su LineaRuta."""
+    lp = lineas_puntos_df.sort_values(['IdLineaRuta', 'Orden'], kind='stable')
+    siguiente = lp.groupby('IdLineaRuta')[['IdPunto', 'Latitud', 'Longitud', 'Tiempo']].shift(-1)
+    validas = siguiente['IdPunto'].notna()
+    lp = lp[validas]
+    siguiente = siguiente[validas]
+
+    linea_ruta_ids = lp['IdLineaRuta'].astype('int64').tolist()
+
+    for linea_ruta_id, s, t, cost, lat1, lon1, lat2, lon2 in zip(
+        linea_ruta_ids,
+        lp['IdPunto'].astype('int64').tolist(),
+        siguiente['IdPunto'].astype('int64').tolist(),
+        siguiente['Tiempo'].astype(float).tolist(),
+        lp['Latitud'].astype(float).tolist(),
+        lp['Longitud'].astype(float).tolist(),
+        siguiente['Latitud'].astype(float).tolist(),
+        siguiente['Longitud'].astype(float).tolist(),
+    ):
+        yield Edge(
+            ruta_id=ruta_de_linea_ruta[linea_ruta_id],
+            linea_ruta_id=linea_ruta_id,
+            source_id=s,
+            target_id=t,
+            cost=cost,
+            geom=LineString((lon1, lat1), (lon2, lat2), srid=4326),
+        )
+
+
+def filas_puntos(puntos_df):
+    return zip(
+        puntos_df['IdPunto'].astype('int64').tolist(),
+        puntos_df['Descripcion'].astype(str).tolist(),
+        puntos_df['Latitud'].astype(float).tolist(),
+        puntos_df['Longitud'].astype(float).tolist(),
+    )
+
+
+def filas_rutas(lineas_df):
+    return zip(
+        lineas_df['IdLinea'].astype('int64').tolist(),
+        lineas_df['NombreLinea'].astype(str).tolist(),
+        lineas_df['ColorLinea'].astype(str).tolist(),
+    )
 
 
 class Command(BaseCommand):
@@ -10,99 +126,292 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('excel_path', type=str, help='Ruta al archivo Excel con los datos')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Filas por INSERT en bulk_create (default: 5000)',
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Solo reescribe las líneas cuyo contenido cambió respecto a la BD',
+        )
 
     def handle(self, *args, **options):
         excel_path = options['excel_path']
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1:
+            raise CommandError("--batch-size debe ser mayor que 0")
+
         self.stdout.write(self.style.SUCCESS(f"📄 Cargando datos desde: {excel_path}"))
 
+        inicio = time.perf_counter()
         xls = pd.ExcelFile(excel_path, engine='openpyxl')
 
+        if options['incremental']:
+            self.importar_incremental(xls)
+            self.stdout.write(self.style.SUCCESS(
+                f" Importación incremental completa en {time.perf_counter() - inicio:.2f}s"
+            ))
+            return
+
+        # Todo o nada: si algo falla la BD queda como estaba
+        with transaction.atomic():
+            Edge.objects.all().delete()
+            LineaRuta.objects.all().delete()
+            Ruta.objects.all().delete()
+            Punto.objects.all().delete()
+
+            ids_puntos = self.importar_puntos(xls)
+            self.importar_rutas(xls)
+            ruta_de_linea_ruta = self.importar_lineas_ruta(xls)
+            self.importar_edges(xls, ids_puntos, ruta_de_linea_ruta)
+
+        version = incrementar_version_grafo()
+        self.stdout.write(f"🔁 Red actualizada a la versión {version}")
+        self.stdout.write(self.style.SUCCESS(
+            f" Importación completa en {time.perf_counter() - inicio:.2f}s"
+        ))
+
+    def reportar(self, hoja, filas, inicio):
+        segundos = time.perf_counter() - inicio
+        tasa = filas / segundos if segundos > 0 else 0
+        self.stdout.write(f"   ⏱️ {hoja}: {filas} filas en {segundos:.2f}s ({tasa:,.0f} filas/s)")
+
+    # ---------- IMPORTACIÓN COMPLETA ----------
+
+    def importar_puntos(self, xls):
+        inicio = time.perf_counter()
         puntos_df = pd.read_excel(xls, 'Puntos')
 
         self.stdout.write("📍 Importando Puntos...")
-        Punto.objects.all().delete()
 
-        for _, row in puntos_df.iterrows():
-            Punto.objects.create(
-                id=row['IdPunto'],  
-                descripcion=row['Descripcion'],
-                ubicacion=Point(float(row['Longitud']), float(row['Latitud']), srid=4326)
-            )
+        objetos = (
+            Punto(id=pid, descripcion=descripcion, ubicacion=Point(lon, lat, srid=4326))
+            for pid, descripcion, lat, lon in filas_puntos(puntos_df)
+        )
+        total = insertar_en_lotes(Punto, objetos, self.batch_size)
 
-        self.stdout.write(self.style.SUCCESS(f"✔️ {len(puntos_df)} Puntos importados"))
+        self.stdout.write(self.style.SUCCESS(f"✔️ {total} Puntos importados"))
+        self.reportar('Puntos', total, inicio)
+        return set(puntos_df['IdPunto'].astype('int64').tolist())
 
+    def importar_rutas(self, xls):
+        inicio = time.perf_counter()
         lineas_df = pd.read_excel(xls, 'Lineas')
 
         self.stdout.write("🚌 Importando Rutas (Lineas)...")
-        Ruta.objects.all().delete()
-
-        for _, row in lineas_df.iterrows():
-            Ruta.objects.create(
-                id=row['IdLinea'],
-                nombre=row['NombreLinea'],
-                linea=row['NombreLinea'],  
-                color=row['ColorLinea']
-            )
 
-        self.stdout.write(self.style.SUCCESS(f"✔️ {len(lineas_df)} Rutas importadas"))
+        objetos = (
+            Ruta(id=rid, nombre=nombre, linea=nombre, color=color)
+            for rid, nombre, color in filas_rutas(lineas_df)
+        )
+        total = insertar_en_lotes(Ruta, objetos, self.batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f"✔️ {total} Rutas importadas"))
+        self.reportar('Lineas', total, inicio)
 
+    def importar_lineas_ruta(self, xls):
+        inicio = time.perf_counter()
         lineas_rutas_df = pd.read_excel(xls, 'LineaRuta')
 
         self.stdout.write("🔗 Importando LineaRuta...")
-        LineaRuta.objects.all().delete()
-
-        for _, row in lineas_rutas_df.iterrows():
-            ruta = Ruta.objects.get(id=row['IdLinea'])
-            LineaRuta.objects.create(
-                id=row['IdLineaRuta'],
-                ruta=ruta,
-                geom=LineString()  
-            )
 
-        self.stdout.write(self.style.SUCCESS(f"✔️ {len(lineas_rutas_df)} LineaRuta importadas"))
+        ids = lineas_rutas_df['IdLineaRuta'].astype('int64').tolist()
+        rutas = lineas_rutas_df['IdLinea'].astype('int64').tolist()
+        objetos = (
+            LineaRuta(id=lrid, ruta_id=rid, geom=LineString())
+            for lrid, rid in zip(ids, rutas)
+        )
+        total = insertar_en_lotes(LineaRuta, objetos, self.batch_size)
 
+        self.stdout.write(self.style.SUCCESS(f"✔️ {total} LineaRuta importadas"))
+        self.reportar('LineaRuta', total, inicio)
+        return dict(zip(ids, rutas))
+
+    def importar_edges(self, xls, ids_puntos, ruta_de_linea_ruta):
+        inicio = time.perf_counter()
         lineas_puntos_df = pd.read_excel(xls, 'LineasPuntos')
 
         self.stdout.write("🧩 Generando Edges para Dijkstra...")
-        Edge.objects.all().delete()
-
-        grupos = lineas_puntos_df.groupby('IdLineaRuta')
-
-        total_edges = 0
-
-        for id_linea_ruta, grupo in grupos:
-            grupo = grupo.sort_values(by='Orden')
-
-            # Obtener la Ruta real
-            linea_ruta = LineaRuta.objects.get(id=id_linea_ruta)
-            ruta = linea_ruta.ruta
-
-            puntos = grupo[['IdPunto', 'Latitud', 'Longitud', 'Distancia', 'Tiempo']].values
 
-            for i in range(len(puntos) - 1):
-                p1 = puntos[i]
-                p2 = puntos[i + 1]
+        validar_lineas_puntos(lineas_puntos_df, ids_puntos, ruta_de_linea_ruta)
+        total_edges = insertar_en_lotes(
+            Edge, edges_de_lineas(lineas_puntos_df, ruta_de_linea_ruta), self.batch_size,
+        )
+
+        # Geometría de cada línea y huellas para que la próxima importación
+        # incremental pueda comparar
+        huellas = huellas_por_linea(lineas_puntos_df, ruta_de_linea_ruta)
+        geometrias = geometrias_por_linea(lineas_puntos_df)
+        LineaRuta.objects.bulk_update(
+            [LineaRuta(id=lrid, huella=h, geom=geometrias[lrid]) for lrid, h in huellas.items()],
+            ['huella', 'geom'],
+            batch_size=self.batch_size,
+        )
 
-                punto_source = Punto.objects.get(id=p1[0])
-                punto_target = Punto.objects.get(id=p2[0])
-
-                cost = float(p2[4])  
+        self.stdout.write(self.style.SUCCESS(f" {total_edges} Edges generados con éxito"))
+        self.reportar('LineasPuntos', len(lineas_puntos_df), inicio)
+
+    # ---------- IMPORTACIÓN INCREMENTAL ----------
+
+    def importar_incremental(self, xls):
+        # Los Edges de bus importados antes de guardar linea_ruta no se pueden
+        # asociar a su línea; hace falta una importación completa primero.
+        legado = Edge.objects.filter(
+            ruta__isnull=False, linea_ruta__isnull=True,
+        ).exclude(source=F('target'))
+        if legado.exists():
+            raise CommandError(
+                "Hay Edges de bus sin linea_ruta (importación anterior). "
+                "Corre una importación completa antes de usar --incremental."
+            )
 
-                geom = LineString(
-                    (float(p1[2]), float(p1[1])),
-                    (float(p2[2]), float(p2[1])),
-                    srid=4326
-                )
+        inicio = time.perf_counter()
+        puntos_df = pd.read_excel(xls, 'Puntos')
+        lineas_df = pd.read_excel(xls, 'Lineas')
+        lineas_rutas_df = pd.read_excel(xls, 'LineaRuta')
+        lineas_puntos_df = pd.read_excel(xls, 'LineasPuntos')
+        self.reportar('Excel', len(puntos_df) + len(lineas_df) + len(lineas_rutas_df) + len(lineas_puntos_df), inicio)
+
+        ruta_de_linea_ruta = dict(zip(
+            lineas_rutas_df['IdLineaRuta'].astype('int64').tolist(),
+            lineas_rutas_df['IdLinea'].astype('int64').tolist(),
+        ))
+        validar_lineas_puntos(
+            lineas_puntos_df, set(puntos_df['IdPunto'].astype('int64').tolist()), ruta_de_linea_ruta,
+        )
+
+        # Solo se rehacen transbordos a pie si ya se generaron alguna vez
+        con_transbordos = Edge.objects.filter(ruta__isnull=True).exists()
+
+        with transaction.atomic():
+            puntos_cambiados = self.sincronizar_puntos(puntos_df)
+            rutas_cambiadas = self.sincronizar_rutas(lineas_df)
+            lineas_cambiadas, rutas_de_lineas = self.sincronizar_lineas(
+                lineas_puntos_df, ruta_de_linea_ruta,
+            )
+            if puntos_cambiados and con_transbordos:
+                borrados, creados = refrescar_cercania(puntos_cambiados, self.batch_size)
+                self.stdout.write(f"🚶 Transbordos por cercanía rehechos: {borrados} borrados, {creados} creados")
+
+        rutas_afectadas = rutas_cambiadas | rutas_de_lineas
+        if puntos_cambiados:
+            # Las rutas que pasan por un Punto movido también cambian
+            rutas_afectadas |= set(
+                Edge.objects.filter(
+                    Q(source_id__in=puntos_cambiados) | Q(target_id__in=puntos_cambiados),
+                    ruta__isnull=False,
+                ).values_list('ruta_id', flat=True).distinct()
+            )
 
-                Edge.objects.create(
-                    ruta=ruta,
-                    source=punto_source,
-                    target=punto_target,
-                    cost=cost,
-                    geom=geom,
+        if not (puntos_cambiados or rutas_cambiadas or lineas_cambiadas):
+            self.stdout.write(self.style.SUCCESS("✔️ Sin cambios respecto a la BD"))
+            return
+
+        self.stdout.write(f"📍 Puntos modificados: {len(puntos_cambiados)}")
+        self.stdout.write(f"🔗 LineaRuta modificadas: {sorted(lineas_cambiadas)}")
+        nombres = Ruta.objects.filter(id__in=rutas_afectadas).values_list('nombre', flat=True)
+        self.stdout.write(f"🚌 Rutas afectadas: {sorted(rutas_afectadas)} ({', '.join(n.strip() for n in nombres)})")
+
+        version = incrementar_version_grafo()
+        self.stdout.write(f"🔁 Red actualizada a la versión {version}")
+
+    def sincronizar_puntos(self, puntos_df):
+        """Crea, actualiza y borra Puntos; devuelve los ids que cambiaron."""
+        existentes = {
+            pid: (descripcion, u.x, u.y)
+            for pid, descripcion, u in Punto.objects.values_list('id', 'descripcion', 'ubicacion')
+        }
+
+        nuevos, modificados, ids = [], [], set()
+        for pid, descripcion, lat, lon in filas_puntos(puntos_df):
+            ids.add(pid)
+            actual = existentes.get(pid)
+            if actual == (descripcion, lon, lat):
+                continue
+            punto = Punto(id=pid, descripcion=descripcion, ubicacion=Point(lon, lat, srid=4326))
+            (nuevos if actual is None else modificados).append(punto)
+
+        eliminados = existentes.keys() - ids
+        if eliminados:
+            Punto.objects.filter(id__in=eliminados).delete()
+        insertar_en_lotes(Punto, nuevos, self.batch_size)
+        Punto.objects.bulk_update(modificados, ['descripcion', 'ubicacion'], batch_size=self.batch_size)
+
+        return {p.id for p in nuevos} | {p.id for p in modificados} | eliminados
+
+    def sincronizar_rutas(self, lineas_df):
+        """Crea, actualiza y borra Rutas; devuelve los ids que cambiaron."""
+        existentes = {
+            rid: (nombre, linea, color)
+            for rid, nombre, linea, color in Ruta.objects.values_list('id', 'nombre', 'linea', 'color')
+        }
+
+        nuevas, modificadas, ids = [], [], set()
+        for rid, nombre, color in filas_rutas(lineas_df):
+            ids.add(rid)
+            actual = existentes.get(rid)
+            if actual == (nombre, nombre, color):
+                continue
+            ruta = Ruta(id=rid, nombre=nombre, linea=nombre, color=color)
+            (nuevas if actual is None else modificadas).append(ruta)
+
+        eliminadas = existentes.keys() - ids
+        if eliminadas:
+            Ruta.objects.filter(id__in=eliminadas).delete()
+        insertar_en_lotes(Ruta, nuevas, self.batch_size)
+        Ruta.objects.bulk_update(modificadas, ['nombre', 'linea', 'color'], batch_size=self.batch_size)
+
+        return {r.id for r in nuevas} | {r.id for r in modificadas} | eliminadas
+
+    def sincronizar_lineas(self, lineas_puntos_df, ruta_de_linea_ruta):
+        """
+        Compara la huella de cada LineaRuta con la guardada y reescribe solo
+        los Edges de las que cambiaron. Devuelve (ids de LineaRuta
+        cambiadas, ids de Ruta afectadas).
+        """
+        huellas = huellas_por_linea(lineas_puntos_df, ruta_de_linea_ruta)
+        geometrias = geometrias_por_linea(lineas_puntos_df)
+        existentes = {
+            lrid: (ruta_id, huella)
+            for lrid, ruta_id, huella in LineaRuta.objects.values_list('id', 'ruta_id', 'huella')
+        }
+
+        cambiadas = {
+            lrid for lrid in ruta_de_linea_ruta
+            if existentes.get(lrid, (None, None))[1] != huellas.get(lrid, "")
+        }
+        eliminadas = existentes.keys() - ruta_de_linea_ruta.keys()
+
+        rutas = {ruta_de_linea_ruta[lrid] for lrid in cambiadas}
+        rutas |= {existentes[lrid][0] for lrid in (cambiadas | eliminadas) if lrid in existentes}
+
+        if eliminadas:
+            LineaRuta.objects.filter(id__in=eliminadas).delete()
+
+        # Reescribir solo las líneas cambiadas
+        Edge.objects.filter(linea_ruta_id__in=cambiadas).delete()
+        insertar_en_lotes(
+            LineaRuta,
+            (
+                LineaRuta(id=lrid, ruta_id=ruta_de_linea_ruta[lrid], geom=geometrias.get(lrid, LineString()))
+                for lrid in cambiadas if lrid not in existentes
+            ),
+            self.batch_size,
+        )
+        LineaRuta.objects.bulk_update(
+            [
+                LineaRuta(
+                    id=lrid, ruta_id=ruta_de_linea_ruta[lrid], huella=huellas.get(lrid, ""),
+                    geom=geometrias.get(lrid, LineString()),
                 )
+                for lrid in cambiadas
+            ],
+            ['ruta', 'huella', 'geom'],
+            batch_size=self.batch_size,
+        )
 
-                total_edges += 1
+        filas = lineas_puntos_df[lineas_puntos_df['IdLineaRuta'].isin(cambiadas)]
+        total = insertar_en_lotes(Edge, edges_de_lineas(filas, ruta_de_linea_ruta), self.batch_size)
+        self.stdout.write(f"🧩 {total} Edges reescritos en {len(cambiadas)} LineaRuta")
 
-        self.stdout.write(self.style.SUCCESS(f" {total_edges} Edges generados con éxito"))
-        self.stdout.write(self.style.SUCCESS(" Importación completa"))
+        return cambiadas | eliminadas, {r for r in rutas if r is not None}
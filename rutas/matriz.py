@@ -0,0 +1,98 @@
+"""
+Matrices de costos parada a parada sobre el grafo CSR.
+
+Cada fila es una búsqueda uno-a-todos desde un origen que se detiene al
+asentar todos los destinos pedidos. Las filas se reparten en bloques
+entre procesos de un pool; cada proceso recibe los arrays del grafo una
+sola vez al iniciar, así que por tarea solo viajan ids y la fila de
+resultados.
+
+No depende de Django.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from .busqueda import dijkstra_uno_a_todos
+from .csr import GrafoCSR
+
+# Con menos filas no vale la pena pagar la comunicación con el pool
+MIN_FILAS_POOL = 32
+
+_grafo_proceso = None  # grafo de cada proceso del pool
+
+
+def _inicializar(arrays):
+    global _grafo_proceso
+    _grafo_proceso = GrafoCSR(*arrays)
+
+
+def _arrays(grafo):
+    # Solo lo necesario para buscar: sin coordenadas ni cachés derivadas
+    return (
+        grafo.nodos, grafo.offsets, grafo.destinos,
+        grafo.costos, grafo.rutas, grafo.modos, grafo.edges,
+    )
+
+
+def filas_matriz(grafo, origenes, destinos):
+    """Bloque de la matriz (len(origenes) x len(destinos)); inf = sin camino."""
+    objetivos = set(destinos)
+    filas = np.full((len(origenes), len(destinos)), np.inf)
+    for i, origen in enumerate(origenes):
+        costos = dijkstra_uno_a_todos(grafo, origen, objetivos=objetivos)
+        filas[i] = [costos.get(d, np.inf) for d in destinos]
+    return filas
+
+
+def _filas_en_proceso(origenes, destinos):
+    return filas_matriz(_grafo_proceso, origenes, destinos)
+
+
+class PoolMatriz:
+    """
+    Pool de procesos atado a un grafo. Se crea con el contexto "spawn"
+    (no se hace fork de un worker web con hilos y conexiones abiertas).
+    """
+
+    def __init__(self, grafo, procesos=None):
+        self.grafo = grafo
+        self.procesos = procesos or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.procesos,
+            mp_context=get_context("spawn"),
+            initializer=_inicializar,
+            initargs=(_arrays(grafo),),
+        )
+
+    def calcular(self, origenes, destinos):
+        origenes, destinos = list(origenes), list(destinos)
+        if self.procesos == 1 or len(origenes) < MIN_FILAS_POOL:
+            return filas_matriz(self.grafo, origenes, destinos)
+
+        # Varios bloques por proceso para repartir bien filas de distinto costo
+        tam = max(1, len(origenes) // (self.procesos * 4))
+        bloques = [origenes[i:i + tam] for i in range(0, len(origenes), tam)]
+        futuros = [self._executor.submit(_filas_en_proceso, b, destinos) for b in bloques]
+        return np.vstack([f.result() for f in futuros])
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_lock = threading.Lock()
+_pool = None
+
+
+def obtener_pool(grafo, procesos=None):
+    """Pool del proceso actual; se recrea cuando cambia el grafo."""
+    global _pool
+    with _lock:
+        if _pool is None or _pool.grafo is not grafo:
+            if _pool is not None:
+                _pool.cerrar()
+            _pool = PoolMatriz(grafo, procesos)
+        return _pool
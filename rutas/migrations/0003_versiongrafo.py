@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0002_alter_edge_ruta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionGrafo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0003_versiongrafo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='edge',
+            name='linea_ruta',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='edges', to='rutas.linearuta'),
+        ),
+        migrations.AddField(
+            model_name='linearuta',
+            name='huella',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:13
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0004_edge_linea_ruta_linearuta_huella_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='versiongrafo',
+            name='token',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
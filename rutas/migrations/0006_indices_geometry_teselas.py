@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Índices GiST sobre el cast a geometry que usa el filtro de SQL_TESELA
+# (`geom::geometry && caja`); los GiST de las columnas geography no sirven
+# para esa expresión. Solo en PostGIS (SpatiaLite no arma teselas).
+INDICES = (
+    ("rutas_edge_geom_geometry_idx", "Edge", "geom"),
+    ("rutas_punto_ubicacion_geometry_idx", "Punto", "ubicacion"),
+)
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for nombre, modelo, columna in INDICES:
+        tabla = apps.get_model("rutas", modelo)._meta.db_table
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gist (({columna}::geometry))"
+        )
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0005_versiongrafo_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
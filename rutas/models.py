@@ -1,3 +1,5 @@
+import uuid
+
 from django.contrib.gis.db import models
 
 class Punto(models.Model):
@@ -20,16 +22,29 @@ class Ruta(models.Model):
 class LineaRuta(models.Model):
     ruta = models.ForeignKey(Ruta, on_delete=models.CASCADE, related_name='segmentos')
     geom = models.LineStringField(geography=True)
+    huella = models.CharField(max_length=64, blank=True, default="")  # hash de sus LineasPuntos
 
     def __str__(self):
         return f"Segmento de {self.ruta.nombre}"
     
 class Edge(models.Model):
     ruta = models.ForeignKey(Ruta, on_delete=models.CASCADE,null=True, blank=True)
+    linea_ruta = models.ForeignKey(LineaRuta, on_delete=models.CASCADE, null=True, blank=True, related_name='edges')
     source = models.ForeignKey(Punto, related_name="edges_from", on_delete=models.CASCADE)
     target = models.ForeignKey(Punto, related_name="edges_to", on_delete=models.CASCADE)
     cost = models.FloatField()  # distancia o tiempo
     geom = models.LineStringField(geography=True)
 
     def __str__(self):
-        return f"Edge from {self.source} to {self.target} on {self.ruta.nombre}"
\ No newline at end of file
+        return f"Edge from {self.source} to {self.target} on {self.ruta.nombre}"
+
+class VersionGrafo(models.Model):
+    # Fila única (pk=1) que se incrementa cada vez que cambia la red
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+    # Distinto en cada base de datos: los snapshots en disco (grafo, CH) lo
+    # guardan para no abrir el de otra base con el mismo número de versión
+    token = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    def __str__(self):
+        return f"Grafo v{self.version}"
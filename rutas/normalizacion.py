@@ -0,0 +1,85 @@
+"""
+Normalización de las aristas antes de armar el grafo.
+
+Los transbordos llegan por dos lados: los Edges sin ruta que guarda
+`generar_transbordos` y los pares de Puntos a menos de
+TRANSFER_RADIUS_METERS que el grafo agrega al cargarse
+(`aristas_transbordo`). Ambos usan el mismo radio y `costo_caminata`.
+Todas las aristas pasan por la misma política:
+  - una arista sin ruta es un transbordo a pie (modo "transfer"), venga
+    de la BD o del índice espacial;
+  - los self-loops se descartan (p. ej. los que guardaban versiones
+    anteriores de `generar_transbordos`): el estado de la búsqueda es la
+    parada, así que no mejoran ningún costo, y en la búsqueda de Pareto
+    subir directo a la otra ruta da los mismos transbordos con menos costo;
+  - de las aristas con el mismo (origen, destino, ruta, modo) queda la de
+    menor costo; a igual costo, la que viene de un Edge (la de menor pk).
+Las que quedan conservan su orden de carga.
+
+No depende de Django.
+"""
+import numpy as np
+
+from .constantes import TRANSFER_RADIUS_METERS, costo_caminata
+from .csr import SIN_EDGE
+from .espacial import IndiceEspacial
+
+
+def aristas_transbordo(ids, lats, lons):
+    """
+    Transbordos a pie entre paradas a menos de TRANSFER_RADIUS_METERS, en
+    ambos sentidos y con `costo_caminata`: columnas (origenes, destinos,
+    costos) para sumar a las de los Edges antes de `normalizar_aristas`.
+    """
+    pares = np.fromiter(
+        IndiceEspacial(ids, lats, lons, TRANSFER_RADIUS_METERS).pares_cercanos(),
+        dtype=[("a", "i8"), ("b", "i8"), ("distancia", "f8")],
+    )
+    a, b = pares["a"], pares["b"]
+    costos = costo_caminata(pares["distancia"])
+    return np.concatenate([a, b]), np.concatenate([b, a]), np.concatenate([costos, costos])
+
+
+def normalizar_aristas(origenes, destinos, costos, rutas, modos, edges):
+    """
+    Aplica la política a columnas de aristas (ids de Punto, como en
+    `GrafoCSR.desde_aristas`). Devuelve las seis columnas filtradas y un
+    informe con aristas y nodos (con alguna arista) antes y después.
+    """
+    origenes = np.asarray(origenes, dtype=np.int64)
+    destinos = np.asarray(destinos, dtype=np.int64)
+    costos = np.asarray(costos, dtype=np.float64)
+    rutas = np.asarray(rutas, dtype=np.int64)
+    modos = np.asarray(modos, dtype=np.int8)
+    edges = np.asarray(edges, dtype=np.int64)
+
+    validas = np.flatnonzero(origenes != destinos)
+
+    # Cada grupo (origen, destino, ruta, modo) queda contiguo y empieza por
+    # la arista a conservar
+    orden = validas[np.lexsort((
+        edges[validas],
+        edges[validas] == SIN_EDGE,
+        costos[validas],
+        modos[validas],
+        rutas[validas],
+        destinos[validas],
+        origenes[validas],
+    ))]
+    repetida = np.ones(len(orden), dtype=bool)
+    repetida[:1] = False
+    for columna in (origenes, destinos, rutas, modos):
+        valores = columna[orden]
+        repetida[1:] &= valores[1:] == valores[:-1]
+    quedan = np.sort(orden[~repetida])
+
+    informe = {
+        "aristas_antes": len(origenes),
+        "aristas_despues": len(quedan),
+        "self_loops": len(origenes) - len(validas),
+        "paralelas": len(validas) - len(quedan),
+        "nodos_antes": len(np.union1d(origenes, destinos)),
+        "nodos_despues": len(np.union1d(origenes[quedan], destinos[quedan])),
+    }
+    columnas = tuple(c[quedan] for c in (origenes, destinos, costos, rutas, modos, edges))
+    return columnas, informe
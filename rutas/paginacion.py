@@ -0,0 +1,33 @@
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class CursorGeoJSON(CursorPagination):
+    """
+    Paginación por cursor (keyset sobre el id) que devuelve un
+    FeatureCollection. No cuenta filas ni usa OFFSET: cada página cuesta lo
+    mismo sin importar cuán lejos esté.
+    """
+    ordering = "id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("type", "FeatureCollection"),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("features", data["features"]),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        respuesta = super().get_paginated_response_schema(schema)
+        respuesta["properties"]["features"] = respuesta["properties"].pop("results")
+        respuesta["properties"] = {
+            "type": {"type": "string", "enum": ["FeatureCollection"]},
+            **respuesta["properties"],
+        }
+        return respuesta
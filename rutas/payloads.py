@@ -0,0 +1,166 @@
+"""
+Respuesta precalculada de /rutas/todas/.
+
+La red completa se arma una vez por versión: una LineString por
+LineaRuta (los Edges de bus unidos en orden), serializada a JSON y
+comprimida con gzip (y brotli si está instalado). Se guarda en disco en
+`RUTAS_CACHE_DIR` y en memoria de cada worker; el ETag es el hash del
+contenido y Last-Modified la fecha de la versión de la red.
+"""
+import gzip
+import hashlib
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsWKB
+from django.db.models import F
+from django.dispatch import receiver
+
+from .binario import escritura_atomica
+from .geojson import coordenadas_wkb, dumps
+from .grafo import estado_grafo
+from .models import Ruta, Edge
+from .signals import red_actualizada
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional
+    brotli = None
+
+COMPRESIONES = {"gzip": ".gz", "br": ".br"}
+
+
+def directorio_cache():
+    return Path(getattr(settings, "RUTAS_CACHE_DIR", settings.BASE_DIR / "cache"))
+
+
+def _archivo(version, extension=""):
+    return directorio_cache() / f"red-v{version}.json{extension}"
+
+
+def serializar_red():
+    """JSON (bytes) de todas las rutas con una geometría unida por LineaRuta."""
+    data = []
+    por_ruta = {}
+    for r in Ruta.objects.order_by("id"):
+        entrada = {
+            "ruta_id": r.id,
+            "nombre": r.nombre.strip(),
+            "linea": r.linea.strip(),
+            "color": r.color.strip(),
+            "segmentos": [],
+        }
+        data.append(entrada)
+        por_ruta[r.id] = entrada
+
+    # Solo Edges de bus (sin self-loops de transbordo), en el orden del import
+    edges = (
+        Edge.objects.filter(ruta__isnull=False)
+        .exclude(source_id=F("target_id"))
+        .order_by("ruta_id", "linea_ruta_id", "id")
+        .values_list("ruta_id", "linea_ruta_id", AsWKB("geom"))
+    )
+
+    actual = None
+    coords = []
+
+    def cerrar():
+        if actual is not None and coords:
+            ruta_id, linea_ruta_id = actual
+            por_ruta[ruta_id]["segmentos"].append({
+                "id": linea_ruta_id if linea_ruta_id is not None else ruta_id,
+                "geometry": dumps({"type": "LineString", "coordinates": coords}).decode("utf-8"),
+            })
+
+    for ruta_id, linea_ruta_id, wkb in edges.iterator(chunk_size=5000):
+        if (ruta_id, linea_ruta_id) != actual:
+            cerrar()
+            actual = (ruta_id, linea_ruta_id)
+            coords = []
+        puntos = coordenadas_wkb(wkb)
+        if coords and puntos and coords[-1] == puntos[0]:
+            puntos = puntos[1:]
+        coords.extend(puntos)
+    cerrar()
+
+    return dumps(data)
+
+
+def _armar(version, actualizado, contenido, comprimidos):
+    return {
+        "version": version,
+        "ultima_modificacion": actualizado,
+        "etag": '"red-%s-%s"' % (version, hashlib.sha256(contenido).hexdigest()[:16]),
+        "contenido": contenido,
+        **comprimidos,
+    }
+
+
+def precalcular_payload_red(version=None, actualizado=None):
+    """Arma el payload de la versión actual y lo deja en disco (escritura atómica)."""
+    if version is None:
+        version, actualizado = estado_grafo()
+
+    contenido = serializar_red()
+    comprimidos = {"gzip": gzip.compress(contenido, compresslevel=9)}
+    if brotli is not None:
+        comprimidos["br"] = brotli.compress(contenido, quality=11)
+
+    directorio = directorio_cache()
+    directorio.mkdir(parents=True, exist_ok=True)
+    for codificacion, datos in (("", contenido), *comprimidos.items()):
+        destino = _archivo(version, COMPRESIONES.get(codificacion, ""))
+        with escritura_atomica(destino) as f:
+            f.write(datos)
+
+    # Versiones viejas ya no sirven
+    for viejo in directorio.glob("red-v*.json*"):
+        if not viejo.name.startswith(f"red-v{version}.json"):
+            viejo.unlink(missing_ok=True)
+
+    return _armar(version, actualizado, contenido, comprimidos)
+
+
+def _leer_de_disco(version, actualizado):
+    try:
+        contenido = _archivo(version).read_bytes()
+    except FileNotFoundError:
+        return None
+    comprimidos = {}
+    for codificacion, extension in COMPRESIONES.items():
+        try:
+            comprimidos[codificacion] = _archivo(version, extension).read_bytes()
+        except FileNotFoundError:
+            pass
+    return _armar(version, actualizado, contenido, comprimidos)
+
+
+_lock = threading.Lock()
+_cache = None
+
+
+def obtener_payload_red():
+    """Payload de la versión actual: memoria, luego disco, y si no, se arma."""
+    global _cache
+    version, actualizado = estado_grafo()
+
+    payload = _cache
+    if payload is not None and payload["version"] == version:
+        return payload
+
+    with _lock:
+        payload = _cache
+        if payload is None or payload["version"] != version:
+            payload = _leer_de_disco(version, actualizado)
+            if payload is None:
+                payload = precalcular_payload_red(version, actualizado)
+            _cache = payload
+        return payload
+
+
+@receiver(red_actualizada)
+def _al_actualizar_red(sender, version, **kwargs):
+    # Se ejecuta en el proceso que hizo el import: deja el payload listo en
+    # disco para que los workers no tengan que armarlo.
+    precalcular_payload_red()
@@ -0,0 +1,26 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import geojson
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    JSONRenderer de DRF que codifica con `geojson.dumps` (orjson si está
+    instalado). Si se pide indentación (`; indent=`) o no hay orjson, usa
+    el renderer de DRF. Los tipos que solo conoce el encoder de DRF
+    (Decimal, fechas, textos traducibles...) pasan por él, así que se
+    codifican igual que con JSONRenderer: fechas ISO 8601 con "Z" para
+    UTC, Decimal como número.
+
+    Diferencias con JSONRenderer: NaN/Infinity salen como null (DRF da
+    error con STRICT_JSON) y U+2028/U+2029 van sin escapar (JSON válido).
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if geojson.orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return geojson.dumps(data, self._encoder.default)
@@ -1,21 +1,73 @@
+from collections import OrderedDict
+
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from .models import Punto, Ruta, LineaRuta
 
-class PuntoSerializer(GeoFeatureModelSerializer):
+
+def parametros_proyeccion(request):
+    """
+    (campos pedidos o None, omitir geometría) según ?fields=a,b y
+    ?omit_geometry=1 del pedido.
+    """
+    if request is None:
+        return None, False
+    fields = request.query_params.get("fields")
+    campos = {c.strip() for c in fields.split(",") if c.strip()} if fields else None
+    omitir = request.query_params.get("omit_geometry", "").lower() in ("1", "true", "si", "sí")
+    return campos, omitir
+
+
+class ProyeccionMixin:
+    """
+    `?fields=` deja solo esas propiedades (el id va siempre) y
+    `?omit_geometry=1` devuelve features con geometry null, también en los
+    serializers anidados. Los nombres desconocidos se ignoran.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos, _ = parametros_proyeccion(self.context.get("request"))
+        if campos is not None:
+            fijos = {self.Meta.id_field, self.Meta.geo_field}
+            for nombre in list(self.fields):
+                if nombre not in campos and nombre not in fijos:
+                    self.fields.pop(nombre)
+
+    def to_representation(self, instance):
+        _, omitir = parametros_proyeccion(self.context.get("request"))
+        if not omitir or not self.Meta.geo_field:
+            return super().to_representation(instance)
+
+        # Igual que GeoFeatureModelSerializer, sin leer la geometría
+        feature = OrderedDict()
+        procesados = {self.Meta.geo_field}
+        if self.Meta.id_field:
+            campo = self.fields[self.Meta.id_field]
+            feature["id"] = campo.to_representation(campo.get_attribute(instance))
+            procesados.add(self.Meta.id_field)
+        feature["type"] = "Feature"
+        feature["geometry"] = None
+        feature["properties"] = self.get_properties(
+            instance, [f for nombre, f in self.fields.items() if nombre not in procesados],
+        )
+        return feature
+
+
+class PuntoSerializer(ProyeccionMixin, GeoFeatureModelSerializer):
     class Meta:
         model = Punto
         geo_field = "ubicacion"
         fields = ("id", "descripcion")
 
 
-class LineaRutaSerializer(GeoFeatureModelSerializer):
+class LineaRutaSerializer(ProyeccionMixin, GeoFeatureModelSerializer):
     class Meta:
         model = LineaRuta
         geo_field = "geom"
         fields = ("id", "ruta")
 
 
-class RutaSerializer(GeoFeatureModelSerializer):
+class RutaSerializer(ProyeccionMixin, GeoFeatureModelSerializer):
     segmentos = LineaRutaSerializer(many=True, read_only=True)
 
     class Meta:
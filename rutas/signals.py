@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Se emite cada vez que cambia la versión de la red (argumento: version).
+# Las cachés derivadas (grafo, payload, teselas) se rehacen completas.
+red_actualizada = Signal()
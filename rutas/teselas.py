@@ -0,0 +1,162 @@
+"""
+Teselas vectoriales (MVT) de la red: capa `lineas` (Edges de bus unidos
+por LineaRuta) y capa `puntos` (paradas, solo desde `ZOOM_MIN_PUNTOS`).
+
+Se generan en PostGIS con ST_AsMVT, simplificando las líneas a un píxel
+del zoom pedido, y se cachean por versión de la red: en memoria de cada
+worker (LRU acotado) y en disco bajo `RUTAS_CACHE_DIR/teselas/v{version}`.
+Al cambiar la red la versión cambia, así que las teselas viejas dejan de
+usarse y el receptor de `red_actualizada` borra sus archivos.
+"""
+import shutil
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.dispatch import receiver
+
+from .binario import escritura_atomica
+from .grafo import version_grafo
+from .models import Punto, Ruta, Edge
+from .payloads import directorio_cache
+from .signals import red_actualizada
+
+EXTENSION_MVT = 4096
+MARGEN_MVT = 64
+ZOOM_MAXIMO = 22
+ZOOM_MIN_PUNTOS = 13  # con menos zoom las paradas solo agregan peso
+
+# Mitad del ancho del mundo en EPSG:3857 (metros)
+ORIGEN_3857 = 20037508.342789244
+
+# El filtro por tesela se hace en geometry (4326): a zoom bajo la envoltura
+# cubre casi todo el mundo y como geography sus bordes serían geodésicas.
+# `geom::geometry` y `ubicacion::geometry` tienen su propio índice GiST
+# (migración 0006); sin él cada tesela no cacheada recorre las tablas enteras.
+SQL_TESELA = f"""
+    WITH limites AS (
+        SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS env,
+               ST_Transform(
+                   ST_TileEnvelope(%(z)s, %(x)s, %(y)s, margin => %(margen)s), 4326
+               ) AS caja
+    ),
+    lineas AS (
+        SELECT e.linea_ruta_id AS id, e.ruta_id, r.linea, r.color,
+               ST_AsMVTGeom(
+                   ST_Simplify(
+                       ST_LineMerge(ST_Collect(ST_Transform(e.geom::geometry, 3857))),
+                       %(tolerancia)s
+                   ),
+                   l.env, {EXTENSION_MVT}, {MARGEN_MVT}, true
+               ) AS geom
+        FROM {Edge._meta.db_table} e
+        JOIN {Ruta._meta.db_table} r ON r.id = e.ruta_id
+        CROSS JOIN limites l
+        WHERE e.source_id <> e.target_id AND e.geom::geometry && l.caja
+        GROUP BY e.linea_ruta_id, e.ruta_id, r.linea, r.color, l.env
+    ),
+    puntos AS (
+        SELECT p.id, p.descripcion,
+               ST_AsMVTGeom(
+                   ST_Transform(p.ubicacion::geometry, 3857),
+                   l.env, {EXTENSION_MVT}, {MARGEN_MVT}, true
+               ) AS geom
+        FROM {Punto._meta.db_table} p
+        CROSS JOIN limites l
+        WHERE %(z)s >= {ZOOM_MIN_PUNTOS} AND p.ubicacion::geometry && l.caja
+    )
+    SELECT
+        COALESCE((SELECT ST_AsMVT(lineas, 'lineas', {EXTENSION_MVT}, 'geom')
+                  FROM lineas WHERE geom IS NOT NULL), ''::bytea)
+        || COALESCE((SELECT ST_AsMVT(puntos, 'puntos', {EXTENSION_MVT}, 'geom')
+                     FROM puntos WHERE geom IS NOT NULL), ''::bytea)
+"""
+
+
+def tesela_valida(z, x, y):
+    return 0 <= z <= ZOOM_MAXIMO and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def generar_tesela(z, x, y):
+    """Bytes MVT de la tesela z/x/y (vacío si no hay nada dentro)."""
+    # Un píxel de la tesela en metros de EPSG:3857
+    tolerancia = 2 * ORIGEN_3857 / (2 ** z) / EXTENSION_MVT
+    params = {
+        "z": z, "x": x, "y": y,
+        "margen": MARGEN_MVT / EXTENSION_MVT,
+        "tolerancia": tolerancia,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_TESELA, params)
+        return bytes(cursor.fetchone()[0] or b"")
+
+
+# ---------- Caché ----------
+
+def directorio_teselas(version=None):
+    base = directorio_cache() / "teselas"
+    return base if version is None else base / f"v{version}"
+
+
+def _archivo(version, z, x, y):
+    return directorio_teselas(version) / str(z) / str(x) / f"{y}.mvt"
+
+
+_lock = threading.Lock()
+_memoria = OrderedDict()  # (version, z, x, y) -> bytes
+
+
+def _en_memoria(clave):
+    with _lock:
+        datos = _memoria.get(clave)
+        if datos is not None:
+            _memoria.move_to_end(clave)
+        return datos
+
+
+def _guardar_en_memoria(clave, datos):
+    maximo = getattr(settings, "RUTAS_TESELAS_EN_MEMORIA", 1024)
+    with _lock:
+        # Teselas de versiones anteriores ya no se van a pedir
+        if _memoria and next(iter(_memoria))[0] != clave[0]:
+            _memoria.clear()
+        _memoria[clave] = datos
+        while len(_memoria) > maximo:
+            _memoria.popitem(last=False)
+
+
+def obtener_tesela(z, x, y):
+    """Devuelve (version, bytes MVT): memoria, luego disco, y si no, PostGIS."""
+    version = version_grafo()
+    clave = (version, z, x, y)
+
+    datos = _en_memoria(clave)
+    if datos is not None:
+        return version, datos
+
+    archivo = _archivo(version, z, x, y)
+    try:
+        datos = archivo.read_bytes()
+    except FileNotFoundError:
+        datos = generar_tesela(z, x, y)
+        with escritura_atomica(archivo) as f:
+            f.write(datos)
+
+    _guardar_en_memoria(clave, datos)
+    return version, datos
+
+
+def limpiar_teselas(version_actual):
+    """Borra del disco las teselas de versiones distintas a `version_actual`."""
+    base = directorio_teselas()
+    if not base.is_dir():
+        return
+    for directorio in base.iterdir():
+        if directorio.name != f"v{version_actual}":
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+@receiver(red_actualizada)
+def _al_actualizar_red(sender, version, **kwargs):
+    limpiar_teselas(version)
@@ -0,0 +1,48 @@
+import tempfile
+import threading
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from rutas.binario import escritura_atomica
+
+
+class EscrituraAtomicaTest(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = Path(directorio.name)
+        self.ruta = self.directorio / "tesela.mvt"
+
+    def test_hilos_escribiendo_la_misma_ruta(self):
+        barrera = threading.Barrier(8)
+        errores = []
+
+        def escribir(i):
+            try:
+                with escritura_atomica(self.ruta) as f:
+                    barrera.wait()
+                    f.write(bytes([i]) * 4096)
+            except Exception as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=escribir, args=(i,)) for i in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        datos = self.ruta.read_bytes()
+        self.assertEqual(datos, datos[:1] * 4096)
+        self.assertEqual(list(self.directorio.iterdir()), [self.ruta])
+
+    def test_error_deja_el_archivo_anterior_y_borra_el_temporal(self):
+        self.ruta.write_bytes(b"viejo")
+        with self.assertRaises(RuntimeError), escritura_atomica(self.ruta) as f:
+            f.write(b"a medias")
+            raise RuntimeError
+
+        self.assertEqual(self.ruta.read_bytes(), b"viejo")
+        self.assertEqual(list(self.directorio.iterdir()), [self.ruta])
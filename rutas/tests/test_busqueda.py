@@ -0,0 +1,151 @@
+import numpy as np
+from django.contrib.gis.geos import LineString, Point
+from django.test import SimpleTestCase, TestCase
+
+from rutas.benchmarks.red import grafo_desde_excel, pares_aleatorios
+from rutas.busqueda import ALGORITMOS, astar_con_transbordos, dijkstra_con_transbordos
+from rutas.csr import GrafoCSR, MODO_BUS, MODO_TRANSFER, SIN_RUTA, haversine_m_np
+from rutas.espacial import IndiceEspacial
+from rutas.grafo import construir_grafo_csr
+from rutas.models import Edge, Punto, Ruta
+
+
+def grafo_aleatorio(semilla, n=300, radio_transbordo=150):
+    """
+    Paradas al azar en ~2 km con líneas de bus (costo >= distancia / 400
+    m/min) y transbordos a pie de costo 0 entre paradas cercanas, como un
+    tramo con Tiempo 0 en el Excel.
+    """
+    rnd = np.random.default_rng(semilla)
+    ids = np.arange(1, n + 1)
+    lats = -17.78 + rnd.uniform(0, 0.02, n)
+    lons = -63.18 + rnd.uniform(0, 0.02, n)
+
+    origenes, destinos, costos, rutas = [], [], [], []
+    for ruta in range(n // 10):
+        paradas = rnd.choice(n, size=12, replace=False)
+        for a, b in zip(paradas[:-1], paradas[1:]):
+            metros = haversine_m_np(lats[a], lons[a], lats[b], lons[b])
+            origenes.append(ids[a])
+            destinos.append(ids[b])
+            costos.append(metros / 400 * rnd.uniform(1, 3))
+            rutas.append(ruta)
+    modos = [MODO_BUS] * len(origenes)
+
+    for a, b, _ in IndiceEspacial(ids, lats, lons, radio_transbordo).pares_cercanos():
+        origenes += [a, b]
+        destinos += [b, a]
+        costos += [0.0, 0.0]
+        rutas += [SIN_RUTA, SIN_RUTA]
+        modos += [MODO_TRANSFER, MODO_TRANSFER]
+
+    return GrafoCSR.desde_aristas(
+        origenes, destinos, costos, rutas, modos, coordenadas=(ids, lats, lons),
+    )
+
+
+class MotoresConTransbordosGratisTest(SimpleTestCase):
+
+    def test_velocidad_no_acotada_con_transbordos_de_costo_cero(self):
+        self.assertEqual(grafo_aleatorio(0).velocidad_maxima, float("inf"))
+
+    def test_mismo_costo_que_dijkstra(self):
+        for semilla in range(4):
+            grafo = grafo_aleatorio(semilla)
+            rnd = np.random.default_rng(semilla)
+            for origen, destino in rnd.choice(grafo.nodos, size=(100, 2)):
+                esperado, _ = dijkstra_con_transbordos(grafo, int(origen), int(destino))
+                for nombre, motor in ALGORITMOS.items():
+                    costo, _ = motor(grafo, int(origen), int(destino))
+                    if esperado is None:
+                        self.assertIsNone(costo, nombre)
+                    else:
+                        self.assertAlmostEqual(costo, esperado, places=9, msg=nombre)
+
+
+def red_en_grilla(lado=10, paso=0.002):
+    """
+    Paradas en una grilla de `lado` x `lado` (~220 m entre vecinas) con una
+    ruta de ida y vuelta por fila y otra por columna a 400 m/min, y un
+    tramo de Tiempo 0 como los que trae el Excel. Devuelve (puntos, edges):
+    [(id, lat, lon)] y [(ruta, source, target, costo)].
+    """
+    puntos = [
+        (f * lado + c + 1, -17.78 + f * paso, -63.18 + c * paso)
+        for f in range(lado) for c in range(lado)
+    ]
+    edges = []
+    for k in range(lado):
+        fila = [k * lado + c + 1 for c in range(lado)]
+        columna = [f * lado + k + 1 for f in range(lado)]
+        for ruta, paradas in ((k + 1, fila), (lado + k + 1, columna)):
+            for a, b in zip(paradas[:-1], paradas[1:]):
+                _, lat_a, lon_a = puntos[a - 1]
+                _, lat_b, lon_b = puntos[b - 1]
+                costo = haversine_m_np(lat_a, lon_a, lat_b, lon_b) / 400
+                edges += [(ruta, a, b, costo), (ruta, b, a, costo)]
+    edges[0] = (*edges[0][:3], 0.0)
+    return puntos, edges
+
+
+def asentados(motor, grafo, pares):
+    total = 0
+    for origen, destino in pares:
+        stats = {}
+        motor(grafo, origen, destino, estadisticas=stats)
+        total += stats["nodos_asentados"]
+    return total
+
+
+class AstarEnLaRedRealTest(SimpleTestCase):
+    """A* poda aunque haya aristas de costo 0 (la cota geográfica es infinita)."""
+
+    def test_asienta_menos_que_dijkstra(self):
+        grafo = grafo_desde_excel()
+        self.assertEqual(grafo.velocidad_maxima, float("inf"))
+        pares = pares_aleatorios(grafo, 100)
+        for origen, destino in pares:
+            self.assertAlmostEqual(
+                astar_con_transbordos(grafo, origen, destino)[0],
+                dijkstra_con_transbordos(grafo, origen, destino)[0],
+                places=9,
+            )
+        self.assertLess(
+            asentados(astar_con_transbordos, grafo, pares),
+            0.8 * asentados(dijkstra_con_transbordos, grafo, pares),
+        )
+
+
+class AstarSobreConstruirGrafoCsrTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        puntos, edges = red_en_grilla()
+        Punto.objects.bulk_create([
+            Punto(id=pid, descripcion=str(pid), ubicacion=Point(lon, lat, srid=4326))
+            for pid, lat, lon in puntos
+        ])
+        Ruta.objects.bulk_create([
+            Ruta(id=rid, nombre=str(rid), linea=str(rid), color="#000000")
+            for rid in {ruta for ruta, _, _, _ in edges}
+        ])
+        coords = {pid: (lon, lat) for pid, lat, lon in puntos}
+        Edge.objects.bulk_create([
+            Edge(ruta_id=ruta, source_id=a, target_id=b, cost=costo,
+                 geom=LineString(coords[a], coords[b], srid=4326))
+            for ruta, a, b, costo in edges
+        ])
+
+    def test_asienta_menos_que_dijkstra(self):
+        grafo = construir_grafo_csr()
+        pares = [(1, 45), (12, 67), (100, 23), (55, 8)]
+        for origen, destino in pares:
+            self.assertAlmostEqual(
+                astar_con_transbordos(grafo, origen, destino)[0],
+                dijkstra_con_transbordos(grafo, origen, destino)[0],
+                places=9,
+            )
+        self.assertLess(
+            asentados(astar_con_transbordos, grafo, pares),
+            asentados(dijkstra_con_transbordos, grafo, pares),
+        )
@@ -0,0 +1,58 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from rutas import grafo
+from rutas.constantes import SNAP_RADIUS_METERS
+from rutas.csr import GrafoCSR, MODO_BUS
+
+
+class SnapshotPorBaseDeDatosTest(SimpleTestCase):
+    """Un snapshot solo se abre en la base de datos que lo escribió."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = Path(directorio.name) / "grafo.bin"
+        GrafoCSR.desde_aristas([1], [2], [1.0], [7], [MODO_BUS]).guardar(
+            self.ruta, {"version": 3, "token": "produccion"},
+        )
+
+    def cargar(self, version, token):
+        with mock.patch.object(grafo, "token_grafo", return_value=token):
+            return grafo.cargar_snapshot(version, self.ruta)
+
+    def test_misma_version_y_base(self):
+        self.assertIsNotNone(self.cargar(3, "produccion"))
+
+    def test_misma_version_de_otra_base(self):
+        self.assertIsNone(self.cargar(3, "benchmark"))
+
+    def test_otra_version(self):
+        self.assertIsNone(self.cargar(4, "produccion"))
+
+    def test_base_sin_token(self):
+        self.assertIsNone(self.cargar(3, None))
+
+
+class IndiceEspacialAlCargarTest(SimpleTestCase):
+    """El índice para ajustar a paradas se arma al cargar el grafo, no en la consulta."""
+
+    def setUp(self):
+        grafo.invalidar_grafo()
+        self.addCleanup(grafo.invalidar_grafo)
+
+    def test_grafo_cargado_con_indice(self):
+        red = GrafoCSR.desde_aristas(
+            [1], [2], [1.0], [7], [MODO_BUS], coordenadas=([1, 2], [-17.78, -17.79], [-63.18, -63.19]),
+        )
+        with mock.patch.object(grafo, "version_grafo", return_value=1), \
+                mock.patch.object(grafo, "cargar_snapshot", return_value=None), \
+                mock.patch.object(grafo, "construir_grafo_csr", return_value=red):
+            _, cargado = grafo.obtener_grafo_versionado()
+
+        self.assertIs(cargado, red)
+        self.assertIsNotNone(red._indice_espacial)
+        self.assertEqual(red._indice_espacial.radio_m, SNAP_RADIUS_METERS)
@@ -0,0 +1,140 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+from django.core.management import call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from rutas.benchmarks.sintetica import escribir_excel
+from rutas.management.commands.importar_microbuses import geometrias_por_linea
+from rutas.models import Edge
+
+
+def hojas_de_prueba():
+    """Dos líneas de una ruta cada una, con la forma del Excel del import."""
+    puntos = pd.DataFrame({
+        "IdPunto": [1, 2, 3, 4, 5],
+        "Latitud": [-17.780, -17.781, -17.782, -17.700, -17.701],
+        "Longitud": [-63.180, -63.181, -63.182, -63.100, -63.101],
+        "Descripcion": ["A", "B", "C", "D", "E"],
+    })
+    lineas = pd.DataFrame({
+        "IdLinea": [10, 20],
+        "NombreLinea": ["L10", "L20"],
+        "ColorLinea": ["#FF0000", "#00FF00"],
+    })
+    lineas_ruta = pd.DataFrame({
+        "IdLineaRuta": [100, 200],
+        "IdLinea": [10, 20],
+        "IdRuta": [1, 1],
+        "Descripcion": ["L10 Salida", "L20 Salida"],
+        "Distancia": [0.3, 0.2],
+        "Tiempo": [2.0, 1.0],
+    })
+    filas = [(100, 1, 1), (100, 2, 2), (100, 3, 3), (200, 4, 1), (200, 5, 2)]
+    lineas_puntos = pd.DataFrame({
+        "IdLineaPunto": range(1, len(filas) + 1),
+        "IdLineaRuta": [lr for lr, _, _ in filas],
+        "IdPunto": [p for _, p, _ in filas],
+        "Orden": [o for _, _, o in filas],
+        "Latitud": [puntos.Latitud[p - 1] for _, p, _ in filas],
+        "Longitud": [puntos.Longitud[p - 1] for _, p, _ in filas],
+        "Distancia": [0, 150, 150, 0, 150],
+        "Tiempo": [0, 1.0, 1.0, 0, 1.0],
+    })
+    return {"Puntos": puntos, "Lineas": lineas, "LineaRuta": lineas_ruta, "LineasPuntos": lineas_puntos}
+
+
+class GeometriasPorLineaTest(SimpleTestCase):
+
+    def test_paradas_en_orden(self):
+        lp = hojas_de_prueba()["LineasPuntos"].iloc[::-1]
+        geometrias = geometrias_por_linea(lp)
+        self.assertEqual(geometrias[100].coords, ((-63.180, -17.780), (-63.181, -17.781), (-63.182, -17.782)))
+        self.assertEqual(len(geometrias[200]), 2)
+
+    def test_linea_de_una_parada_queda_vacia(self):
+        lp = hojas_de_prueba()["LineasPuntos"]
+        self.assertTrue(geometrias_por_linea(lp[lp.Orden == 1])[100].empty)
+
+
+class FiltrosEspacialesTrasImportarTest(TestCase):
+    """?in_bbox= y ?near= de /lineas/ y /rutas/ sobre una red importada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cache = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cache.cleanup)
+        directorio = Path(cache.name)
+        excel = directorio / "red.xlsx"
+        escribir_excel(hojas_de_prueba(), excel)
+        with override_settings(
+            RUTAS_CACHE_DIR=directorio,
+            RUTAS_GRAFO_PATH=directorio / "grafo.bin",
+            RUTAS_CH_PATH=directorio / "jerarquia.bin",
+        ):
+            call_command("importar_microbuses", str(excel), stdout=StringIO())
+
+    def ids(self, url):
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return sorted(f["id"] for f in respuesta.json()["features"])
+
+    def test_lineas_en_bbox(self):
+        self.assertEqual(self.ids("/api/lineas/?in_bbox=-63.19,-17.79,-63.17,-17.77"), [100])
+
+    def test_lineas_cerca(self):
+        self.assertEqual(self.ids("/api/lineas/?near=-63.1005,-17.7005&radio=200"), [200])
+
+    def test_rutas_en_bbox(self):
+        self.assertEqual(self.ids("/api/rutas/?in_bbox=-63.11,-17.71,-63.09,-17.69"), [20])
+
+    def test_bbox_sin_lineas(self):
+        self.assertEqual(self.ids("/api/lineas/?in_bbox=-60,-15,-59.9,-14.9"), [])
+
+
+class TransbordosTrasImportarIncrementalTest(TestCase):
+    """--incremental rehace los transbordos a pie de los Puntos movidos."""
+
+    def setUp(self):
+        self.directorio = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(
+            RUTAS_CACHE_DIR=self.directorio,
+            RUTAS_GRAFO_PATH=self.directorio / "grafo.bin",
+            RUTAS_CH_PATH=self.directorio / "jerarquia.bin",
+        ))
+        self.hojas = hojas_de_prueba()
+        self.mover(5, -17.70005, -63.10005)  # a ~7 m del 4
+
+    def mover(self, punto_id, lat, lon):
+        for hoja in ("Puntos", "LineasPuntos"):
+            df = self.hojas[hoja]
+            df.loc[df.IdPunto == punto_id, ["Latitud", "Longitud"]] = [lat, lon]
+
+    def importar(self, *opciones):
+        excel = self.directorio / "red.xlsx"
+        escribir_excel(self.hojas, excel)
+        call_command("importar_microbuses", str(excel), *opciones, stdout=StringIO())
+
+    def transbordos(self):
+        return set(Edge.objects.filter(ruta__isnull=True).values_list("source_id", "target_id"))
+
+    def test_punto_movido(self):
+        self.importar()
+        call_command("generar_transbordos", stdout=StringIO())
+        self.assertEqual(self.transbordos(), {(4, 5), (5, 4)})
+
+        self.mover(3, -17.78005, -63.18005)  # junto al 1
+        self.importar("--incremental")
+        self.assertEqual(self.transbordos(), {(4, 5), (5, 4), (1, 3), (3, 1)})
+
+        self.mover(5, -17.701, -63.101)
+        self.importar("--incremental")
+        self.assertEqual(self.transbordos(), {(1, 3), (3, 1)})
+
+    def test_sin_self_loops(self):
+        self.importar()
+        call_command("generar_transbordos", stdout=StringIO())
+        self.assertFalse(Edge.objects.filter(source_id=F("target_id")).exists())
@@ -0,0 +1,56 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from rutas import instrumentacion, views, views_async
+from rutas.tests.test_busqueda import grafo_aleatorio
+
+
+def _series(metrica):
+    return {dict(clave).get("vista"): serie for clave, serie in metrica._series.items()}
+
+
+class MedicionDeVistasTest(SimpleTestCase):
+
+    def setUp(self):
+        self.grafo = grafo_aleatorio(0)
+        for metrica in (instrumentacion.DURACION, instrumentacion.PEDIDOS):
+            patcher = mock.patch.object(metrica, "_series", {})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def coordenadas(self, punto_id):
+        lat, lon = self.grafo.coordenadas(punto_id)
+        return {"lat": lat, "lon": lon}
+
+    def par(self, origen, destino):
+        o, d = self.coordenadas(origen), self.coordenadas(destino)
+        return {"lat_origen": o["lat"], "lon_origen": o["lon"], "lat_destino": d["lat"], "lon_destino": d["lon"]}
+
+    def test_batch(self):
+        pares = [self.par(1, 50), self.par(1, 120), self.par(7, 200)]
+        with mock.patch.object(views, "obtener_grafo", return_value=self.grafo):
+            respuesta = self.client.post(
+                "/api/rutas/optima-batch/", json.dumps({"pares": pares}), content_type="application/json",
+            )
+            lineas = [json.loads(linea) for linea in b"".join(respuesta.streaming_content).splitlines()]
+
+        self.assertIn("snap;dur=", respuesta["Server-Timing"])
+        resumen = lineas[-1]["resumen"]
+        self.assertEqual(resumen["pares"], 3)
+        self.assertIn("nodos_asentados", resumen)
+        self.assertEqual(_series(instrumentacion.PEDIDOS), {"batch": 1})
+        self.assertIn("batch", _series(instrumentacion.DURACION))
+
+    async def test_async(self):
+        parametros = self.par(1, 50)
+        with mock.patch.object(views_async, "aobtener_grafo_versionado", mock.AsyncMock(return_value=(1, self.grafo))), \
+                mock.patch.object(views_async, "_materializar_ruta", mock.AsyncMock(return_value=[])):
+            respuesta = await self.async_client.get("/api/async/rutas/optima-coords/", {**parametros, "debug": "1"})
+
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        for etapa in ("grafo", "snap", "busqueda", "materializar", "total"):
+            self.assertIn(f"{etapa};dur=", respuesta["Server-Timing"])
+        self.assertIn("nodos_asentados", json.loads(respuesta.content)["debug"])
+        self.assertEqual(_series(instrumentacion.PEDIDOS), {"optima": 1})
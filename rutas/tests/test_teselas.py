@@ -0,0 +1,21 @@
+from django.db import connection
+from django.test import TestCase
+
+from rutas import teselas
+
+
+class PlanTeselaTest(TestCase):
+    """El filtro por tesela usa los índices GiST sobre el cast a geometry."""
+
+    def plan(self, z, x, y):
+        params = {"z": z, "x": x, "y": y, "margen": 0.0, "tolerancia": 1.0}
+        with connection.cursor() as cursor:
+            # Con las tablas de prueba vacías el planner preferiría un seq scan
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + teselas.SQL_TESELA, params)
+            return "\n".join(fila[0] for fila in cursor.fetchall())
+
+    def test_usa_los_indices(self):
+        plan = self.plan(15, 11800, 17700)
+        self.assertIn("rutas_edge_geom_geometry_idx", plan)
+        self.assertIn("rutas_punto_ubicacion_geometry_idx", plan)
@@ -0,0 +1,193 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from rutas import instrumentacion, views, views_async
+from rutas.cache_respuestas import CacheMemoria, CacheRespuestas
+from rutas.ch import construir_jerarquia
+from rutas.tests.test_busqueda import grafo_aleatorio
+
+
+class AlgoritmoUsadoTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.grafo = grafo_aleatorio(1)
+        cls.parametros = {"algoritmo": "ch", "max_transbordos": None}
+
+    def buscar(self, jerarquia):
+        return views.ejecutar_busqueda(self.grafo, jerarquia, self.parametros, {3: 0.0}, {90: 0.0})
+
+    def test_ch_con_indice(self):
+        costo, _, _, usado = self.buscar(construir_jerarquia(self.grafo))
+        self.assertIsNotNone(costo)
+        self.assertEqual(usado, "ch")
+        self.assertAlmostEqual(costo, self.buscar(None)[0])
+
+    def test_ch_sin_indice_responde_con_dijkstra(self):
+        self.assertEqual(self.buscar(None)[3], "dijkstra")
+
+    def test_respuesta_y_metricas_indican_el_respaldo(self):
+        lat_o, lon_o = self.grafo.coordenadas(3)
+        lat_d, lon_d = self.grafo.coordenadas(90)
+        with mock.patch.object(views, "obtener_grafo_versionado", return_value=(1, self.grafo)), \
+                mock.patch.object(views, "obtener_jerarquia", return_value=None), \
+                mock.patch.object(views, "materializar_ruta", return_value=[]), \
+                mock.patch.object(instrumentacion.NODOS, "_series", {}):
+            respuesta = self.client.get("/api/rutas/optima-coords/", {
+                "lat_origen": lat_o, "lon_origen": lon_o,
+                "lat_destino": lat_d, "lon_destino": lon_d,
+                "algoritmo": "ch", "debug": "1",
+            })
+            etiquetas = {dict(clave)["algoritmo"] for clave in instrumentacion.NODOS._series}
+
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(respuesta.json()["algoritmo_usado"], "dijkstra")
+        self.assertEqual(respuesta.json()["debug"]["algoritmo"], "dijkstra")
+        self.assertEqual(etiquetas, {"dijkstra"})
+
+    def consultar(self, jerarquia):
+        lat_o, lon_o = self.grafo.coordenadas(3)
+        lat_d, lon_d = self.grafo.coordenadas(90)
+        with mock.patch.object(views, "obtener_grafo_versionado", return_value=(1, self.grafo)), \
+                mock.patch.object(views, "obtener_jerarquia", return_value=jerarquia), \
+                mock.patch.object(views, "materializar_ruta", return_value=[]):
+            return self.client.get("/api/rutas/optima-coords/", {
+                "lat_origen": lat_o, "lon_origen": lon_o,
+                "lat_destino": lat_d, "lon_destino": lon_d, "algoritmo": "ch",
+            })
+
+    def test_el_respaldo_no_queda_en_cache(self):
+        cache = CacheRespuestas(CacheMemoria(maximo=10, ttl=60), resolucion_min=0.5)
+        with mock.patch.object(views, "obtener_cache", return_value=cache):
+            respaldo = self.consultar(None)
+            self.assertEqual(respaldo.json()["algoritmo_usado"], "dijkstra")
+            self.assertEqual(cache.backend.entradas(), 0)
+
+            # Con el índice ya construido la misma consulta usa CH y se cachea
+            con_indice = self.consultar(construir_jerarquia(self.grafo))
+            self.assertEqual(con_indice["X-Cache"], "MISS")
+            self.assertEqual(con_indice.json()["algoritmo_usado"], "ch")
+            self.assertEqual(self.consultar(None)["X-Cache"], "HIT")
+
+    async def test_el_respaldo_no_queda_en_cache_async(self):
+        cache = CacheRespuestas(CacheMemoria(maximo=10, ttl=60), resolucion_min=0.5)
+        lat_o, lon_o = self.grafo.coordenadas(3)
+        lat_d, lon_d = self.grafo.coordenadas(90)
+        with mock.patch.object(views_async, "obtener_cache", return_value=cache), \
+                mock.patch.object(views_async, "aobtener_grafo_versionado", mock.AsyncMock(return_value=(1, self.grafo))), \
+                mock.patch.object(views_async, "aobtener_jerarquia", mock.AsyncMock(return_value=None)), \
+                mock.patch.object(views_async, "_materializar_ruta", mock.AsyncMock(return_value=[])):
+            respuesta = await self.async_client.get("/api/async/rutas/optima-coords/", {
+                "lat_origen": lat_o, "lon_origen": lon_o,
+                "lat_destino": lat_d, "lon_destino": lon_d, "algoritmo": "ch",
+            })
+
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(cache.backend.entradas(), 0)
+
+
+class CoordenadasInvalidasTest(SimpleTestCase):
+    """nan/inf/1e308 pasan por float(); deben responder 400, no 500."""
+
+    INVALIDAS = [("nan", "-70.6"), ("-33.4", "inf"), ("1e308", "-70.6"), ("-91", "-70.6"), ("-33.4", "181")]
+
+    def setUp(self):
+        patcher = mock.patch.object(views, "obtener_grafo", side_effect=AssertionError("no debe buscar"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def par(self, lat, lon):
+        return {"lat_origen": lat, "lon_origen": lon, "lat_destino": "-33.45", "lon_destino": "-70.65"}
+
+    def test_leer_lat_lon(self):
+        self.assertEqual(views.leer_lat_lon("-33.4", "-70.6"), (-33.4, -70.6))
+        for lat, lon in self.INVALIDAS:
+            with self.subTest(lat=lat, lon=lon), self.assertRaises(ValueError):
+                views.leer_lat_lon(lat, lon)
+
+    def test_optima(self):
+        for lat, lon in self.INVALIDAS:
+            with self.subTest(lat=lat, lon=lon):
+                respuesta = self.client.get("/api/rutas/optima-coords/", self.par(lat, lon))
+                self.assertEqual(respuesta.status_code, 400, respuesta.content)
+
+    async def test_optima_async(self):
+        for lat, lon in self.INVALIDAS:
+            with self.subTest(lat=lat, lon=lon):
+                respuesta = await self.async_client.get("/api/async/rutas/optima-coords/", self.par(lat, lon))
+                self.assertEqual(respuesta.status_code, 400, respuesta.content)
+
+    def test_batch(self):
+        for lat, lon in self.INVALIDAS:
+            with self.subTest(lat=lat, lon=lon):
+                cuerpo = json.dumps({"pares": [self.par(float(lat), float(lon))]})
+                respuesta = self.client.post("/api/rutas/optima-batch/", cuerpo, content_type="application/json")
+                self.assertEqual(respuesta.status_code, 400, respuesta.content)
+
+    def test_isocrona(self):
+        casos = [{"lat": lat, "lon": lon, "minutos": "10"} for lat, lon in self.INVALIDAS]
+        casos += [{"lat": "-33.4", "lon": "-70.6", "minutos": minutos} for minutos in ("nan", "inf", "0")]
+        for parametros in casos:
+            with self.subTest(**parametros):
+                respuesta = self.client.get("/api/rutas/isocrona/", parametros)
+                self.assertEqual(respuesta.status_code, 400, respuesta.content)
+
+
+class EtagTeselaTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(views, "obtener_tesela", side_effect=lambda z, x, y: (4, f"{z}/{x}/{y}".encode()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_etag_distinto_por_tesela(self):
+        a = self.client.get("/api/tiles/12/1000/2000.mvt")
+        b = self.client.get("/api/tiles/12/1001/2000.mvt")
+        self.assertNotEqual(a["ETag"], b["ETag"])
+
+        # El ETag de otra tesela no vale como validador
+        respuesta = self.client.get("/api/tiles/12/1001/2000.mvt", HTTP_IF_NONE_MATCH=a["ETag"])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.content, b"12/1001/2000")
+
+        respuesta = self.client.get("/api/tiles/12/1000/2000.mvt", HTTP_IF_NONE_MATCH=a["ETag"])
+        self.assertEqual(respuesta.status_code, 304)
+
+
+class LimitadorTest(SimpleTestCase):
+    """Ni las esperas vencidas ni las canceladas se quedan con un permiso."""
+
+    async def esperar(self, limitador):
+        async with limitador:
+            pass
+
+    async def test_permisos_vuelven_al_limite(self):
+        limitador = views_async.Limitador(concurrencia=2, cola=50, espera_max=0.01)
+        ocupados = [asyncio.Event() for _ in range(2)]
+        liberar = asyncio.Event()
+
+        async def ocupar(evento):
+            async with limitador:
+                evento.set()
+                await liberar.wait()
+
+        duenos = [asyncio.create_task(ocupar(evento)) for evento in ocupados]
+        for evento in ocupados:
+            await evento.wait()
+
+        vencidas = await asyncio.gather(*(self.esperar(limitador) for _ in range(10)), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, views_async.Saturado) for r in vencidas))
+
+        canceladas = [asyncio.create_task(self.esperar(limitador)) for _ in range(10)]
+        await asyncio.sleep(0)
+        liberar.set()
+        for tarea in canceladas:
+            tarea.cancel()
+        await asyncio.gather(*duenos, *canceladas, return_exceptions=True)
+
+        self.assertEqual(limitador.esperando, 0)
+        self.assertEqual(limitador._semaforo._value, 2)
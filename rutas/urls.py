@@ -1,12 +1,18 @@
 from django.urls import path, include
 from rest_framework import routers
+from . import views_async
 from .views import (
     RutaViewSet,
     PuntoViewSet,
     LineaRutaViewSet,
+    estadisticas_cache,
+    isocrona,
+    matriz_costos,
     ruta_optima,
+    ruta_optima_batch,
     ruta_por_linea,
-    rutas_todas
+    rutas_todas,
+    tesela_mvt,
 )
 
 router = routers.DefaultRouter()
@@ -17,8 +23,18 @@ router.register(r'lineas', LineaRutaViewSet)
 urlpatterns = [
 
     path("rutas/optima-coords/", ruta_optima, name="ruta_optima_coords"),
+    path("rutas/optima-batch/", ruta_optima_batch, name="ruta_optima_batch"),
+    path("rutas/isocrona/", isocrona, name="isocrona"),
+    path("rutas/matriz/", matriz_costos, name="matriz_costos"),
+    path("rutas/cache/", estadisticas_cache, name="estadisticas_cache"),
     path("rutas/todas/", rutas_todas, name="todas_las_rutas"),
     path("rutas/linea/<str:linea>/", ruta_por_linea, name="ruta_por_linea"),
+    path("tiles/<int:z>/<int:x>/<int:y>.mvt", tesela_mvt, name="tesela_mvt"),
     
+    # Versiones asíncronas para despliegues ASGI
+    path("async/rutas/optima-coords/", views_async.ruta_optima, name="ruta_optima_coords_async"),
+    path("async/rutas/todas/", views_async.rutas_todas, name="todas_las_rutas_async"),
+    path("async/rutas/linea/<str:linea>/", views_async.ruta_por_linea, name="ruta_por_linea_async"),
+
     path("", include(router.urls)),
 ]
@@ -2,39 +2,116 @@ from rest_framework import viewsets
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.db import connection
-from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
+from django.db.models import Prefetch
+from django.contrib.gis.geos import Point, Polygon, GeometryCollection
+from django.contrib.gis.db.models.functions import AsGeoJSON, AsWKB, Distance
 
 from .models import Punto, Ruta, LineaRuta, Edge
-from .serializers import PuntoSerializer, RutaSerializer, LineaRutaSerializer
-
-from heapq import heappush, heappop
+from .serializers import PuntoSerializer, RutaSerializer, LineaRutaSerializer, parametros_proyeccion
+from .filtros import CercaFilter, EnBBoxFilter
+from .paginacion import CursorGeoJSON
+from .grafo import (
+    TRANSFER_RADIUS_METERS,
+    haversine_m,
+    construir_grafo_con_transbordos,
+    grafo_cargado,
+    obtener_grafo,
+    obtener_grafo_versionado,
+    obtener_jerarquia,
+)
+from .busqueda import (
+    ALGORITMOS,
+    dijkstra_con_transbordos,
+    dijkstra_uno_a_muchos,
+    dijkstra_uno_a_todos,
+    pareto_con_transbordos,
+)
+from .matriz import obtener_pool
+from .cache_respuestas import obtener_cache
+from .constantes import WALK_SPEED, SNAP_RADIUS_METERS, SNAP_K
+from .espacial import RADIO_TIERRA_M
+from .payloads import obtener_payload_red
+from .teselas import obtener_tesela, tesela_valida
+from .geojson import coordenadas_wkb, dumps
+from .formatos import (
+    es_original,
+    formatear_geometria,
+    formatear_respuesta,
+    leer_parametros_geometria,
+    metadatos_formato,
+)
+from .instrumentacion import Medicion, exponer_metricas, registrar
+
+import io
 import json
-from math import radians, cos, sin, sqrt, atan2
-from collections import defaultdict
+import time
+from math import cos, isfinite, sin, pi, radians
+
+import numpy as np
+
 
-import itertools
-counter = itertools.count()
+class GeoViewSet(viewsets.ModelViewSet):
+    """
+    Base de los viewsets de la red: filtros ?in_bbox= y ?near= sobre
+    `campo_geo`, paginación por cursor y ?fields= / ?omit_geometry=
+    (si se omite la geometría tampoco se lee de la BD).
+    """
+    pagination_class = CursorGeoJSON
+    filter_backends = (EnBBoxFilter, CercaFilter)
+    campo_geo = None
 
-class PuntoViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        _, omitir = parametros_proyeccion(self.request)
+        if omitir and self.campo_geo and "__" not in self.campo_geo:
+            queryset = queryset.defer(self.campo_geo)
+        return queryset
+
+
+class PuntoViewSet(GeoViewSet):
     queryset = Punto.objects.all()
     serializer_class = PuntoSerializer
+    campo_geo = "ubicacion"
 
 
-class RutaViewSet(viewsets.ModelViewSet):
+class RutaViewSet(GeoViewSet):
     queryset = Ruta.objects.all()
     serializer_class = RutaSerializer
+    campo_geo = "segmentos__geom"
 
+    def get_queryset(self):
+        # Segmentos en una sola consulta extra para toda la página
+        queryset = super().get_queryset()
+        campos, omitir = parametros_proyeccion(self.request)
+        if campos is None or "segmentos" in campos:
+            segmentos = LineaRuta.objects.defer("geom") if omitir else LineaRuta.objects.all()
+            queryset = queryset.prefetch_related(Prefetch("segmentos", queryset=segmentos))
+        return queryset
 
-class LineaRutaViewSet(viewsets.ModelViewSet):
+
+class LineaRutaViewSet(GeoViewSet):
     queryset = LineaRuta.objects.all()
     serializer_class = LineaRutaSerializer
+    campo_geo = "geom"
 
 
 @api_view(["GET"])
 def ruta_por_linea(request, linea):
+    """
+    Edges de una línea. Acepta ?formato=, ?precision= y ?tolerancia= como
+    ruta_optima (ver `rutas.formatos`).
+    """
+    geometria, error = leer_parametros_geometria(request.GET)
+    if error:
+        return Response(error, status=400)
+
     try:
         ruta = Ruta.objects.get(linea=linea)
     except Ruta.DoesNotExist:
@@ -43,168 +120,345 @@ def ruta_por_linea(request, linea):
         except:
             return Response({"error": "Línea no encontrada"}, status=404)
 
-    segmentos = Edge.objects.filter(ruta=ruta)
+    segmentos = formatear_segmentos(consulta_segmentos(ruta, geometria), geometria)
+    return Response(serializar_ruta_linea(ruta, segmentos, geometria))
 
-    return Response({
+
+def consulta_segmentos(ruta, geometria):
+    """
+    (id, geometría) de los Edges de la ruta: el texto GeoJSON armado por
+    PostGIS o, si hay que simplificar o codificar, el WKB.
+    """
+    edges = Edge.objects.filter(ruta=ruta)
+    if es_original(geometria):
+        return edges.values_list("id", AsGeoJSON("geom"))
+    return edges.values_list("id", AsWKB("geom"))
+
+
+def formatear_segmentos(filas, geometria):
+    """Filas de `consulta_segmentos` con la geometría en el formato pedido."""
+    if es_original(geometria):
+        return filas
+    segmentos = []
+    for edge_id, wkb in filas:
+        valor = formatear_geometria(coordenadas_wkb(wkb), geometria)
+        if geometria["formato"] == "coordenadas":
+            # Solo simplificada: mismo texto GeoJSON que sin parámetros
+            valor = dumps({"type": "LineString", "coordinates": valor}).decode()
+        segmentos.append((edge_id, valor))
+    return segmentos
+
+
+def serializar_ruta_linea(ruta, segmentos, geometria):
+    return {
         "ruta_id": ruta.id,
         "nombre": ruta.nombre.strip(),
         "linea": ruta.linea.strip(),
         "color": ruta.color.strip(),
+        **metadatos_formato(geometria),
         "segmentos": [
-            {"id": s.id, "geometry": s.geom.geojson}
-            for s in segmentos
+            {"id": edge_id, "geometry": valor}
+            for edge_id, valor in segmentos
         ]
-    })
+    }
 
 @api_view(["GET"])
 def rutas_todas(request):
-    data = []
-
-    for r in Ruta.objects.all():
-        segmentos = Edge.objects.filter(ruta=r)
-        data.append({
-            "ruta_id": r.id,
-            "nombre": r.nombre.strip(),
-            "linea": r.linea.strip(),
-            "color": r.color.strip(),
-            "segmentos": [
-                {"id": s.id, "geometry": s.geom.geojson}
-                for s in segmentos
-            ]
-        })
-
-    return Response(data)
-
+    """
+    Red completa precalculada (una geometría por LineaRuta), servida
+    comprimida si el cliente lo acepta y con 304 si no cambió.
+    """
+    return respuesta_payload_red(request, obtener_payload_red())
+
+
+def respuesta_payload_red(request, payload):
+    """Respuesta HTTP (o 304) para el payload de la red."""
+    respuesta = HttpResponse(content_type="application/json")
+    respuesta["ETag"] = payload["etag"]
+    respuesta["Vary"] = "Accept-Encoding"
+    if payload["ultima_modificacion"]:
+        respuesta["Last-Modified"] = http_date(payload["ultima_modificacion"].timestamp())
+
+    no_modificado = get_conditional_response(
+        request,
+        etag=payload["etag"],
+        last_modified=(
+            int(payload["ultima_modificacion"].timestamp())
+            if payload["ultima_modificacion"] else None
+        ),
+        response=respuesta,
+    )
+    if no_modificado is not respuesta:
+        return no_modificado
+
+    aceptadas = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    for codificacion in ("br", "gzip"):
+        if codificacion in payload and codificacion in aceptadas:
+            respuesta["Content-Encoding"] = codificacion
+            respuesta.content = payload[codificacion]
+            break
+    else:
+        respuesta.content = payload["contenido"]
+
+    return respuesta
+
+
+@require_GET
+def tesela_mvt(request, z, x, y):
+    """
+    Tesela vectorial z/x/y con las capas `lineas` y `puntos`. Vista de
+    Django y no de DRF: la respuesta es binaria y los clientes de mapas no
+    siempre mandan un Accept que DRF sepa negociar.
+    """
+    if not tesela_valida(z, x, y):
+        raise Http404("Tesela fuera de rango")
 
-TRANSFER_RADIUS_METERS = 25  # radio máximo para considerar un transbordo
-TRANSFER_COST = 0.0          # costo de "caminar" entre paradas cercanas
+    version, datos = obtener_tesela(z, x, y)
+    # Cada tesela tiene su propio contenido: el ETag lleva la versión y z/x/y
+    etag = f'"tesela-v{version}-{z}-{x}-{y}"'
 
+    respuesta = HttpResponse(datos, content_type="application/vnd.mapbox-vector-tile")
+    respuesta["ETag"] = etag
+    respuesta["Cache-Control"] = "public, max-age=3600"
+    return get_conditional_response(request, etag=etag, response=respuesta)
 
-def haversine_m(lat1, lon1, lat2, lon2):
-    R = 6371000  # radio de la Tierra en metros
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
 
-def punto_mas_cercano(lat, lon):
+def puntos_por_cercania(lat, lon):
     p = Point(lon, lat, srid=4326)
     return Punto.objects.annotate(
         distancia=Distance("ubicacion", p)
-    ).order_by("distancia").first()
+    ).order_by("distancia")
 
 
-def construir_grafo_con_transbordos():
+def punto_mas_cercano(lat, lon):
+    return puntos_por_cercania(lat, lon).first()
 
-    graph = defaultdict(list)
 
-    #Edges de la BD (movimiento en microbus)
-    for e in Edge.objects.all():
-        # Edge dirigido
-        graph[e.source_id].append((e.target_id, e.cost, e.ruta_id, "bus"))
-        # Si quieres que sea bidireccional, descomenta:
-        # graph[e.target_id].append((e.source_id, e.cost, e.ruta_id, "bus"))
+ALGORITMOS_RUTA = (*ALGORITMOS, "ch")
 
-    #Edges de transbordo entre puntos cercanos (a pie)
-    puntos = list(Punto.objects.all())
-    coords = {p.id: (p.ubicacion.y, p.ubicacion.x) for p in puntos}  # id -> (lat, lon)
-    ids = [p.id for p in puntos]
 
-    for i in range(len(ids)):
-        id_a = ids[i]
-        lat_a, lon_a = coords[id_a]
-        for j in range(i+1, len(ids)):
-            id_b = ids[j]
-            lat_b, lon_b = coords[id_b]
-            d = haversine_m(lat_a, lon_a, lat_b, lon_b)
-            if d <= TRANSFER_RADIUS_METERS:
-                # Edge de "caminar" entre paradas (bidireccional)
-                graph[id_a].append((id_b, TRANSFER_COST, None, "transfer"))
-                graph[id_b].append((id_a, TRANSFER_COST, None, "transfer"))
+def leer_lat_lon(lat, lon):
+    """
+    (lat, lon) como float. ValueError/TypeError si faltan, no son números
+    finitos o están fuera de rango: `float()` acepta "nan", "inf" y "1e308",
+    y el índice espacial falla con ellos en vez de responder un 400.
+    """
+    lat, lon = float(lat), float(lon)
+    if not (isfinite(lat) and isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"Coordenadas fuera de rango: {lat}, {lon}")
+    return lat, lon
 
-    return graph
 
-def dijkstra_con_transbordos(graph, origen_id, destino_id):
+def leer_parametros_ruta(query):
     """
-    Devuelve: (costo_total, pasos)
-    pasos = lista de dicts: {source, target, ruta_id, modo}
+    Valida los parámetros de ruta_optima. Devuelve (parametros, None) o
+    (None, error) con el dict de error para un 400.
     """
+    try:
+        lat_origen, lon_origen = leer_lat_lon(query.get("lat_origen"), query.get("lon_origen"))
+        lat_destino, lon_destino = leer_lat_lon(query.get("lat_destino"), query.get("lon_destino"))
+        parametros = {
+            "lat_origen": lat_origen,
+            "lon_origen": lon_origen,
+            "lat_destino": lat_destino,
+            "lon_destino": lon_destino,
+        }
+    except (TypeError, ValueError):
+        return None, {"error": "Parámetros lat/lon inválidos"}
 
-    heap = []
-    heappush(heap, (0.0, next(counter), origen_id, []))  # (costo, orden, nodo, pasos)
-    mejor_costo = {}
+    # Motor de búsqueda: dijkstra (por defecto), astar, bidireccional o ch
+    algoritmo = query.get("algoritmo", "dijkstra")
+    if algoritmo not in ALGORITMOS_RUTA:
+        return None, {"error": f"Algoritmo inválido, opciones: {', '.join(ALGORITMOS_RUTA)}"}
 
-    while heap:
-        costo, _, nodo, pasos = heappop(heap)
+    # Con max_transbordos se usa la búsqueda multicriterio (costo, transbordos)
+    max_transbordos = query.get("max_transbordos")
+    if max_transbordos is not None:
+        try:
+            max_transbordos = int(max_transbordos)
+            if max_transbordos < 0:
+                raise ValueError
+        except ValueError:
+            return None, {"error": "max_transbordos debe ser un entero >= 0"}
+
+    # Formato de las geometrías: se aplica después de la caché
+    geometria, error = leer_parametros_geometria(query)
+    if error:
+        return None, error
+
+    parametros.update(algoritmo=algoritmo, max_transbordos=max_transbordos, geometria=geometria)
+    return parametros, None
+
+
+def opciones_busqueda(parametros):
+    """Lo que, además de las paradas, define la respuesta (para la caché)."""
+    return {
+        "algoritmo": parametros["algoritmo"],
+        "max_transbordos": parametros["max_transbordos"],
+    }
 
-        if nodo in mejor_costo and mejor_costo[nodo] <= costo:
-            continue
-        mejor_costo[nodo] = costo
 
-        if nodo == destino_id:
-            return costo, pasos
+def ejecutar_busqueda(graph, jerarquia, parametros, origenes, destinos, estadisticas=None):
+    """
+    Corre el motor pedido sin tocar la BD:
+    (costo_total, pasos, alternativas, algoritmo_usado).
+
+    Con max_transbordos se usa la búsqueda de Pareto ("pareto") y
+    `alternativas` es el frente; si no, es None. "ch" usa `jerarquia` (de
+    `obtener_jerarquia`); si no hay índice vigente (la red cambió y no se
+    volvió a correr `construir_jerarquia`) se responde con Dijkstra y
+    `algoritmo_usado` lo indica. `estadisticas` se pasa al motor (nodos
+    asentados, inserciones en el heap).
+    """
+    max_transbordos = parametros["max_transbordos"]
+    if max_transbordos is not None:
+        opciones = pareto_con_transbordos(graph, origenes, destinos, max_transbordos, estadisticas)
+        costo_total, _, pasos = opciones[0] if opciones else (None, None, [])
+        alternativas = [
+            {"costo_total": costo, "transbordos": transbordos, "rutas": rutas_tomadas(p)}
+            for costo, transbordos, p in opciones
+        ]
+        return costo_total, pasos, alternativas, "pareto"
 
-        for vecino, edge_cost, ruta_id, modo in graph.get(nodo, []):
-            nuevo_costo = costo + edge_cost
+    algoritmo = parametros["algoritmo"]
+    if algoritmo == "ch":
+        if jerarquia is not None:
+            return (*jerarquia.buscar(origenes, destinos, estadisticas), None, "ch")
+        algoritmo = "dijkstra"
+    return (*ALGORITMOS[algoritmo](graph, origenes, destinos, estadisticas), None, algoritmo)
 
-            nuevo_pasos = pasos + [{
-                "source": nodo,
-                "target": vecino,
-                "ruta_id": ruta_id,
-                "modo": modo,
-            }]
 
-            heappush(
-                heap,
-                (nuevo_costo, next(counter), vecino, nuevo_pasos)
-            )
+def es_respaldo(parametros, algoritmo_usado):
+    """
+    Se pidió "ch" y respondió Dijkstra por falta de índice. Esas respuestas
+    no se guardan en la caché: la clave solo lleva la versión de la red, y
+    al correr `construir_jerarquia` seguirían saliendo del respaldo.
+    """
+    return parametros["algoritmo"] == "ch" and algoritmo_usado != "ch"
 
-    return None, []
 
+def candidatas_en_memoria(graph, lat, lon):
+    """
+    {punto_id: minutos a pie} de las SNAP_K paradas más cercanas a menos de
+    SNAP_RADIUS_METERS, con el índice espacial del grafo en memoria.
+    """
+    cercanas = graph.paradas_cercanas(lat, lon, SNAP_K, SNAP_RADIUS_METERS)
+    return {punto_id: distancia / WALK_SPEED for punto_id, distancia in cercanas}
 
-@api_view(["GET"])
-def ruta_optima(request):
-    try:
-        lat_origen = float(request.GET.get("lat_origen"))
-        lon_origen = float(request.GET.get("lon_origen"))
-        lat_destino = float(request.GET.get("lat_destino"))
-        lon_destino = float(request.GET.get("lon_destino"))
-    except (TypeError, ValueError):
-        return Response({"error": "Parámetros lat/lon inválidos"}, status=400)
 
-    # Buscar puntos cercanos
-    p_origen = punto_mas_cercano(lat_origen, lon_origen)
-    p_destino = punto_mas_cercano(lat_destino, lon_destino)
+def candidata_de_punto(lat, lon, p):
+    """Candidatas con solo el Punto `p` (o ninguna si es None)."""
+    if p is None:
+        return {}
+    return {p.id: haversine_m(lat, lon, p.ubicacion.y, p.ubicacion.x) / WALK_SPEED}
 
-    if not p_origen or not p_destino:
-        return Response({"error": "No se encontraron puntos cercanos"}, status=404)
 
-    # Grafo completo
-    graph = construir_grafo_con_transbordos()
+def paradas_candidatas(graph, lat, lon):
+    """
+    Paradas cercanas con su costo a pie. Si no hay ninguna en el radio se
+    usa la más cercana de la BD.
+    """
+    candidatas = candidatas_en_memoria(graph, lat, lon)
+    if not candidatas:
+        candidatas = candidata_de_punto(lat, lon, punto_mas_cercano(lat, lon))
+    return candidatas
 
-    # Ejecutar Dijkstra con transbordos
-    costo_total, pasos = dijkstra_con_transbordos(graph, p_origen.id, p_destino.id)
 
-    if costo_total is None:
-        return Response({"error": "No existe ruta entre origen y destino"}, status=404)
+def extremos(pasos, origenes, destinos):
+    """Paradas de subida y de bajada del camino elegido."""
+    if pasos:
+        return pasos[0]["source"], pasos[-1]["target"]
+    # Sin pasos: origen y destino son la misma parada
+    comunes = origenes.keys() & destinos.keys()
+    parada = min(comunes, key=lambda p: origenes[p] + destinos[p])
+    return parada, parada
 
 
+def datos_de_pasos(graph, pasos):
+    """
+    Lo que hay que traer de la BD para materializar `pasos`:
+    (ids de Edge, coordenadas [lon, lat] ya conocidas, Puntos faltantes).
+    Las coordenadas de los transbordos salen del grafo en memoria.
+    """
+    edge_ids = [p["edge_id"] for p in pasos if p["modo"] == "bus" and p["edge_id"] is not None]
+
+    coords = {}
+    faltantes = set()
+    for paso in pasos:
+        if paso["modo"] != "bus":
+            for punto_id in (paso["source"], paso["target"]):
+                c = graph.coordenadas(punto_id) if hasattr(graph, "coordenadas") else None
+                if c is None:
+                    faltantes.add(punto_id)
+                else:
+                    coords[punto_id] = [c[1], c[0]]  # [lon, lat]
+    return edge_ids, coords, faltantes
+
+
+def consulta_edges(edge_ids):
+    """(id, ruta_id, línea, WKB) de los Edges: la geometría no pasa por GEOS."""
+    return Edge.objects.filter(id__in=edge_ids).values_list("id", "ruta_id", "ruta__linea", AsWKB("geom"))
+
+
+def consulta_puntos(punto_ids):
+    """(id, WKB) de los Puntos."""
+    return Punto.objects.filter(id__in=punto_ids).values_list("id", AsWKB("ubicacion"))
+
+
+def edges_de_filas(filas):
+    """{id: (ruta_id, línea, coordenadas)} a partir de `consulta_edges`."""
+    return {
+        edge_id: (ruta_id, linea, coordenadas_wkb(wkb))
+        for edge_id, ruta_id, linea, wkb in filas
+    }
+
+
+def materializar_ruta(graph, pasos):
+    """
+    Convierte los pasos de la búsqueda en tramos de respuesta.
+
+    Los Edges (con su Ruta) se traen en una sola consulta por id y solo los
+    Puntos cuyas coordenadas no están en el grafo se consultan, también en
+    bloque.
+    """
+    edge_ids, coords, faltantes = datos_de_pasos(graph, pasos)
+    edges = edges_de_filas(consulta_edges(edge_ids))
+    if faltantes:
+        for punto_id, wkb in consulta_puntos(faltantes):
+            coords[punto_id] = coordenadas_wkb(wkb)
+    return armar_tramos(pasos, edges, coords)
+
+
+def armar_tramos(pasos, edges, coords):
+    """
+    Tramos de respuesta a partir de los Edges (`edges_de_filas`) y las
+    coordenadas de los Puntos de transbordo. Los pasos de bus consecutivos
+    sobre la misma ruta se unen en un solo tramo.
+    """
     resultado = []
 
     for paso in pasos:
         source_id = paso["source"]
         target_id = paso["target"]
         modo = paso["modo"]         # bus / transfer
-        ruta_id = paso["ruta_id"] 
+        ruta_id = paso["ruta_id"]
 
         # ---------- BUS ----------
         if modo == "bus":
-            e = Edge.objects.filter(source_id=source_id, target_id=target_id).first()
+            e = edges.get(paso["edge_id"])
             if not e:
                 continue
+            ruta_del_edge, linea_del_edge, geometry = e
+
+            # Mismo recorrido que el tramo anterior: se extiende
+            anterior = resultado[-1] if resultado else None
+            if anterior and anterior["tipo"] == "bus" and anterior["ruta_id"] == ruta_id:
+                if anterior["geometry"] and geometry and anterior["geometry"][-1] == geometry[0]:
+                    geometry = geometry[1:]
+                anterior["geometry"].extend(geometry)
+                continue
 
-            linea = e.ruta.linea if hasattr(e, "ruta") else f"L{ruta_id:03d}"
+            linea = linea_del_edge if ruta_del_edge else f"L{ruta_id:03d}"
 
             # Color asignado segun línea
             color = obtener_color_hex(linea)
@@ -214,29 +468,395 @@ def ruta_optima(request):
                 "linea": linea,
                 "ruta_id": ruta_id,
                 "color": color,
-                "geometry": json.loads(e.geom.geojson)["coordinates"]
+                "geometry": geometry
             })
 
         # ---------- TRANSFER ----------
         else:
-            p1 = Punto.objects.get(id=source_id)
-            p2 = Punto.objects.get(id=target_id)
-
             resultado.append({
                 "tipo": "transfer",
                 "descripcion": "Transferencia entre líneas",
-                "geometry": [
-                    [p1.ubicacion.x, p1.ubicacion.y],
-                    [p2.ubicacion.x, p2.ubicacion.y],
-                ]
+                "geometry": [coords[source_id], coords[target_id]]
             })
 
-    return Response({
+    return resultado
+
+
+def armar_respuesta(costo_total, pasos, alternativas, tramos, origenes, destinos, algoritmo_usado):
+    subida, bajada = extremos(pasos, origenes, destinos)
+    respuesta = {
         "costo_total": costo_total,
-        "ruta_optima": resultado
+        "algoritmo_usado": algoritmo_usado,
+        "caminata": {
+            "origen": {"punto_id": subida, "costo": origenes[subida]},
+            "destino": {"punto_id": bajada, "costo": destinos[bajada]},
+        },
+        "ruta_optima": tramos
+    }
+    if alternativas is not None:
+        # Frente de Pareto: de la más barata a la de menos transbordos
+        respuesta["transbordos"] = alternativas[0]["transbordos"]
+        respuesta["alternativas"] = alternativas
+    return respuesta
+
+
+@api_view(["GET"])
+def ruta_optima(request):
+    """
+    Con `debug=1` la respuesta incluye un bloque `debug` con los tiempos por
+    etapa, las consultas SQL y los contadores de la búsqueda; los tiempos
+    van siempre en el header Server-Timing.
+
+    `formato=polyline|cuantizado`, `precision=5|6` y `tolerancia=<metros>`
+    compactan las geometrías de los tramos (ver `rutas.formatos`).
+
+    `algoritmo_usado` dice qué motor respondió: con `algoritmo=ch` y el
+    índice desactualizado es "dijkstra".
+    """
+    parametros, error = leer_parametros_ruta(request.GET)
+    if error:
+        return Response(error, status=400)
+
+    medicion = Medicion()
+    with medicion.contar_sql():
+        respuesta, status, headers = _ruta_optima(parametros, medicion)
+    if status == 200:
+        with medicion.etapa("formato"):
+            respuesta = formatear_respuesta(respuesta, parametros["geometria"])
+
+    registrar(medicion, status, medicion.busqueda.get("algoritmo", parametros["algoritmo"]))
+    headers["Server-Timing"] = medicion.server_timing()
+    if request.GET.get("debug") == "1":
+        # Copia: la respuesta puede venir de (o ir a) la caché
+        respuesta = {**respuesta, "debug": medicion.resumen()}
+    return Response(respuesta, status=status, headers=headers)
+
+
+def _ruta_optima(parametros, medicion):
+    """Cuerpo de ruta_optima: (respuesta, status, headers)."""
+    # Grafo completo (cacheado por worker, se reconstruye al cambiar la red)
+    with medicion.etapa("grafo"):
+        version, graph = obtener_grafo_versionado()
+
+    # Paradas candidatas en ambos extremos, con su costo a pie (redondeado
+    # a la resolución de la caché para que coordenadas casi iguales compartan respuesta)
+    cache = obtener_cache()
+    with medicion.etapa("snap"):
+        origenes = cache.redondear(paradas_candidatas(graph, parametros["lat_origen"], parametros["lon_origen"]))
+        destinos = cache.redondear(paradas_candidatas(graph, parametros["lat_destino"], parametros["lon_destino"]))
+
+    if not origenes or not destinos:
+        return {"error": "No se encontraron puntos cercanos"}, 404, {}
+
+    with medicion.etapa("cache"):
+        clave = cache.clave(version, origenes, destinos, opciones_busqueda(parametros))
+        respuesta = cache.obtener(version, clave)
+    if respuesta is not None:
+        return respuesta, 200, {"X-Cache": "HIT"}
+
+    # Búsqueda desde todas las paradas de origen hacia todas las de destino
+    with medicion.etapa("busqueda"):
+        jerarquia = obtener_jerarquia() if parametros["algoritmo"] == "ch" else None
+        costo_total, pasos, alternativas, algoritmo_usado = ejecutar_busqueda(
+            graph, jerarquia, parametros, origenes, destinos, medicion.busqueda,
+        )
+        medicion.busqueda["algoritmo"] = algoritmo_usado
+
+    if costo_total is None:
+        return {"error": "No existe ruta entre origen y destino"}, 404, {}
+
+    with medicion.etapa("materializar"):
+        tramos = materializar_ruta(graph, pasos)
+        respuesta = armar_respuesta(costo_total, pasos, alternativas, tramos, origenes, destinos, algoritmo_usado)
+
+    if not es_respaldo(parametros, algoritmo_usado):
+        with medicion.etapa("cache"):
+            cache.guardar(version, clave, respuesta)
+    return respuesta, 200, {"X-Cache": "MISS"}
+
+
+@api_view(["GET"])
+def estadisticas_cache(request):
+    """Contadores de la caché de respuestas de este proceso."""
+    return Response(obtener_cache().estadisticas())
+
+
+@require_GET
+def metricas(request):
+    """Métricas de ruteo de este proceso en formato de texto de Prometheus."""
+    cache = obtener_cache()
+    version, grafo = grafo_cargado()
+    extras = [
+        ("rutas_cache_aciertos_total", "Aciertos de la caché de respuestas", "counter", cache.aciertos),
+        ("rutas_cache_fallos_total", "Fallos de la caché de respuestas", "counter", cache.fallos),
+        ("rutas_cache_desalojos_total", "Desalojos de la caché de respuestas", "counter", cache.backend.desalojos),
+    ]
+    if grafo is not None:
+        extras += [
+            ("rutas_grafo_version", "Versión del grafo cargado en este proceso", "gauge", version),
+            ("rutas_grafo_nodos", "Nodos del grafo cargado", "gauge", len(grafo)),
+            ("rutas_grafo_aristas", "Aristas del grafo cargado", "gauge", grafo.num_aristas),
+        ]
+        informe = grafo.meta.get("normalizacion")
+        if informe:
+            extras.append((
+                "rutas_grafo_aristas_descartadas",
+                "Aristas descartadas al normalizar (self-loops y paralelas)",
+                "gauge", informe["aristas_antes"] - informe["aristas_despues"],
+            ))
+    return HttpResponse(exponer_metricas(extras), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def rutas_tomadas(pasos):
+    """ids de Ruta de los pasos de bus, en orden y sin repetir las consecutivas."""
+    rutas = []
+    for paso in pasos:
+        if paso["modo"] == "bus" and (not rutas or rutas[-1] != paso["ruta_id"]):
+            rutas.append(paso["ruta_id"])
+    return rutas
+
+
+def _leer_pares(request):
+    """Lista de (lat_o, lon_o, lat_d, lon_d) del cuerpo JSON, o ValueError."""
+    try:
+        cuerpo = json.loads(request.body)
+        return [
+            (
+                *leer_lat_lon(par["lat_origen"], par["lon_origen"]),
+                *leer_lat_lon(par["lat_destino"], par["lon_destino"]),
+            )
+            for par in cuerpo["pares"]
+        ], bool(cuerpo.get("geometria", False))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Se espera {\"pares\": [{lat_origen, lon_origen, lat_destino, lon_destino}, ...]}")
+
+
+def _linea_ndjson(obj):
+    return dumps(obj) + b"\n"
+
+
+@csrf_exempt
+@require_POST
+def ruta_optima_batch(request):
+    """
+    Muchas consultas origen/destino en un POST:
+        {"pares": [{"lat_origen", "lon_origen", "lat_destino", "lon_destino"}, ...],
+         "geometria": false}
+
+    Todas las coordenadas se ajustan a paradas en una pasada y los pares con
+    el mismo origen comparten un árbol de `dijkstra_uno_a_muchos`. La
+    respuesta es NDJSON: una línea por par (con su `indice` en la lista
+    enviada, agrupadas por origen) y al final una línea `resumen` con los
+    tiempos. Con "geometria": true cada línea incluye `ruta_optima`.
+
+    Se mide como `ruta_optima` (vista "batch" en las métricas). Los headers
+    salen antes que el cuerpo, así que Server-Timing trae solo la carga del
+    grafo y el ajuste a paradas; las etapas de búsqueda y geometría quedan
+    en el `resumen` y en las métricas.
+    """
+    try:
+        pares, con_geometria = _leer_pares(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    maximo = getattr(settings, "RUTAS_BATCH_MAX_PARES", 5000)
+    if len(pares) > maximo:
+        return JsonResponse(
+            {"error": f"Demasiados pares ({len(pares)}), máximo {maximo}"}, status=413,
+        )
+
+    medicion = Medicion()
+    with medicion.etapa("grafo"):
+        graph = obtener_grafo()
+
+    # Ajuste a paradas: una vez por coordenada distinta
+    candidatas = {}
+
+    def ajustar(lat, lon):
+        if (lat, lon) not in candidatas:
+            candidatas[(lat, lon)] = paradas_candidatas(graph, lat, lon)
+        return candidatas[(lat, lon)]
+
+    grupos = {}  # origen ajustado -> [(indice, origenes, destinos)]
+    sin_paradas = []
+    with medicion.contar_sql(), medicion.etapa("snap"):
+        for i, (lat_o, lon_o, lat_d, lon_d) in enumerate(pares):
+            origenes, destinos = ajustar(lat_o, lon_o), ajustar(lat_d, lon_d)
+            if not origenes or not destinos:
+                sin_paradas.append(i)
+                continue
+            grupos.setdefault(tuple(sorted(origenes.items())), []).append((i, origenes, destinos))
+
+    def generar():
+        sin_ruta = 0
+        nodos_asentados = inserciones_heap = 0
+
+        for i in sin_paradas:
+            yield _linea_ndjson({"indice": i, "error": "No se encontraron puntos cercanos"})
+
+        for consultas in grupos.values():
+            origenes = consultas[0][1]
+            estadisticas = {}
+            with medicion.etapa("busqueda"):
+                resultados = dijkstra_uno_a_muchos(graph, origenes, [d for _, _, d in consultas], estadisticas)
+            nodos_asentados += estadisticas.get("nodos_asentados", 0)
+            inserciones_heap += estadisticas.get("inserciones_heap", 0)
+
+            for (i, _, destinos), (costo_total, pasos) in zip(consultas, resultados):
+                if costo_total is None:
+                    sin_ruta += 1
+                    yield _linea_ndjson({"indice": i, "error": "No existe ruta entre origen y destino"})
+                    continue
+
+                subida, bajada = extremos(pasos, origenes, destinos)
+                linea = {
+                    "indice": i,
+                    "costo_total": costo_total,
+                    "caminata": {
+                        "origen": {"punto_id": subida, "costo": origenes[subida]},
+                        "destino": {"punto_id": bajada, "costo": destinos[bajada]},
+                    },
+                    "rutas": rutas_tomadas(pasos),
+                }
+                if con_geometria:
+                    with medicion.contar_sql(), medicion.etapa("materializar"):
+                        linea["ruta_optima"] = materializar_ruta(graph, pasos)
+                yield _linea_ndjson(linea)
+
+        if grupos:
+            medicion.busqueda.update(nodos_asentados=nodos_asentados, inserciones_heap=inserciones_heap)
+        registrar(medicion, 200, "dijkstra", vista="batch")
+        etapas = medicion.etapas
+        yield _linea_ndjson({"resumen": {
+            "pares": len(pares),
+            "grupos_origen": len(grupos),
+            "sin_paradas": len(sin_paradas),
+            "sin_ruta": sin_ruta,
+            "ms_ajuste": round((etapas["grafo"] + etapas["snap"]) * 1000, 2),
+            "ms_busqueda": round(etapas.get("busqueda", 0.0) * 1000, 2),
+            "ms_geometria": round(etapas.get("materializar", 0.0) * 1000, 2),
+            "ms_total": round(medicion.total * 1000, 2),
+            "consultas_sql": medicion.consultas_sql,
+            **medicion.busqueda,
+        }})
+
+    return StreamingHttpResponse(
+        generar(), content_type="application/x-ndjson",
+        headers={"Server-Timing": medicion.server_timing()},
+    )
+
+
+def poligono_isocrona(graph, costos, minutos, lados=16):
+    """
+    Unión de círculos alrededor de cada parada alcanzada, con radio igual a
+    lo que se puede caminar con el tiempo que sobra (hasta
+    SNAP_RADIUS_METERS). Los círculos se arman directamente en grados con
+    la escala local de metros por grado, sin reproyectar.
+    """
+    metros_por_grado = RADIO_TIERRA_M * pi / 180
+    angulos = [2 * pi * k / lados for k in range(lados)]
+
+    circulos = []
+    for punto_id, costo in costos.items():
+        c = graph.coordenadas(punto_id)
+        if c is None:
+            continue
+        radio = min((minutos - costo) * WALK_SPEED, SNAP_RADIUS_METERS)
+        if radio <= 0:
+            continue
+        lat, lon = c
+        dy = radio / metros_por_grado
+        dx = dy / cos(radians(lat))
+        anillo = [(lon + dx * cos(a), lat + dy * sin(a)) for a in angulos]
+        circulos.append(Polygon(anillo + anillo[:1]))
+
+    if not circulos:
+        return None
+    return GeometryCollection(circulos, srid=4326).unary_union
+
+
+@api_view(["GET"])
+def isocrona(request):
+    """
+    Paradas alcanzables en `minutos` desde (lat, lon), caminando hasta las
+    paradas cercanas y luego en micro/transbordos. `formato=poligono`
+    devuelve el área cubierta como Feature GeoJSON.
+    """
+    try:
+        lat, lon = leer_lat_lon(request.GET.get("lat"), request.GET.get("lon"))
+        minutos = float(request.GET.get("minutos"))
+        if not (isfinite(minutos) and minutos > 0):
+            raise ValueError
+    except (TypeError, ValueError):
+        return Response({"error": "Parámetros lat/lon/minutos inválidos"}, status=400)
+
+    formato = request.GET.get("formato", "puntos")
+    if formato not in ("puntos", "poligono"):
+        return Response({"error": "Formato inválido, opciones: puntos, poligono"}, status=400)
+
+    graph = obtener_grafo()
+    origenes = paradas_candidatas(graph, lat, lon)
+    if not origenes:
+        return Response({"error": "No se encontraron puntos cercanos"}, status=404)
+
+    costos = dijkstra_uno_a_todos(graph, origenes, limite=minutos)
+
+    if formato == "poligono":
+        poligono = poligono_isocrona(graph, costos, minutos)
+        return Response({
+            "type": "Feature",
+            "geometry": json.loads(poligono.geojson) if poligono else None,
+            "properties": {"minutos": minutos, "puntos": len(costos)},
+        })
+
+    return Response({
+        "minutos": minutos,
+        "puntos": [
+            {"punto_id": punto_id, "costo": costo}
+            for punto_id, costo in sorted(costos.items(), key=lambda par: par[1])
+        ],
     })
 
 
+@csrf_exempt
+@require_POST
+def matriz_costos(request):
+    """
+    Matriz de costos entre paradas: {"origenes": [punto_id...],
+    "destinos": [punto_id...]}. Responde un `.npy` float64 de
+    len(origenes) x len(destinos) en el orden pedido (inf = sin camino),
+    calculado por filas en un pool de procesos.
+    """
+    try:
+        cuerpo = json.loads(request.body)
+        origenes = [int(p) for p in cuerpo["origenes"]]
+        destinos = [int(p) for p in cuerpo["destinos"]]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"error": "Se espera {\"origenes\": [...], \"destinos\": [...]}"}, status=400)
+
+    maximo = getattr(settings, "RUTAS_MATRIZ_MAX_CELDAS", 1_000_000)
+    if len(origenes) * len(destinos) > maximo:
+        return JsonResponse(
+            {"error": f"Matriz demasiado grande, máximo {maximo} celdas"}, status=413,
+        )
+
+    graph = obtener_grafo()
+    desconocidos = [p for p in set(origenes) | set(destinos) if p not in graph]
+    if desconocidos:
+        return JsonResponse({"error": "Puntos inexistentes", "puntos": sorted(desconocidos)[:50]}, status=404)
+
+    inicio = time.perf_counter()
+    pool = obtener_pool(graph, getattr(settings, "RUTAS_MATRIZ_PROCESOS", None))
+    matriz = pool.calcular(origenes, destinos)
+
+    buffer = io.BytesIO()
+    np.save(buffer, matriz, allow_pickle=False)
+    respuesta = HttpResponse(buffer.getvalue(), content_type="application/octet-stream")
+    respuesta["Content-Disposition"] = 'attachment; filename="matriz.npy"'
+    respuesta["X-Tiempo-Ms"] = f"{(time.perf_counter() - inicio) * 1000:.1f}"
+    return respuesta
+
+
 def obtener_color_hex(linea):
     colores = {
         "L001": "#FF0000",
@@ -0,0 +1,260 @@
+"""
+Versiones asíncronas (ASGI) de los endpoints de ruteo y de la red.
+
+DRF no tiene vistas asíncronas, así que son vistas `async def` de Django
+que reutilizan la lógica de `views.py`:
+  - la BD se consulta con el ORM asíncrono (afirst, async for);
+  - la búsqueda, que es CPU pura, corre en un pool de hilos acotado para
+    no bloquear el event loop;
+  - un semáforo limita las consultas en curso y cuántas pueden esperar;
+    si la cola está llena o la espera supera `ESPERA_MAX` se responde 503
+    enseguida con Retry-After, en lugar de acumular pedidos.
+
+Configuración en `settings.RUTAS_ASYNC`. Con WSGI se siguen usando las
+vistas de `views.py`.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from .cache_respuestas import obtener_cache
+from .grafo import aobtener_grafo_versionado, aobtener_jerarquia
+from .formatos import formatear_respuesta, leer_parametros_geometria
+from .geojson import coordenadas_wkb, dumps
+from .instrumentacion import Medicion, registrar
+from .models import Ruta
+from .payloads import obtener_payload_red
+from .views import (
+    armar_respuesta,
+    armar_tramos,
+    candidata_de_punto,
+    candidatas_en_memoria,
+    consulta_edges,
+    consulta_puntos,
+    consulta_segmentos,
+    datos_de_pasos,
+    edges_de_filas,
+    ejecutar_busqueda,
+    es_respaldo,
+    formatear_segmentos,
+    leer_parametros_ruta,
+    opciones_busqueda,
+    puntos_por_cercania,
+    respuesta_payload_red,
+    serializar_ruta_linea,
+)
+
+CONFIG_POR_DEFECTO = {
+    "CONCURRENCIA": os.cpu_count() or 4,  # consultas en curso (= hilos del pool)
+    "COLA": 64,                           # consultas que pueden esperar turno
+    "ESPERA_MAX": 2.0,                    # segundos de espera antes del 503
+}
+
+
+def configuracion():
+    return {**CONFIG_POR_DEFECTO, **getattr(settings, "RUTAS_ASYNC", {})}
+
+
+class Saturado(Exception):
+    pass
+
+
+class Limitador:
+    """Semáforo con cola acotada y espera máxima."""
+
+    def __init__(self, concurrencia, cola, espera_max):
+        self._semaforo = asyncio.Semaphore(concurrencia)
+        self.cola = cola
+        self.espera_max = espera_max
+        self.esperando = 0
+        self.rechazadas = 0
+
+    async def __aenter__(self):
+        if self._semaforo.locked() and self.esperando >= self.cola:
+            self.rechazadas += 1
+            raise Saturado
+        self.esperando += 1
+        try:
+            # acquire() corre en esta misma tarea: si vence el plazo o cancelan
+            # el pedido, el semáforo no queda con un permiso tomado y sin dueño
+            # (con wait_for la adquisición podía completarse al cancelarla)
+            async with asyncio.timeout(self.espera_max):
+                await self._semaforo.acquire()
+        except TimeoutError:
+            self.rechazadas += 1
+            raise Saturado
+        finally:
+            self.esperando -= 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self._semaforo.release()
+
+
+_lock = threading.Lock()
+_pool = None
+# Un limitador por event loop (con ASGI hay uno solo por proceso; bajo WSGI
+# cada pedido async corre en su propio loop y el límite no aplica)
+_limitadores = weakref.WeakKeyDictionary()
+
+
+def _recursos():
+    """Limitador del loop actual y pool del proceso, creados en el primer uso."""
+    global _pool
+    loop = asyncio.get_running_loop()
+    with _lock:
+        config = configuracion()
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=config["CONCURRENCIA"], thread_name_prefix="rutas-busqueda",
+            )
+        limitador = _limitadores.get(loop)
+        if limitador is None:
+            limitador = Limitador(config["CONCURRENCIA"], config["COLA"], config["ESPERA_MAX"])
+            _limitadores[loop] = limitador
+    return limitador, _pool
+
+
+async def en_pool(funcion, *args):
+    """Corre `funcion` (sin acceso a la BD) en el pool de hilos."""
+    _, pool = _recursos()
+    return await asyncio.get_running_loop().run_in_executor(pool, funcion, *args)
+
+
+def limitada(vista):
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        limitador, _ = _recursos()
+        try:
+            async with limitador:
+                return await vista(request, *args, **kwargs)
+        except Saturado:
+            return JsonResponse(
+                {"error": "Servidor saturado, reintenta en unos segundos"},
+                status=503, headers={"Retry-After": "1"},
+            )
+    return envoltura
+
+
+def _json(datos, status=200, **kwargs):
+    return HttpResponse(dumps(datos), status=status, content_type="application/json", **kwargs)
+
+
+async def _paradas_candidatas(graph, lat, lon):
+    # El índice espacial ya viene armado de `obtener_grafo_versionado` (que
+    # corre en un hilo), así que acá solo se consulta
+    candidatas = candidatas_en_memoria(graph, lat, lon)
+    if not candidatas:
+        candidatas = candidata_de_punto(lat, lon, await puntos_por_cercania(lat, lon).afirst())
+    return candidatas
+
+
+async def _materializar_ruta(graph, pasos):
+    edge_ids, coords, faltantes = datos_de_pasos(graph, pasos)
+    edges = edges_de_filas([fila async for fila in consulta_edges(edge_ids)])
+    if faltantes:
+        async for punto_id, wkb in consulta_puntos(faltantes):
+            coords[punto_id] = coordenadas_wkb(wkb)
+    return armar_tramos(pasos, edges, coords)
+
+
+@require_GET
+@limitada
+async def ruta_optima(request):
+    """
+    Mismos parámetros y respuesta que `views.ruta_optima`, con las mismas
+    mediciones (Server-Timing, `debug=1` y métricas).
+    """
+    parametros, error = leer_parametros_ruta(request.GET)
+    if error:
+        return _json(error, status=400)
+
+    medicion = Medicion()
+    async with medicion.acontar_sql():
+        respuesta, status, headers = await _ruta_optima(parametros, medicion)
+    if status == 200:
+        with medicion.etapa("formato"):
+            respuesta = formatear_respuesta(respuesta, parametros["geometria"])
+
+    registrar(medicion, status, medicion.busqueda.get("algoritmo", parametros["algoritmo"]))
+    headers["Server-Timing"] = medicion.server_timing()
+    if request.GET.get("debug") == "1":
+        # Copia: la respuesta puede venir de (o ir a) la caché
+        respuesta = {**respuesta, "debug": medicion.resumen()}
+    return _json(respuesta, status=status, headers=headers)
+
+
+async def _ruta_optima(parametros, medicion):
+    """Cuerpo de ruta_optima: (respuesta, status, headers)."""
+    with medicion.etapa("grafo"):
+        version, graph = await aobtener_grafo_versionado()
+
+    cache = obtener_cache()
+    with medicion.etapa("snap"):
+        origenes = cache.redondear(
+            await _paradas_candidatas(graph, parametros["lat_origen"], parametros["lon_origen"])
+        )
+        destinos = cache.redondear(
+            await _paradas_candidatas(graph, parametros["lat_destino"], parametros["lon_destino"])
+        )
+    if not origenes or not destinos:
+        return {"error": "No se encontraron puntos cercanos"}, 404, {}
+
+    with medicion.etapa("cache"):
+        clave = cache.clave(version, origenes, destinos, opciones_busqueda(parametros))
+        respuesta = await en_pool(cache.obtener, version, clave)
+    if respuesta is not None:
+        return respuesta, 200, {"X-Cache": "HIT"}
+
+    with medicion.etapa("busqueda"):
+        jerarquia = await aobtener_jerarquia() if parametros["algoritmo"] == "ch" else None
+        costo_total, pasos, alternativas, algoritmo_usado = await en_pool(
+            ejecutar_busqueda, graph, jerarquia, parametros, origenes, destinos, medicion.busqueda,
+        )
+        medicion.busqueda["algoritmo"] = algoritmo_usado
+    if costo_total is None:
+        return {"error": "No existe ruta entre origen y destino"}, 404, {}
+
+    with medicion.etapa("materializar"):
+        tramos = await _materializar_ruta(graph, pasos)
+        respuesta = armar_respuesta(costo_total, pasos, alternativas, tramos, origenes, destinos, algoritmo_usado)
+
+    if not es_respaldo(parametros, algoritmo_usado):
+        with medicion.etapa("cache"):
+            await en_pool(cache.guardar, version, clave, respuesta)
+    return respuesta, 200, {"X-Cache": "MISS"}
+
+
+@require_GET
+@limitada
+async def rutas_todas(request):
+    """Mismo payload precalculado que `views.rutas_todas`."""
+    payload = await sync_to_async(obtener_payload_red)()
+    return respuesta_payload_red(request, payload)
+
+
+@require_GET
+@limitada
+async def ruta_por_linea(request, linea):
+    """Mismos parámetros y respuesta que `views.ruta_por_linea`."""
+    geometria, error = leer_parametros_geometria(request.GET)
+    if error:
+        return _json(error, status=400)
+
+    ruta = await Ruta.objects.filter(linea=linea).afirst()
+    if ruta is None:
+        ruta = await Ruta.objects.filter(nombre=linea).afirst()
+    if ruta is None:
+        return _json({"error": "Línea no encontrada"}, status=404)
+
+    filas = [s async for s in consulta_segmentos(ruta, geometria)]
+    segmentos = formatear_segmentos(filas, geometria)
+    return _json(serializar_ruta_linea(ruta, segmentos, geometria))